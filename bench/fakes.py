@@ -0,0 +1,283 @@
+"""
+In-process stand-ins for SerpAPI, Firecrawl, Anthropic and BigQuery.
+
+Each fake mimics the slice of the client API the pipeline uses, sleeps for a
+configurable latency, fails at a configurable rate and returns deterministic
+payloads of a configurable size, so runs are comparable between commits.
+"""
+import datetime
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import TimeoutError
+from types import SimpleNamespace
+
+WORDS = (
+    "war front army drone strike village city region border talks sanctions energy grain port "
+    "minister president channel report claim source official statement attack defense shelling "
+    "evacuation aid convoy bridge railway negotiations ceasefire offensive brigade territory"
+).split()
+
+
+class FakeServiceError(Exception):
+    pass
+
+
+def seeded_random(*parts):
+    return random.Random(hashlib.sha256("|".join(map(str, parts)).encode()).digest())
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+class FakeService:
+    """
+    Shared latency, error and call-count bookkeeping.
+
+    Parameters:
+    - latency (float): Mean seconds per call.
+    - jitter (float): Relative spread of the latency, e.g. 0.5 for +/-50%.
+    - error_rate (float): Probability that a call fails.
+    - seed (int): Seed for latency and error draws.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.3, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def draw(self):
+        """
+        Counts a call and returns (delay, failed) for it.
+        """
+        with self.lock:
+            self.calls += 1
+            delay = self.latency * self.random.uniform(1 - self.jitter, 1 + self.jitter)
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return max(0.0, delay), failed
+
+    def call(self, name):
+        delay, failed = self.draw()
+        time.sleep(delay)
+        if failed:
+            raise FakeServiceError(f"{type(self).__name__}: simulated {name} failure")
+
+    def reset(self):
+        with self.lock:
+            self.calls = 0
+            self.errors = 0
+
+
+class FakeSerpAPI(FakeService):
+    """
+    Replaces the serpapi search classes: `FakeSerpAPI(...)(params).get_dict()`.
+    Links are spread over `hosts` hosts so per-host rate limits come into play.
+    """
+
+    def __init__(self, num_results=10, hosts=5, **kwargs):
+        super().__init__(**kwargs)
+        self.num_results = num_results
+        self.hosts = hosts
+
+    def __call__(self, params):
+        return SimpleNamespace(get_dict=lambda: self.search(params))
+
+    def search(self, params):
+        self.call("search")
+        query = params.get("q") or params.get("text") or ""
+        digest = hashlib.sha256(query.encode()).hexdigest()[:10]
+        return {"organic_results": [
+            {
+                "position": i + 1,
+                "link": f"https://site{i % self.hosts}.example/{digest}/{i}",
+                "title": f"Result {i + 1} for {query}",
+                "snippet": words(seeded_random(digest, i, "snippet"), 25),
+                "source": f"site{i % self.hosts}.example",
+                "date": "2024-11-20",
+            }
+            for i in range(self.num_results)
+        ]}
+
+
+class FakeFirecrawl(FakeService):
+    """
+    Replaces FirecrawlApp: `FakeFirecrawl(...)(api_key=...).scrape_url(url, params)`.
+    Pages have `page_words` words of article text wrapped in navigation boilerplate.
+    """
+
+    def __init__(self, page_words=1500, **kwargs):
+        super().__init__(**kwargs)
+        self.page_words = page_words
+
+    def __call__(self, api_key=None):
+        return self
+
+    def scrape_url(self, url, params=None):
+        self.call("scrape")
+        rng = seeded_random(url)
+        nav = " | ".join(f"[{word}](https://nav.example/{word})" for word in WORDS[:8])
+        paragraphs = [words(rng, 80) + "." for _ in range(max(1, self.page_words // 80))]
+        markdown = "\n\n".join([nav, "We use cookies to improve your experience.", f"# {words(rng, 8)}",
+                                *paragraphs, "Subscribe to our newsletter", nav])
+        return {"markdown": markdown}
+
+
+class FakeAnthropic(FakeService):
+    """
+    Replaces the Anthropic client (messages.create and messages.stream).
+
+    Requests with tools are answered like an agent: `tool_rounds` turns that call every
+    offered tool once, then a final report of `report_words` words. Requests without
+    tools get a summary of `summary_words` words. `agent_turns` counts tool-enabled
+    requests, which is the number of agent turns.
+    """
+
+    def __init__(self, tool_rounds=1, report_words=600, summary_words=300, **kwargs):
+        super().__init__(**kwargs)
+        self.tool_rounds = tool_rounds
+        self.report_words = report_words
+        self.summary_words = summary_words
+        self.agent_turns = 0
+        self.messages = SimpleNamespace(create=self.create, stream=self.stream)
+
+    def reset(self):
+        super().reset()
+        self.agent_turns = 0
+
+    def create(self, **params):
+        self.call("messages.create")
+        return self.respond(params)
+
+    def stream(self, **params):
+        return _FakeStream(self, params)
+
+    def respond(self, params):
+        messages = params["messages"]
+        prompt = messages[0]["content"]
+        prompt = prompt if isinstance(prompt, str) else prompt[0]["text"]
+        rng = seeded_random(prompt, len(messages))
+        if params.get("tools"):
+            with self.lock:
+                self.agent_turns += 1
+            rounds = sum(1 for message in messages if message["role"] == "assistant")
+            if rounds < self.tool_rounds:
+                content = [
+                    SimpleNamespace(type="tool_use", id=f"toolu_{rounds}_{i}", name=tool["name"],
+                                    input=tool_input(tool, prompt))
+                    for i, tool in enumerate(params["tools"]) if tool["name"] != "validate_json"
+                ]
+            else:
+                content = [SimpleNamespace(type="text", text=f"# Report\n\n{words(rng, self.report_words)}")]
+        else:
+            content = [SimpleNamespace(type="text", text=words(rng, self.summary_words))]
+        input_tokens = len(str(params)) // 4
+        output_tokens = sum(len(getattr(block, "text", "")) // 4 for block in content)
+        return SimpleNamespace(
+            content=content,
+            stop_reason="tool_use" if content[0].type == "tool_use" else "end_turn",
+            usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens,
+                                  cache_creation_input_tokens=0, cache_read_input_tokens=0),
+        )
+
+
+class _FakeStream:
+    def __init__(self, client, params):
+        self.client = client
+        self.params = params
+        self.message = None
+
+    def __enter__(self):
+        self.client.call("messages.stream")
+        self.message = self.client.respond(self.params)
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @property
+    def text_stream(self):
+        for block in self.message.content:
+            if block.type == "text":
+                for word in block.text.split(" "):
+                    yield word + " "
+
+    def get_final_message(self):
+        return self.message
+
+
+def tool_input(tool, prompt):
+    """
+    Plausible arguments for a tool call, derived from its input schema.
+    """
+    digest = hashlib.sha256(prompt.encode()).hexdigest()[:10]
+    arguments = {}
+    for name in tool["input_schema"].get("required", []):
+        if tool["name"] == "call_gbq_function" and name == "query":
+            arguments[name] = ("SELECT text, url, pdate FROM `hack.main` "
+                               "WHERE pdate > DATE_SUB(CURRENT_DATE, INTERVAL 14 DAY) "
+                               f"AND section = 'bench-{digest}' LIMIT 500")
+        elif name == "search_engine":
+            arguments[name] = "google"
+        else:
+            arguments[name] = prompt[:200]
+    return arguments
+
+
+class FakeBigQuery(FakeService):
+    """
+    Replaces the BigQuery client. Dry runs report `bytes_processed`; real jobs finish
+    after the drawn latency and return `rows` rows of `text_words` words each.
+    Failures raise ServiceUnavailable, which call_gbq_function retries.
+    """
+
+    def __init__(self, rows=300, text_words=60, bytes_processed=2 * 1024 ** 3, **kwargs):
+        super().__init__(**kwargs)
+        self.rows = rows
+        self.text_words = text_words
+        self.bytes_processed = bytes_processed
+
+    def query(self, query, job_config=None):
+        if job_config is not None and getattr(job_config, "dry_run", False):
+            return SimpleNamespace(total_bytes_processed=self.bytes_processed)
+        delay, failed = self.draw()
+        return _FakeQueryJob(self, query, time.monotonic() + delay, failed)
+
+
+class _FakeQueryJob:
+    def __init__(self, client, query, done_at, failed):
+        self.client = client
+        self.query = query
+        self.done_at = done_at
+        self.failed = failed
+
+    def cancel(self):
+        return True
+
+    def result(self, timeout=None, page_size=None):
+        remaining = self.done_at - time.monotonic()
+        if timeout is not None and remaining > timeout:
+            time.sleep(timeout)
+            raise TimeoutError()
+        time.sleep(max(0.0, remaining))
+        if self.failed:
+            from google.api_core.exceptions import ServiceUnavailable
+            raise ServiceUnavailable("FakeBigQuery: simulated backend failure")
+        rng = seeded_random(self.query)
+        today = datetime.date.today()
+        return iter([
+            {
+                "text": words(rng, self.client.text_words),
+                "url": f"https://t.me/channel{i % 40}/{i}",
+                "pdate": today - datetime.timedelta(days=i % 14),
+                "channel": f"channel{i % 40}",
+            }
+            for i in range(self.client.rows)
+        ])
@@ -0,0 +1,231 @@
+"""
+Offline benchmarks for the report pipeline.
+
+Runs get_search_and_scrape, get_omelas_results and call_system end to end against the
+fakes in bench/fakes.py, so no API keys or network are needed, and appends the
+results to a JSONL file keyed by git commit.
+
+Usage (from the repository root):
+    python -m bench.run --scenario all --iterations 5 --concurrency 4
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_PATH = os.path.join(REPO_ROOT, "bench", "results.jsonl")
+SCENARIOS = ("search", "omelas", "report")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=[*SCENARIOS, "all"], default="all")
+    parser.add_argument("--iterations", type=int, default=3, help="sequential runs per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel callers in the throughput run")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplies every fake latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="failure probability of every fake call")
+    parser.add_argument("--page-words", type=int, default=1500, help="article length returned by the fake Firecrawl")
+    parser.add_argument("--results", type=int, default=10, help="organic results returned by the fake SerpAPI")
+    parser.add_argument("--rows", type=int, default=300, help="rows returned by the fake BigQuery")
+    parser.add_argument("--warm-cache", action="store_true", help="repeat the same inputs so caches are hit")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the production rate limits")
+    parser.add_argument("--output", default=RESULTS_PATH, help="JSONL file the results are appended to")
+    parser.add_argument("--no-save", action="store_true", help="print the results without storing them")
+    return parser.parse_args(argv)
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+class Harness:
+    """
+    Imports the pipeline with fakes swapped in for every external client.
+    """
+
+    def __init__(self, args):
+        from bench.fakes import FakeAnthropic, FakeBigQuery, FakeFirecrawl, FakeSerpAPI
+
+        self.cache_dir = tempfile.TemporaryDirectory(prefix="antidisinform-bench-")
+        for key in ("SERPAPI_API_KEY", "FIRECRAWL_API_KEY", "ANTHROPIC_API_KEY"):
+            os.environ.setdefault(key, "bench")
+        # mainapi modules import their siblings directly
+        sys.path[:0] = [REPO_ROOT, os.path.join(REPO_ROOT, "mainapi")]
+
+        from data.omelas import gcp, worker
+        from data_sources import llm, search_scraper
+        import anthropic_interface
+
+        scale, error_rate = args.latency_scale, args.error_rate
+        self.serp = FakeSerpAPI(num_results=args.results, latency=1.5 * scale, error_rate=error_rate, seed=1)
+        self.firecrawl = FakeFirecrawl(page_words=args.page_words, latency=2.0 * scale, error_rate=error_rate, seed=2)
+        self.anthropic = FakeAnthropic(latency=3.0 * scale, error_rate=error_rate, seed=3)
+        self.bigquery = FakeBigQuery(rows=args.rows, latency=4.0 * scale, error_rate=error_rate, seed=4)
+        self.fakes = {"serpapi": self.serp, "firecrawl": self.firecrawl, "anthropic": self.anthropic,
+                      "bigquery": self.bigquery}
+
+        search_scraper.SEARCH_CLASSES = {engine: self.serp for engine in search_scraper.SEARCH_CLASSES}
+        search_scraper.FirecrawlApp = self.firecrawl
+        llm._client = self.anthropic
+        gcp._bigquery_client = self.bigquery
+        if not args.rate_limits:
+            from data_sources.rate_limit import KeyedRateLimiter, RateLimiter
+            unlimited = dict(rate=1e12, burst=1e12)
+            search_scraper.firecrawl_limiter = RateLimiter(**unlimited)
+            search_scraper.host_limiter = KeyedRateLimiter(**unlimited)
+            search_scraper.anthropic_request_limiter = RateLimiter(**unlimited)
+            search_scraper.anthropic_token_limiter = RateLimiter(**unlimited)
+
+        # Caches live in a throwaway file. Their modules may already have been imported with the
+        # real CACHE_PATH, so each cache is pointed at it directly rather than through the environment
+        self.caches = [search_scraper.serp_cache, search_scraper.scrape_cache, search_scraper.summary_cache,
+                       gcp.gbq_cache, anthropic_interface.report_cache]
+        cache_path = os.path.join(self.cache_dir.name, "cache.sqlite3")
+        for cache in self.caches:
+            cache.path, cache._conn = cache_path, None
+        self.scenarios = {
+            "search": lambda n: search_scraper.get_search_and_scrape("google", f"shelling near Kharkiv {n}"),
+            "omelas": lambda n: worker.get_omelas_results(f"What are Telegram channels saying about grain exports? {n}"),
+            "report": lambda n: anthropic_interface.call_system(f"What are the biggest threats in the war? {n}"),
+        }
+
+    def reset(self, clear_caches):
+        for fake in self.fakes.values():
+            fake.reset()
+        if clear_caches:
+            for cache in self.caches:
+                if os.path.dirname(cache.path) != self.cache_dir.name:
+                    raise RuntimeError(f"Refusing to clear {cache.path}, which is not the bench cache")
+                cache.clear()
+
+    def counters(self):
+        counts = {f"{name}_calls": fake.calls for name, fake in self.fakes.items()}
+        counts.update({f"{name}_errors": fake.errors for name, fake in self.fakes.items()})
+        counts["agent_turns"] = self.anthropic.agent_turns
+        return counts
+
+
+def timed(fn, n):
+    started = time.perf_counter()
+    try:
+        fn(n)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return time.perf_counter() - started, error
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_scenario(harness, name, args):
+    """
+    Measures one scenario: sequential latency, per-call work, throughput with
+    `concurrency` parallel callers, and peak traced memory of a single call.
+    """
+    fn = harness.scenarios[name]
+    # Warm runs reuse input 0 after priming it; cold runs use fresh inputs and empty caches
+    inputs = (lambda i: 0) if args.warm_cache else (lambda i: i)
+    harness.reset(clear_caches=True)
+    if args.warm_cache:
+        fn(0)
+
+    harness.reset(clear_caches=not args.warm_cache)
+    runs = [timed(fn, inputs(i)) for i in range(args.iterations)]
+    latencies = [seconds for seconds, _ in runs]
+    per_call = {key: value / args.iterations for key, value in harness.counters().items()}
+
+    harness.reset(clear_caches=not args.warm_cache)
+    calls = args.iterations * args.concurrency
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        concurrent_runs = list(executor.map(lambda i: timed(fn, inputs(args.iterations + i)), range(calls)))
+    elapsed = time.perf_counter() - started
+
+    harness.reset(clear_caches=not args.warm_cache)
+    tracemalloc.start()
+    timed(fn, inputs(args.iterations + calls))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    errors = [error for _, error in runs + concurrent_runs if error]
+    return {
+        "latency_mean": statistics.mean(latencies),
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_max": max(latencies),
+        "concurrent_latency_p95": percentile([seconds for seconds, _ in concurrent_runs], 0.95),
+        "throughput_per_minute": calls / elapsed * 60,
+        "peak_memory_mb": peak / 1024 ** 2,
+        "failed_calls": len(errors),
+        "first_error": errors[0] if errors else None,
+        **{f"{key}_per_call": value for key, value in per_call.items()},
+    }
+
+
+def previous_record(path, record):
+    """
+    The latest stored run of the same scenario and configuration from another commit.
+    """
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            if (entry["scenario"] == record["scenario"] and entry["config"] == record["config"]
+                    and entry["commit"] != record["commit"]):
+                previous = entry
+    return previous
+
+
+def print_record(record, previous):
+    print(f"\n== {record['scenario']} @ {record['commit']}{' (dirty)' if record['dirty'] else ''}")
+    for key, value in record["metrics"].items():
+        line = f"  {key:32} {value:.3f}" if isinstance(value, float) else f"  {key:32} {value}"
+        old = previous["metrics"].get(key) if previous else None
+        if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+            line += f"   ({(value - old) / old:+.1%} vs {previous['commit']})"
+        print(line)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    harness = Harness(args)
+    commit, dirty = git_revision()
+    config = {key: value for key, value in vars(args).items() if key not in ("scenario", "output", "no_save")}
+    for name in SCENARIOS if args.scenario == "all" else (args.scenario,):
+        record = {
+            "commit": commit,
+            "dirty": dirty,
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "scenario": name,
+            "config": config,
+            "metrics": run_scenario(harness, name, args),
+        }
+        print_record(record, previous_record(args.output, record))
+        if not args.no_save:
+            with open(args.output, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
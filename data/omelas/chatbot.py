@@ -1,5 +1,20 @@
-from openai import OpenAI
-import json, ast, os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import json, ast, os, time
+
+from data.omelas.context import MessageHistory
+from data_sources.llm import create_message, stream_message
+from telemetry.cancellation import cancellation, current_cancel_event
+from telemetry.context import submit_in_context
+from telemetry.events import emit
+from telemetry.tracing import span
+
+# Seconds each tool may run before its result is replaced by a timeout error
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", 600))
+TOOL_POLL_INTERVAL = 0.5  # seconds between cancellation checks while waiting on tools
+TOOL_TIMEOUTS = {
+    "validate_json": 10,
+    "call_gbq_function": 300,
+}
 
 
 json_validator = {
@@ -37,75 +52,150 @@ def load_json(json_str):
             raise ValueError(f"json.loads failed with error: {json_error}. ast.literal_eval failed with error: {ast_error}")
 
 
-def get_anthropic_message_with_tools(system_instructions, prompt, functions=None, tool_executor=None):
-    import anthropic
+class AgentCancelled(Exception):
+    pass
+
+
+def get_anthropic_message_with_tools(system_instructions, prompt, functions=None, tool_executor=None, cancel_event=None,
+                                     stream=False):
+    """
+    Runs the tool-use loop until the model answers without calling a tool.
+
+    With stream=True every text delta of the model is emitted as a "token" progress
+    event, so callers can show the final report while it is being written.
+
+    cancel_event defaults to the current report's (see telemetry.cancellation) and is
+    passed on to the tools, so nested agents and BigQuery jobs stop with the report.
+    """
+    if cancel_event is None:
+        cancel_event = current_cancel_event()
+    with cancellation(cancel_event):
+        return _run_agent(system_instructions, prompt, functions, tool_executor, cancel_event, stream)
 
+
+def _run_agent(system_instructions, prompt, functions, tool_executor, cancel_event, stream):
     model = "claude-3-5-sonnet-latest"
     max_tokens = 8192
-    client = anthropic.Anthropic(api_key=os.environ["ANTHROPIC_API_KEY"], max_retries=3)
     if functions:
         functions = [*functions, json_validator]
     else:
         functions = [json_validator]
 
-    messages = []
-    if system_instructions:
-        messages.append({"role": "user", "content": [
-            {"type": "text", "text": f"<system_instructions>{system_instructions}</system_instructions>"}]})
+    messages = MessageHistory()
     messages.append({"role": "user", "content": [{"type": "text", "text": prompt}]})
 
+    turn = 0
     while True:
-        response = client.messages.create(
-            model=model,
-            max_tokens=max_tokens,
-            tools=functions,
-            messages=messages,
-        )
-
-        content_blocks = response.content
-        found_tool_use = False
-
-        for block in content_blocks:
-            if block.type == 'tool_use':
-                found_tool_use = True
-                tool_use_id = block.id
-                tool_name = block.name
-                tool_input = block.input
-
-                try:
-                    tool_result = enhanced_tool_executor(tool_name, tool_input, tool_executor)
-                    if tool_name == "call_gbq_function":
-                        if not tool_result.startswith("ERROR") and len(tool_result) > 2:
-                            return tool_result
-                    is_error = True
-
-                    if tool_name in ("validator", "validate_json"):
-                        validation_result = load_json(tool_result)
-                        if "success" in validation_result:
-                            # Only return if we have a valid JSON and it's from the validator
-                            return validation_result["response"]
-                except Exception as e:
-                    tool_result = str(e)
-                    is_error = True
-
-                messages.append({"role": "assistant", "content": content_blocks})
-                messages.append({
-                    "role": "user",
-                    "content": [{
-                        "type": "tool_result",
-                        "tool_use_id": tool_use_id,
-                        "content": [{"type": "text", "text": tool_result}],
-                        "is_error": is_error
-                    }]
-                })
-                break
-
-        if not found_tool_use:
+        if cancel_event is not None and cancel_event.is_set():
+            raise AgentCancelled("The request was cancelled")
+        turn += 1
+        params = dict(system=system_instructions, model=model, max_tokens=max_tokens, tools=functions,
+                      messages=messages.messages)
+        with span("agent_turn", turn=turn, context_tokens=messages.total_tokens) as turn_span:
+            if stream:
+                emit("turn_started", turn=turn)
+                response = stream_message(lambda text: emit("token", turn=turn, text=text), **params)
+            else:
+                response = create_message(**params)
+
+            content_blocks = response.content
+            tool_uses = [block for block in content_blocks if block.type == 'tool_use']
+            turn_span.set(tool_calls=len(tool_uses))
+        if stream:
+            emit("turn_finished", turn=turn, tool_calls=len(tool_uses))
+
+        if not tool_uses:
             return " ".join([x.text for x in content_blocks])
-            messages.append({
-                "role": "user",
-                "content": [{
-                    "type": "text",
-                    "text": "Please validate your response is properly formatted JSON. Respond only with a json or the function will fail."
-                }]
-            })
\ No newline at end of file
+
+        tool_results, final_result = run_tools_concurrently(tool_uses, tool_executor, cancel_event)
+        if final_result is not None:
+            return final_result
+
+        messages.append({"role": "assistant", "content": content_blocks})
+        messages.append({"role": "user", "content": tool_results})
+
+
+def run_tool(tool_name, tool_input, tool_executor):
+    """
+    Runs a single tool call.
+
+    Returns a (tool_result, is_error, final_result) tuple, where final_result is set
+    when the tool output should end the agent loop.
+    """
+    emit("tool_started", tool=tool_name, input=tool_input)
+    started = time.monotonic()
+    with span("tool", tool=tool_name) as tool_span:
+        tool_result, is_error, final_result = _run_tool(tool_name, tool_input, tool_executor)
+        tool_span.set(error=is_error, chars=len(tool_result) if isinstance(tool_result, str) else 0)
+    emit("tool_finished", tool=tool_name, seconds=round(time.monotonic() - started, 3), is_error=is_error,
+         chars=len(tool_result) if isinstance(tool_result, str) else 0)
+    return tool_result, is_error, final_result
+
+
+def _run_tool(tool_name, tool_input, tool_executor):
+    try:
+        tool_result = enhanced_tool_executor(tool_name, tool_input, tool_executor)
+        if tool_name == "call_gbq_function":
+            if not tool_result.startswith("ERROR") and len(tool_result) > 2:
+                return tool_result, False, tool_result
+
+        if tool_name in ("validator", "validate_json"):
+            validation_result = load_json(tool_result)
+            if "success" in validation_result:
+                # Only return if we have a valid JSON and it's from the validator
+                return tool_result, False, json.dumps(validation_result["result"])
+            return tool_result, True, None
+    except Exception as e:
+        return str(e), True, None
+    return tool_result, isinstance(tool_result, str) and tool_result.startswith("ERROR"), None
+
+
+def wait_for_tool(future, deadline, cancel_event=None):
+    """
+    Waits for a tool's future until `deadline` (time.monotonic()), raising AgentCancelled
+    as soon as `cancel_event` is set.
+    """
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            raise AgentCancelled("The request was cancelled")
+        remaining = deadline - time.monotonic()
+        try:
+            return future.result(timeout=max(0, min(TOOL_POLL_INTERVAL, remaining)))
+        except TimeoutError:
+            if remaining <= TOOL_POLL_INTERVAL:
+                raise
+
+
+def run_tools_concurrently(tool_uses, tool_executor, cancel_event=None):
+    """
+    Runs every tool_use block of a model turn in parallel, each with its own timeout.
+
+    Returns a (tool_results, final_result) tuple: the tool_result content blocks in
+    the order the model requested them, and the first result that ends the loop, if any.
+    Raises AgentCancelled if `cancel_event` is set while the tools run.
+    """
+    # A fresh pool per turn, so nested agents running inside a tool never wait on their parent's workers
+    executor = ThreadPoolExecutor(max_workers=len(tool_uses))
+    started = time.monotonic()
+    futures = [submit_in_context(executor, run_tool, block.name, block.input, tool_executor) for block in tool_uses]
+
+    tool_results = []
+    final_result = None
+    try:
+        for block, future in zip(tool_uses, futures):
+            timeout = TOOL_TIMEOUTS.get(block.name, TOOL_TIMEOUT)
+            try:
+                tool_result, is_error, result = wait_for_tool(future, started + timeout, cancel_event)
+            except TimeoutError:
+                tool_result, is_error, result = f"ERROR: {block.name} timed out after {timeout} seconds", True, None
+            if final_result is None:
+                final_result = result
+            tool_results.append({
+                "type": "tool_result",
+                "tool_use_id": block.id,
+                "content": [{"type": "text", "text": tool_result}],
+                "is_error": is_error
+            })
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return tool_results, final_result
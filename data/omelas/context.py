@@ -0,0 +1,95 @@
+import json
+import os
+import re
+
+from data_sources.rate_limit import estimate_tokens
+
+# Once the history grows past this many (estimated) tokens, older tool results are condensed
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 60000))
+DIGEST_EXCERPT_CHARS = 600
+URL_PATTERN = re.compile(r"https?://[^\s\"'<>()\[\]{}\\,]+")
+
+
+def block_text(block):
+    """
+    Text carried by a content block, whether it is a dict or an SDK block object.
+    """
+    if not isinstance(block, dict):
+        block = block.model_dump() if hasattr(block, "model_dump") else vars(block)
+    if block.get("type") == "tool_result":
+        return "".join(block_text(part) for part in block.get("content", []))
+    if block.get("type") == "tool_use":
+        return json.dumps(block.get("input"), ensure_ascii=False)
+    return block.get("text") or ""
+
+
+def message_tokens(message):
+    """
+    Estimated token count of a message.
+    """
+    content = message["content"]
+    if isinstance(content, str):
+        return estimate_tokens(content)
+    return sum(estimate_tokens(block_text(block)) for block in content)
+
+
+def digest_tool_result(text, tool_use_id):
+    """
+    Condenses a tool result to a short excerpt plus every URL it contained, so the
+    model can still cite its sources after the full text is dropped.
+    """
+    urls = list(dict.fromkeys(url.rstrip(".;:") for url in URL_PATTERN.findall(text)))
+    excerpt = " ".join(text[:DIGEST_EXCERPT_CHARS].split())
+    digest = f"[Condensed earlier tool result {tool_use_id}, originally {len(text)} characters] {excerpt}…"
+    if urls:
+        digest += "\nSources: " + " ".join(urls)
+    return digest
+
+
+class MessageHistory:
+    """
+    Agent message list that tracks an estimated token count per message.
+
+    When the total passes `budget`, the oldest tool results are replaced by digests
+    (see digest_tool_result) until the history fits again. The latest turn is never
+    condensed, and neither are the prompt or the model's own messages.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget or CONTEXT_TOKEN_BUDGET
+        self.messages = []
+        self.tokens = []
+        self._compacted = set()
+
+    @property
+    def total_tokens(self):
+        return sum(self.tokens)
+
+    def append(self, message):
+        self.messages.append(message)
+        self.tokens.append(message_tokens(message))
+        self.compact()
+
+    def compact(self):
+        # Only tool results before the latest assistant/user exchange are candidates
+        for index in range(len(self.messages) - 2):
+            if self.total_tokens <= self.budget:
+                return
+            message = self.messages[index]
+            if message["role"] != "user" or isinstance(message["content"], str):
+                continue
+            compacted = False
+            content = []
+            for block in message["content"]:
+                if (isinstance(block, dict) and block.get("type") == "tool_result"
+                        and block["tool_use_id"] not in self._compacted):
+                    text = block_text(block)
+                    if len(text) > DIGEST_EXCERPT_CHARS * 2:
+                        digest = digest_tool_result(text, block["tool_use_id"])
+                        block = {**block, "content": [{"type": "text", "text": digest}]}
+                        self._compacted.add(block["tool_use_id"])
+                        compacted = True
+                content.append(block)
+            if compacted:
+                self.messages[index] = {**message, "content": content}
+                self.tokens[index] = message_tokens(self.messages[index])
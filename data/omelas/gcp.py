@@ -1,9 +1,46 @@
+import datetime
+import json
+import random
+import threading
 import time
+from concurrent.futures import TimeoutError
 
 from google.cloud import bigquery
-from google.api_core.exceptions import BadRequest, InternalServerError
+from google.api_core.exceptions import BadRequest, InternalServerError, ServiceUnavailable
 import os
 
+from data.omelas.mirror import OMELAS_BACKEND, run_local_query
+from data.omelas.results import GBQ_PAGE_SIZE, collect_rows
+from data.omelas.sql import normalize_sql, partition_count, pdate_window
+from data_sources.cache import MISS, SQLiteCache
+from telemetry.accounting import record
+from telemetry.cancellation import current_cancel_event
+from telemetry.cassette import cassette_call
+from telemetry.events import emit
+from telemetry.tracing import span
+
+# Retry and timeout settings for BigQuery jobs
+GBQ_MAX_RETRIES = int(os.getenv("GBQ_MAX_RETRIES", 4))
+GBQ_BACKOFF_BASE = 2  # seconds
+GBQ_BACKOFF_MAX = 30  # seconds
+GBQ_QUERY_TIMEOUT = float(os.getenv("GBQ_QUERY_TIMEOUT", 120))  # seconds
+GBQ_POLL_INTERVAL = 1  # seconds between cancellation checks
+
+# Cost guard: queries estimated above these limits are rejected before they run
+GBQ_MAXIMUM_BYTES_BILLED = int(os.getenv("GBQ_MAXIMUM_BYTES_BILLED", 10 * 1024 ** 3))
+GBQ_MAX_PARTITIONS = int(os.getenv("GBQ_MAX_PARTITIONS", 92))
+
+# Result cache: windows touching the latest partitions are still being filled, older ones are final
+GBQ_CACHE_TTL_RECENT = float(os.getenv("GBQ_CACHE_TTL_RECENT", 15 * 60))
+GBQ_CACHE_TTL_HISTORICAL = float(os.getenv("GBQ_CACHE_TTL_HISTORICAL", 7 * 24 * 60 * 60))
+GBQ_CACHE_FRESH_DAYS = 2  # partitions this close to today may still receive rows
+GBQ_CACHE_MAX_BYTES = int(os.getenv("GBQ_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+gbq_cache = SQLiteCache("gbq", max_bytes=GBQ_CACHE_MAX_BYTES)
+
+_bigquery_client = None
+_bigquery_client_lock = threading.Lock()
+
 
 def initialize_bigquery_client():
     """
@@ -27,35 +64,222 @@ def initialize_bigquery_client():
     return client
 
 
-def call_gbq_function(query):
+def get_bigquery_client():
+    """
+    Returns the process-wide BigQuery client, created on first use. The client is
+    thread-safe, so every query shares its credentials and HTTP session.
+
+    Returns:
+        google.cloud.bigquery.Client: BigQuery client instance.
+    """
+    global _bigquery_client
+    with _bigquery_client_lock:
+        if _bigquery_client is None:
+            _bigquery_client = initialize_bigquery_client()
+        return _bigquery_client
+
+
+def backoff_delay(attempt):
+    """
+    Exponential backoff with full jitter for the given retry attempt (starting at 0).
+    """
+    return random.uniform(0, min(GBQ_BACKOFF_MAX, GBQ_BACKOFF_BASE * 2 ** attempt))
+
+
+def format_bytes(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+def query_parameters(params):
+    """
+    BigQuery query parameters for a dict of @name values: strings, numbers, dates or
+    lists of strings.
+    """
+    types = {str: "STRING", int: "INT64", float: "FLOAT64", bool: "BOOL", datetime.date: "DATE"}
+    parameters = []
+    for name, value in (params or {}).items():
+        if isinstance(value, (list, tuple)):
+            parameters.append(bigquery.ArrayQueryParameter(name, "STRING", list(value)))
+        else:
+            parameters.append(bigquery.ScalarQueryParameter(name, types[type(value)], value))
+    return parameters
+
+
+def check_query_cost(bigquery_client, query, params=None):
+    """
+    Rejects queries that would read too many pdate partitions or bytes. The byte
+    estimate comes from a free dry run of the query. Queries whose pdate range cannot
+    be read from the SQL (e.g. `pdate >= @start`) only get the byte check.
+
+    Parameters
+    ----------
+    bigquery_client: BigQuery client used for the dry run
+    query: string query to be checked
+    params: values of the query's @name parameters
+
+    Returns: None if the query may run, otherwise an error string starting with "ERROR"
+    -------
+    """
+    window = pdate_window(query)
+    partitions = partition_count(window) if window is not None else 0
+    if partitions > GBQ_MAX_PARTITIONS:
+        return (f"ERROR: Query rejected because it reads {partitions} daily pdate partitions "
+                f"({window[0]} to {window[1]}), above the limit of {GBQ_MAX_PARTITIONS}. Narrow the pdate range.")
+
+    dry_run_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False,
+                                             query_parameters=query_parameters(params))
+    dry_run = bigquery_client.query(query, job_config=dry_run_config)
+    estimated_bytes = dry_run.total_bytes_processed or 0
+    record(bigquery_dry_runs=1)
+    print(f"Estimated bytes processed: {format_bytes(estimated_bytes)}")
+    if estimated_bytes > GBQ_MAXIMUM_BYTES_BILLED:
+        return (f"ERROR: Query rejected because it would process {format_bytes(estimated_bytes)}, above the limit "
+                f"of {format_bytes(GBQ_MAXIMUM_BYTES_BILLED)}. Narrow the pdate range, add filters on section or "
+                f"ner_data, or avoid unnecessary UNNEST joins on lemmata and bigrams.")
+    return None
+
+
+def result_cache_ttl(query, today):
+    """
+    Seconds a query result may be cached, based on the newest pdate partition it reads.
+    """
+    window = pdate_window(query, today)
+    if window is None or window[1] > today - datetime.timedelta(days=GBQ_CACHE_FRESH_DAYS):
+        return GBQ_CACHE_TTL_RECENT
+    return GBQ_CACHE_TTL_HISTORICAL
+
+
+def wait_for_job(query_job, timeout, cancel_event=None):
+    """
+    Waits for a query job, cancelling it if it runs past `timeout` seconds or
+    `cancel_event` is set.
+
+    Returns
+    -------
+    The job's RowIterator.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            query_job.cancel()
+            raise TimeoutError("Query was cancelled")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            query_job.cancel()
+            raise TimeoutError(f"Query did not finish within {timeout} seconds and was cancelled")
+        try:
+            return query_job.result(timeout=min(GBQ_POLL_INTERVAL, remaining), page_size=GBQ_PAGE_SIZE)
+        except TimeoutError:
+            continue
+
+
+def call_gbq_function(query, timeout=None, cancel_event=None, params=None):
     """
     This function calls the BigQuery API and returns the results. The API is finnicky,
-    so failures are often overcome by just trying again
+    so transient server errors are retried with exponential backoff and jitter, up to
+    GBQ_MAX_RETRIES times. Queries are dry-run first and rejected if they exceed the
+    partition or bytes limits, and the real job is capped at GBQ_MAXIMUM_BYTES_BILLED.
+    Results are cached by normalized SQL with CURRENT_DATE resolved to today's date.
+    With OMELAS_BACKEND set to "auto" or "local", queries are first run on the local
+    DuckDB mirror (see data.omelas.mirror) when it covers their pdate range.
 
     Parameters
     ----------
     query: string query to be passed to the API
+    timeout: seconds the query may run before it is cancelled, defaults to GBQ_QUERY_TIMEOUT
+    cancel_event: threading.Event that cancels the running query when set, defaults to
+    the current report's (see telemetry.cancellation)
+    params: values of the query's @name parameters, see query_parameters
 
-    Returns: json response
+    Returns: compact result from collect_rows (capped at GBQ_MAX_ROWS rows), or an error
+    string starting with "ERROR" the model can react to
     -------
     """
-    bigquery_client = initialize_bigquery_client()
-    query_job = bigquery_client.query(query)
+    if cancel_event is None:
+        cancel_event = current_cancel_event()
+    request = {"query": query, "params": params} if params else {"query": query}
+    return cassette_call("bigquery", request, lambda: _call_gbq_function(query, timeout, cancel_event, params))
+
+
+def _call_gbq_function(query, timeout=None, cancel_event=None, params=None):
+    timeout = timeout or GBQ_QUERY_TIMEOUT
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    cache_key = normalize_sql(query, today)
+    if params:
+        cache_key += " " + json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    cached = gbq_cache.get(cache_key)
+    if cached is not MISS:
+        emit("rows_returned", rows=len(cached["rows"]), truncated=cached["truncated"], cached=True)
+        return cached
+
+    if OMELAS_BACKEND in ("auto", "local"):
+        try:
+            with span("local_query") as local_span:
+                result = run_local_query(query, today, params=params)
+                local_span.set(rows=len(result["rows"]))
+            record(local_queries=1)
+            emit("rows_returned", rows=len(result["rows"]), truncated=result["truncated"], cached=False,
+                 backend="local")
+            return result
+        except Exception as e:
+            # MirrorUnavailable, or SQL the DuckDB translation does not cover
+            if OMELAS_BACKEND == "local":
+                return f"ERROR: {e}"
+            print(f"Local mirror not used, querying BigQuery: {e}")
+
+    if cancel_event is not None and cancel_event.is_set():
+        return "ERROR: Query was cancelled"
+    bigquery_client = get_bigquery_client()
     try:
-        return [x for x in query_job.result()]
-    except InternalServerError as e:
-        print(f"ERROR: {e}")
-        time.sleep(2)
-        return call_gbq_function(query)
+        error = check_query_cost(bigquery_client, query, params)
     except BadRequest as e:
-        print(f"ERROR: {e}")
-        return str(e)
+        error = f"ERROR: {e}"
+    except Exception as e:
+        # The dry run is only an estimate; maximum_bytes_billed still caps the real job
+        print(f"Dry run failed: {e}")
+        error = None
+    if error:
+        print(error)
+        return error
+
+    job_config = bigquery.QueryJobConfig(maximum_bytes_billed=GBQ_MAXIMUM_BYTES_BILLED,
+                                         query_parameters=query_parameters(params))
+    for attempt in range(GBQ_MAX_RETRIES + 1):
+        try:
+            with span("bigquery_job", attempt=attempt) as job_span:
+                query_job = bigquery_client.query(query, job_config=job_config)
+                record(bigquery_jobs=1)
+                result = collect_rows(wait_for_job(query_job, timeout, cancel_event))
+                processed_bytes = getattr(query_job, "total_bytes_processed", None) or 0
+                billed_bytes = getattr(query_job, "total_bytes_billed", None) or 0
+                record(bigquery_processed_bytes=processed_bytes, bigquery_billed_bytes=billed_bytes,
+                       bigquery_rows=len(result["rows"]))
+                job_span.set(rows=len(result["rows"]), truncated=result["truncated"],
+                             processed_bytes=processed_bytes, billed_bytes=billed_bytes)
+            gbq_cache.set(cache_key, result, ttl=result_cache_ttl(query, today))
+            emit("rows_returned", rows=len(result["rows"]), truncated=result["truncated"], cached=False)
+            return result
+        except (InternalServerError, ServiceUnavailable) as e:
+            print(f"ERROR: {e}")
+            if attempt == GBQ_MAX_RETRIES:
+                return f"ERROR: BigQuery failed after {attempt + 1} attempts: {e}"
+            time.sleep(backoff_delay(attempt))
+        except TimeoutError as e:
+            print(f"ERROR: {e}")
+            return f"ERROR: {e}"
+        except BadRequest as e:
+            print(f"ERROR: {e}")
+            return f"ERROR: {e}"
 
 
 # Example usage
 if __name__ == "__main__":
     # Initialize the BigQuery client
-    bigquery_client = initialize_bigquery_client()
+    bigquery_client = get_bigquery_client()
 
     # Example operation: List datasets in the project
     res = [x for x in bigquery_client.query("SELECT * FROM `atreus.main` LIMIT 5").result()]
@@ -0,0 +1,167 @@
+"""
+Local DuckDB mirror of the most recent hack.main partitions.
+
+Sync it with `python -m data.omelas.mirror --days 30` (needs duckdb and pyarrow), then
+set OMELAS_BACKEND=auto so call_gbq_function answers queries whose pdate range the
+mirror covers locally, or OMELAS_BACKEND=local to never touch BigQuery.
+"""
+import argparse
+import datetime
+import os
+
+from data.omelas.results import GBQ_PAGE_SIZE, collect_rows
+from data.omelas.sql import partition_count, pdate_window, to_duckdb
+
+# "bigquery", "auto" (use the mirror when it covers the query's pdate range) or "local"
+OMELAS_BACKEND = os.getenv("OMELAS_BACKEND", "bigquery")
+MIRROR_PATH = os.getenv("MIRROR_PATH", os.path.join(".cache", "omelas_mirror.duckdb"))
+MIRROR_DAYS = int(os.getenv("MIRROR_DAYS", 30))
+MIRROR_REFRESH_DAYS = 2  # the latest partitions are re-synced, they may still receive rows
+SOURCE_TABLE = "hack.main"
+LOCAL_TABLE = "main"
+PARTITIONS_TABLE = "mirror_partitions"
+
+
+class MirrorUnavailable(Exception):
+    pass
+
+
+def connect(path=None, read_only=True):
+    """
+    Opens the mirror database. duckdb is imported here so it stays an optional dependency.
+    """
+    try:
+        import duckdb
+    except ImportError:
+        raise MirrorUnavailable("duckdb is not installed")
+    path = path or MIRROR_PATH
+    if read_only and not os.path.exists(path):
+        raise MirrorUnavailable(f"No local mirror at {path}, run `python -m data.omelas.mirror` first")
+    if not read_only and os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        return duckdb.connect(path, read_only=read_only)
+    except duckdb.IOException as e:
+        # e.g. a sync holds the write lock
+        raise MirrorUnavailable(f"Local mirror is not readable: {e}")
+
+
+def synced_dates(conn):
+    tables = {row[0] for row in conn.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+    if PARTITIONS_TABLE not in tables or LOCAL_TABLE not in tables:
+        return set()
+    return {row[0] for row in conn.execute(f"SELECT pdate FROM {PARTITIONS_TABLE}").fetchall()}
+
+
+def scalar_array_columns(conn):
+    """
+    Array columns of the mirror whose elements are plain values rather than structs.
+    """
+    rows = conn.execute(
+        "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = ?", [LOCAL_TABLE]
+    ).fetchall()
+    return [name for name, data_type in rows if data_type.endswith("[]") and not data_type.startswith("STRUCT")]
+
+
+def run_local_query(query, today=None, path=None, params=None):
+    """
+    Runs a BigQuery query against the mirror, if it holds every partition the query reads.
+
+    Parameters
+    ----------
+    query: BigQuery SQL as generated by the Omelas agent
+    today: date CURRENT_DATE resolves to, defaults to today (UTC)
+    path: mirror database, defaults to MIRROR_PATH
+    params: values of the query's @name parameters
+
+    Returns: compact result from collect_rows, like call_gbq_function
+    Raises: MirrorUnavailable if the mirror is missing or does not cover the pdate range
+    -------
+    """
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    window = pdate_window(query, today)
+    if window is None:
+        raise MirrorUnavailable("Query has no pdate filter")
+    conn = connect(path)
+    try:
+        dates = synced_dates(conn)
+        missing = [window[0] + datetime.timedelta(days=i) for i in range(partition_count(window))
+                   if window[0] + datetime.timedelta(days=i) not in dates]
+        if missing:
+            raise MirrorUnavailable(f"Mirror lacks {len(missing)} of the pdate partitions {window[0]} to {window[1]}")
+        sql = to_duckdb(query, SOURCE_TABLE, LOCAL_TABLE, scalar_array_columns(conn), today)
+        cursor = conn.execute(sql, params or None)
+        columns = [column[0] for column in cursor.description]
+
+        def rows():
+            while True:
+                page = cursor.fetchmany(GBQ_PAGE_SIZE)
+                if not page:
+                    return
+                for values in page:
+                    yield dict(zip(columns, values))
+
+        return collect_rows(rows())
+    finally:
+        conn.close()
+
+
+def sync_mirror(days=None, path=None, today=None):
+    """
+    Copies the last `days` pdate partitions of hack.main into the mirror, keeping the
+    BigQuery schema (repeated fields become DuckDB lists of structs). Partitions
+    already synced are skipped except for the latest MIRROR_REFRESH_DAYS, and
+    partitions that fell out of the window are dropped.
+
+    Returns: dict with the number of partitions and rows copied
+    -------
+    """
+    # Imported here: gcp imports this module for the backend switch
+    from google.cloud import bigquery
+    from data.omelas.gcp import GBQ_MAXIMUM_BYTES_BILLED, get_bigquery_client
+
+    days = days or MIRROR_DAYS
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    start = today - datetime.timedelta(days=days - 1)
+    bigquery_client = get_bigquery_client()
+    conn = connect(path, read_only=False)
+    partitions = rows = 0
+    try:
+        dates = synced_dates(conn)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {PARTITIONS_TABLE} "
+                     "(pdate DATE PRIMARY KEY, row_count BIGINT, synced_at TIMESTAMP)")
+        for offset in range(days):
+            day = start + datetime.timedelta(days=offset)
+            if day in dates and day < today - datetime.timedelta(days=MIRROR_REFRESH_DAYS - 1):
+                continue
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[bigquery.ScalarQueryParameter("pdate", "DATE", day)],
+                maximum_bytes_billed=GBQ_MAXIMUM_BYTES_BILLED,
+            )
+            batch = bigquery_client.query(f"SELECT * FROM `{SOURCE_TABLE}` WHERE pdate = @pdate",
+                                          job_config=job_config).to_arrow()
+            conn.register("batch", batch)
+            conn.execute("BEGIN TRANSACTION")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {LOCAL_TABLE} AS SELECT * FROM batch LIMIT 0")
+            conn.execute(f"DELETE FROM {LOCAL_TABLE} WHERE pdate = ?", [day])
+            conn.execute(f"INSERT INTO {LOCAL_TABLE} BY NAME SELECT * FROM batch")
+            conn.execute(f"INSERT OR REPLACE INTO {PARTITIONS_TABLE} VALUES (?, ?, now())", [day, batch.num_rows])
+            conn.execute("COMMIT")
+            conn.unregister("batch")
+            print(f"Synced pdate {day}: {batch.num_rows} rows")
+            partitions += 1
+            rows += batch.num_rows
+        if synced_dates(conn):
+            conn.execute(f"DELETE FROM {LOCAL_TABLE} WHERE pdate < ?", [start])
+            conn.execute(f"DELETE FROM {PARTITIONS_TABLE} WHERE pdate < ?", [start])
+    finally:
+        conn.close()
+    return {"partitions": partitions, "rows": rows}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync recent hack.main partitions into the local DuckDB mirror.")
+    parser.add_argument("--days", type=int, default=MIRROR_DAYS, help="number of daily pdate partitions to keep")
+    parser.add_argument("--path", default=MIRROR_PATH, help="mirror database file")
+    args = parser.parse_args()
+    print(sync_mirror(args.days, args.path))
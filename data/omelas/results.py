@@ -0,0 +1,93 @@
+import datetime
+import decimal
+import json
+import os
+
+# Limits on what a single query hands back to the model
+GBQ_PAGE_SIZE = 100
+GBQ_MAX_ROWS = int(os.getenv("GBQ_MAX_ROWS", 200))
+GBQ_MAX_RESULT_BYTES = int(os.getenv("GBQ_MAX_RESULT_BYTES", 60000))
+GBQ_MAX_TEXT_CHARS = int(os.getenv("GBQ_MAX_TEXT_CHARS", 600))
+
+
+def to_json_value(value, max_text_chars):
+    """
+    Converts a BigQuery cell to a JSON-friendly value, truncating long strings.
+    """
+    if isinstance(value, str):
+        return value if len(value) <= max_text_chars else value[:max_text_chars] + "…"
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    if isinstance(value, dict):
+        return {k: to_json_value(v, max_text_chars) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(v, max_text_chars) for v in value]
+    return value
+
+
+def collect_rows(rows, max_rows=None, max_bytes=None, max_text_chars=None):
+    """
+    Reads query rows page by page until the row cap or byte budget is reached, so a
+    huge result set is never fully materialized.
+
+    Rows identical to one already kept are dropped; they typically come from UNNEST
+    joins that match the same post several times. Rows that differ in any selected
+    column (e.g. the same post in two ner_data entries) are all kept.
+
+    Parameters
+    ----------
+    rows: iterable of bigquery.Row (e.g. a RowIterator) or mappings
+    max_rows: maximum number of rows to keep, defaults to GBQ_MAX_ROWS
+    max_bytes: approximate JSON size budget for the kept rows, defaults to GBQ_MAX_RESULT_BYTES
+    max_text_chars: strings longer than this are truncated, defaults to GBQ_MAX_TEXT_CHARS
+
+    Returns: dict with "columns", "rows" (lists of values), "truncated" and "duplicates_removed"
+    -------
+    """
+    max_rows = max_rows or GBQ_MAX_ROWS
+    max_bytes = max_bytes or GBQ_MAX_RESULT_BYTES
+    max_text_chars = max_text_chars or GBQ_MAX_TEXT_CHARS
+
+    columns = None
+    kept = []
+    seen = set()
+    duplicates = 0
+    size = 0
+    truncated = False
+    for row in rows:
+        row = dict(row.items())
+        if columns is None:
+            columns = list(row)
+        values = [to_json_value(row.get(column), max_text_chars) for column in columns]
+        encoded = json.dumps(values, ensure_ascii=False)
+        if encoded in seen:
+            duplicates += 1
+            continue
+        row_size = len(encoded)
+        if len(kept) >= max_rows or size + row_size > max_bytes:
+            truncated = True
+            break
+        seen.add(encoded)
+        kept.append(values)
+        size += row_size
+
+    return {
+        "columns": columns or [],
+        "rows": kept,
+        "truncated": truncated,
+        "duplicates_removed": duplicates,
+    }
+
+
+def serialize_result(result):
+    """
+    Compact JSON for the model: column names once, then one array per row.
+    An empty result serializes to "[]" so the agent loop asks the model to broaden the query.
+    """
+    if not result["rows"]:
+        return "[]"
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,223 @@
+import datetime
+import re
+
+# A date expression as written by the QUERY_GEN prompt, e.g. DATE_SUB(CURRENT_DATE, INTERVAL 14 DAY)
+DATE_EXPR = (
+    r"(DATE_(?:SUB|ADD)\s*\(\s*CURRENT_DATE(?:\s*\(\s*\))?\s*,\s*INTERVAL\s+\d+\s+\w+\s*\)"
+    r"|CURRENT_DATE(?:\s*\(\s*\))?"
+    r"|DATE\s*\(\s*['\"]\d{4}-\d{2}-\d{2}['\"]\s*\)"
+    r"|(?:DATE\s+)?['\"]\d{4}-\d{2}-\d{2}['\"])"
+)
+# pdate, optionally qualified by a table alias or wrapped in DATE(), e.g. DATE(t.pdate)
+PDATE_COLUMN = r"(?:\bDATE\s*\(\s*)?(?:\b\w+\.)?\bpdate\b(?:\s*\))?"
+PDATE_COMPARISON = re.compile(PDATE_COLUMN + r"\s*(>=|>|<=|<|=)\s*" + DATE_EXPR, re.IGNORECASE)
+PDATE_BETWEEN = re.compile(PDATE_COLUMN + r"\s+BETWEEN\s+" + DATE_EXPR + r"\s+AND\s+" + DATE_EXPR, re.IGNORECASE)
+PDATE_IN = re.compile(PDATE_COLUMN + r"\s+IN\s*\(([^()]*(?:\([^()]*\)[^()]*)*)\)", re.IGNORECASE)
+INTERVAL_EXPR = re.compile(
+    r"DATE_(SUB|ADD)\s*\(\s*CURRENT_DATE(?:\s*\(\s*\))?\s*,\s*INTERVAL\s+(\d+)\s+(\w+)\s*\)", re.IGNORECASE
+)
+DATE_LITERAL = re.compile(r"['\"](\d{4}-\d{2}-\d{2})['\"]")
+SQL_TOKEN = re.compile(
+    r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|--[^\n]*|/\*.*?\*/|\s+|[^'\"\s/-]+|.",
+    re.DOTALL,
+)
+CURRENT_DATE = re.compile(r"\bcurrent_date\b(?:\s*\(\s*\))?")
+
+# BigQuery -> DuckDB rewrites for running generated queries against the local mirror
+STRING_LITERAL = re.compile(r"(?:\b[rR])?('(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\")")
+LITERAL_PLACEHOLDER = re.compile(r"\x00(\d+)\x00")
+CURRENT_DATE_ANY_CASE = re.compile(r"\bCURRENT_DATE\b(?:\s*\(\s*\))?", re.IGNORECASE)
+DATE_ARITHMETIC = re.compile(
+    r"\bDATE_(SUB|ADD)\s*\(\s*([^,()]+?)\s*,\s*INTERVAL\s+(-?\d+)\s+(\w+)\s*\)", re.IGNORECASE
+)
+DATE_FUNCTION = re.compile(r"\bDATE\s*\(\s*([^()]+?)\s*\)", re.IGNORECASE)
+IN_UNNEST = re.compile(r"\bIN\s+UNNEST\s*\(\s*([^()]+?)\s*\)", re.IGNORECASE)
+FROM_UNNEST = re.compile(
+    r"(\bJOIN|\bFROM|,)\s*UNNEST\s*\(\s*([^()]+?)\s*\)"
+    r"(?:\s+AS\s+(\w+)|\s+(?!(?:ON|WHERE|JOIN|CROSS|LEFT|INNER|GROUP|ORDER|LIMIT|WITH)\b)(\w+))?",
+    re.IGNORECASE,
+)
+BACKTICK_IDENTIFIER = re.compile(r"`([^`]*)`")
+QUERY_PARAMETER = re.compile(r"@(\w+)")
+FUNCTION_RENAMES = {
+    "SAFE_CAST": "TRY_CAST",
+    "ARRAY_LENGTH": "len",
+    "REGEXP_CONTAINS": "regexp_matches",
+    "COUNTIF": "count_if",
+}
+FUNCTION_CALL = re.compile(r"\b(" + "|".join(FUNCTION_RENAMES) + r")\s*\(", re.IGNORECASE)
+
+
+def shift_date(date, amount, unit):
+    """
+    Adds `amount` (possibly negative) DAY/WEEK/MONTH/QUARTER/YEAR units to a date,
+    clamping to the end of the month like BigQuery does.
+    """
+    unit = unit.upper()
+    if unit == "DAY":
+        return date + datetime.timedelta(days=amount)
+    if unit == "WEEK":
+        return date + datetime.timedelta(weeks=amount)
+    months = {"MONTH": 1, "QUARTER": 3, "YEAR": 12}.get(unit)
+    if months is None:
+        raise ValueError(f"Unsupported interval unit: {unit}")
+    month_index = date.year * 12 + date.month - 1 + amount * months
+    year, month = divmod(month_index, 12)
+    month += 1
+    next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+    last_day = (next_month - datetime.timedelta(days=1)).day
+    return datetime.date(year, month, min(date.day, last_day))
+
+
+def parse_date_expr(expr, today):
+    """
+    Evaluates a DATE_EXPR match to a datetime.date.
+    """
+    interval = INTERVAL_EXPR.fullmatch(expr.strip())
+    if interval:
+        direction, amount, unit = interval.groups()
+        amount = int(amount) if direction.upper() == "ADD" else -int(amount)
+        return shift_date(today, amount, unit)
+    literal = DATE_LITERAL.search(expr)
+    if literal:
+        return datetime.date.fromisoformat(literal.group(1))
+    return today
+
+
+def normalize_sql(query, today=None):
+    """
+    Normalizes a query for use as a cache key: comments are removed, whitespace is
+    collapsed, everything outside string literals is lower-cased, and CURRENT_DATE
+    is replaced by the date it resolves to.
+
+    Parameters
+    ----------
+    query: SQL query
+    today: date CURRENT_DATE resolves to, defaults to today (UTC)
+
+    Returns: normalized query string
+    -------
+    """
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    parts = []
+    for token in SQL_TOKEN.findall(query):
+        if token.startswith(("'", '"')):
+            parts.append(token)
+        elif token.startswith(("--", "/*")) or token.isspace():
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+        else:
+            parts.append(token.lower())
+    normalized = "".join(parts).strip().rstrip(";").strip()
+    return CURRENT_DATE.sub(f"date '{today.isoformat()}'", normalized)
+
+
+def pdate_window(query, today=None):
+    """
+    Finds the range of `pdate` partitions a query reads from its pdate predicates.
+
+    When a query has several predicates (CTEs, OR branches) the widest window is
+    returned, which keeps cost checks conservative.
+
+    Parameters
+    ----------
+    query: SQL query
+    today: date CURRENT_DATE resolves to, defaults to today (UTC)
+
+    Returns: (start, end) tuple of datetime.date, or None if no lower bound on pdate was found
+    -------
+    """
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    lower_bounds, upper_bounds = [], []
+    for operator, expr in PDATE_COMPARISON.findall(query):
+        date = parse_date_expr(expr, today)
+        if operator in (">", ">="):
+            lower_bounds.append(date + datetime.timedelta(days=1) if operator == ">" else date)
+        elif operator in ("<", "<="):
+            upper_bounds.append(date - datetime.timedelta(days=1) if operator == "<" else date)
+        else:
+            lower_bounds.append(date)
+            upper_bounds.append(date)
+    for start, end in PDATE_BETWEEN.findall(query):
+        lower_bounds.append(parse_date_expr(start, today))
+        upper_bounds.append(parse_date_expr(end, today))
+    for values in PDATE_IN.findall(query):
+        dates = [parse_date_expr(value, today) for value in re.findall(DATE_EXPR, values, re.IGNORECASE)]
+        if dates:
+            lower_bounds.append(min(dates))
+            upper_bounds.append(max(dates))
+
+    if not lower_bounds:
+        return None
+    if len(upper_bounds) < len(lower_bounds):
+        # At least one predicate is open-ended and reads up to the latest partition
+        upper_bounds.append(today)
+    return min(lower_bounds), max(upper_bounds)
+
+
+def partition_count(window):
+    """
+    Number of daily partitions in a (start, end) window.
+    """
+    start, end = window
+    return max(0, (end - start).days + 1)
+
+
+def to_duckdb(query, source_table="hack.main", local_table="main", scalar_arrays=(), today=None):
+    """
+    Rewrites a BigQuery query produced by QUERY_GEN so it runs on the DuckDB mirror.
+
+    Covers what the prompt generates: the source table name, backtick identifiers,
+    double-quoted strings, CURRENT_DATE (pinned to `today`, UTC like BigQuery),
+    DATE_SUB/DATE_ADD and DATE(), a few renamed functions, UNNEST joins and subqueries,
+    and @name query parameters (DuckDB's $name). Arrays of
+    structs (lemmata, bigrams, ner_data) are unnested into one column per field, so
+    `ner_data.country` keeps working when the alias shadows the column.
+
+    Parameters
+    ----------
+    query: BigQuery SQL
+    source_table: BigQuery table the mirror copies, with or without a project prefix
+    local_table: name of the mirror table in DuckDB
+    scalar_arrays: names of array columns holding plain values rather than structs
+    today: date CURRENT_DATE resolves to, defaults to today (UTC)
+
+    Returns: DuckDB SQL string
+    -------
+    """
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    scalar_arrays = {name.lower() for name in scalar_arrays}
+    literals = []
+
+    def hold_literal(match):
+        literal = match.group(1)
+        if literal.startswith('"'):
+            literal = "'" + literal[1:-1].replace('\\"', '"').replace("'", "''") + "'"
+        literals.append(literal)
+        return f"\x00{len(literals) - 1}\x00"
+
+    sql = STRING_LITERAL.sub(hold_literal, query)
+    sql = re.sub(r"`?(?:[\w-]+\.)?" + re.escape(source_table) + r"`?", local_table, sql, flags=re.IGNORECASE)
+    sql = BACKTICK_IDENTIFIER.sub(r'"\1"', sql)
+    sql = CURRENT_DATE_ANY_CASE.sub(f"DATE '{today.isoformat()}'", sql)
+    sql = DATE_ARITHMETIC.sub(
+        lambda m: f"CAST(({m.group(2)} {'-' if m.group(1).upper() == 'SUB' else '+'} "
+                  f"INTERVAL {m.group(3)} {m.group(4).upper()}) AS DATE)",
+        sql,
+    )
+    sql = DATE_FUNCTION.sub(r"CAST(\1 AS DATE)", sql)
+    sql = FUNCTION_CALL.sub(lambda m: FUNCTION_RENAMES[m.group(1).upper()] + "(", sql)
+    sql = QUERY_PARAMETER.sub(r"$\1", sql)
+    sql = IN_UNNEST.sub(r"IN (SELECT UNNEST(\1))", sql)
+
+    def lateral_unnest(match):
+        keyword, expr, alias = match.group(1), match.group(2), match.group(3) or match.group(4)
+        column = expr.rsplit(".", 1)[-1].strip('"').lower()
+        if column in scalar_arrays:
+            alias = alias or f"{column}_value"
+            return f"{keyword} LATERAL (SELECT UNNEST({expr}) AS {alias}) AS {alias}"
+        lateral = f"{keyword} LATERAL (SELECT UNNEST({expr}, recursive := true))"
+        return f"{lateral} AS {alias}" if alias else lateral
+
+    sql = FROM_UNNEST.sub(lateral_unnest, sql)
+    return LITERAL_PLACEHOLDER.sub(lambda m: literals[int(m.group(1))], sql).strip().rstrip(";")
@@ -0,0 +1,237 @@
+"""
+Deterministic queries for the most common Omelas questions: a section and one or more
+countries, optionally narrowed by a few keywords, e.g. "What is the latest on the war
+in Sudan?" or "drone strikes in Ukraine over the past week".
+
+classify() decides from the wording alone whether a prompt fits that shape, and
+build_query() turns the match into parameterized SQL, so these questions skip the
+LLM query-writing loop. Anything else (analytical questions, sources, people,
+regions, explicit dates) returns None and is left to the agent.
+"""
+import os
+import re
+
+OMELAS_TEMPLATES = os.getenv("OMELAS_TEMPLATES", "true").lower() == "true"
+DEFAULT_DAYS = 14
+TEMPLATE_MAX_TERMS = 4  # more leftover keywords than this need the agent's synonyms
+
+# ner_data.country value -> how prompts refer to the country
+COUNTRY_NAMES = {
+    "Ukraine": ("ukraine",),
+    "Russia": ("russia", "russian federation"),
+    "Belarus": ("belarus",),
+    "Moldova": ("moldova",),
+    "Poland": ("poland",),
+    "Germany": ("germany",),
+    "France": ("france",),
+    "Italy": ("italy",),
+    "Spain": ("spain",),
+    "United Kingdom": ("united kingdom", "uk", "great britain", "britain"),
+    "United States of America": ("united states of america", "united states", "usa", "u.s.", "america"),
+    "Canada": ("canada",),
+    "Mexico": ("mexico",),
+    "Venezuela": ("venezuela",),
+    "Cuba": ("cuba",),
+    "Brazil": ("brazil",),
+    "Serbia": ("serbia",),
+    "Kosovo": ("kosovo",),
+    "Armenia": ("armenia",),
+    "Azerbaijan": ("azerbaijan",),
+    "Kazakhstan": ("kazakhstan",),
+    "Turkey": ("turkey", "türkiye"),
+    "Syria": ("syria",),
+    "Iraq": ("iraq",),
+    "Iran": ("iran",),
+    "Israel": ("israel",),
+    "State of Palestine": ("palestine",),
+    "Lebanon": ("lebanon",),
+    "Yemen": ("yemen",),
+    "Saudi Arabia": ("saudi arabia",),
+    "Egypt": ("egypt",),
+    "Libya": ("libya",),
+    "Sudan": ("sudan",),
+    "Ethiopia": ("ethiopia",),
+    "Somalia": ("somalia",),
+    "Nigeria": ("nigeria",),
+    "Niger": ("niger",),
+    "Mali": ("mali",),
+    "Afghanistan": ("afghanistan",),
+    "Pakistan": ("pakistan",),
+    "India": ("india",),
+    "China": ("china",),
+    "Taiwan": ("taiwan",),
+    "Japan": ("japan",),
+    "South Korea": ("south korea",),
+    "Democratic People's Republic of Korea": ("north korea", "dprk"),
+    "Philippines": ("philippines",),
+    "Vietnam": ("vietnam",),
+    "Myanmar": ("myanmar", "burma"),
+}
+# Other spellings the same country is stored under
+COUNTRY_VARIANTS = {
+    "United States of America": ("United States",),
+    "Turkey": ("Türkiye",),
+    "State of Palestine": ("Palestine",),
+    "Democratic People's Republic of Korea": ("North Korea",),
+}
+SECTION_KEYWORDS = {
+    "Armed Conflict": ("armed conflict", "war", "wars", "conflict", "fighting", "military", "combat", "invasion",
+                       "offensive", "frontline", "front line"),
+    "Politics": ("politics", "political", "election", "elections", "parliament", "parliamentary"),
+}
+
+# Questions the template cannot express: rankings, trends, sources and speakers, people and
+# governments, regions and explicit dates
+UNSUPPORTED = re.compile(
+    r"\b(top|most|least|trends?|over time|how many|number of|counts?|compare|comparison|versus|vs|statistics|"
+    r"percent|percentage|share|rank|ranking|which|who|whom|sources?|channels?|telegram|outlets?|media|accounts?|"
+    r"narratives?|officials?|leaders?|president|prime minister|ministers?|government|govt|"
+    r"europe|africa|asia|middle east|balkans|sahel|caucasus|latin america|region|regions|"
+    r"today|yesterday|ago|since|before|after|between|until|during|january|february|march|april|may|june|july|"
+    r"august|september|october|november|december|(?:19|20)\d{2})\b"
+    r"|[\"“”]",
+    re.IGNORECASE,
+)
+TIME_RANGE = re.compile(
+    r"\b(?:in |over )?(?:the )?(?:last|past|previous)\s+(?:(\d+|a|one|two|three|four|five|six|few|couple of)\s+)?"
+    r"(day|week|month)s?\b",
+    re.IGNORECASE,
+)
+NUMBER_WORDS = {"a": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "few": 3, "couple of": 2}
+UNIT_DAYS = {"day": 1, "week": 7, "month": 30}
+WORD = re.compile(r"[a-z][a-z'-]*")
+STOPWORDS = frozenset("""
+a about across against all also amid an and any anything are around as at be been being by can could did do does
+for from get give go going has have how i in including into is it its latest me more new news now of on or our
+please recent recently regarding related report reports say saying says situation show so some tell that the their
+them there these they this those to up update updates developments happening what whats what's when where while
+with within world
+""".split())
+
+
+def phrase_pattern(phrases):
+    return re.compile(r"(?<![\w.])(" + "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+                      + r")(?![\w-])", re.IGNORECASE)
+
+
+COUNTRY_PATTERNS = {country: phrase_pattern(phrases) for country, phrases in COUNTRY_NAMES.items()}
+SECTION_PATTERNS = {section: phrase_pattern(phrases) for section, phrases in SECTION_KEYWORDS.items()}
+
+
+def parse_days(prompt):
+    """
+    Days covered by a "last/past N days|weeks|months" phrase, or DEFAULT_DAYS.
+    """
+    match = TIME_RANGE.search(prompt)
+    if match is None:
+        return DEFAULT_DAYS
+    amount = match.group(1) or "one"
+    amount = int(amount) if amount.isdigit() else NUMBER_WORDS[amount.lower()]
+    return max(1, amount) * UNIT_DAYS[match.group(2).lower()]
+
+
+def keyword_terms(text):
+    """
+    Keywords and bigrams among the words of `text` left after the country, section and
+    time phrases were cut out (marked by "|" so no bigram spans them).
+    """
+    keywords, bigrams = [], []
+    for run in text.lower().split("|"):
+        previous = None
+        for word in WORD.findall(run):
+            word = word.strip("'-")
+            if not word or word in STOPWORDS:
+                previous = None
+                continue
+            keywords.append(word)
+            if previous:
+                bigrams.append(f"{previous} {word}")
+            previous = word
+    return list(dict.fromkeys(keywords)), list(dict.fromkeys(bigrams))
+
+
+def lemma_forms(word):
+    """
+    The word plus its naive singular, since lemmata are stored in base form.
+    """
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return [word, word[:-1]]
+    return [word]
+
+
+def classify(prompt):
+    """
+    Decides whether a prompt fits the section/country/keywords template.
+
+    Parameters
+    ----------
+    prompt: question passed to get_omelas_results
+
+    Returns: dict with "countries", "section" (or None), "keywords", "bigrams" and "days",
+    or None if the prompt needs the agent
+    -------
+    """
+    if UNSUPPORTED.search(prompt):
+        return None
+    countries = [country for country, pattern in COUNTRY_PATTERNS.items() if pattern.search(prompt)]
+    sections = [section for section, pattern in SECTION_PATTERNS.items() if pattern.search(prompt)]
+    if not countries or len(sections) > 1:
+        return None
+
+    rest = TIME_RANGE.sub("|", prompt)
+    for pattern in (*COUNTRY_PATTERNS.values(), *SECTION_PATTERNS.values()):
+        rest = pattern.sub("|", rest)
+    keywords, bigrams = keyword_terms(rest)
+    if len(keywords) > TEMPLATE_MAX_TERMS or not (sections or keywords):
+        return None
+    return {
+        "countries": countries,
+        "section": sections[0] if sections else None,
+        "keywords": keywords,
+        "bigrams": bigrams,
+        "days": parse_days(prompt),
+    }
+
+
+def build_query(intent):
+    """
+    Parameterized BigQuery SQL for a classify() match. Only the day count is written
+    into the SQL, so the pdate cost checks still see the partition range.
+
+    Returns: (query, params) tuple for call_gbq_function
+    -------
+    """
+    countries = []
+    for country in intent["countries"]:
+        countries += [country, *COUNTRY_VARIANTS.get(country, ())]
+    params = {"countries": countries}
+    filters = [
+        f"pdate > DATE_SUB(CURRENT_DATE, INTERVAL {int(intent['days'])} DAY)",
+        "EXISTS (SELECT 1 FROM UNNEST(ner_data) AS ner WHERE ner.country IN UNNEST(@countries))",
+    ]
+    if intent["section"]:
+        params["section"] = intent["section"]
+        filters.append("section = @section")
+    keywords = []
+    if intent["keywords"]:
+        params["lemmata"] = list(dict.fromkeys(form for word in intent["keywords"] for form in lemma_forms(word)))
+        keywords.append("EXISTS (SELECT 1 FROM UNNEST(lemmata) AS lemma WHERE LOWER(lemma.word) IN UNNEST(@lemmata))")
+    if intent["bigrams"]:
+        params["bigrams"] = intent["bigrams"]
+        keywords.append(
+            "EXISTS (SELECT 1 FROM UNNEST(bigrams) AS bigram WHERE LOWER(bigram.bigram) IN UNNEST(@bigrams))"
+        )
+    if keywords:
+        filters.append("(" + " OR ".join(keywords) + ")")
+    query = ("SELECT date, source_name, text, url, relevance_score\nFROM hack.main\nWHERE "
+             + "\n  AND ".join(filters) + "\nORDER BY relevance_score DESC")
+    return query, params
+
+
+def template_query(prompt):
+    """
+    Returns: (query, params) if the prompt fits a template, otherwise None
+    -------
+    """
+    intent = classify(prompt)
+    return build_query(intent) if intent else None
@@ -1,4 +1,5 @@
 from data.omelas.gcp import call_gbq_function
+from data.omelas.results import serialize_result
 from typing import Dict
 
 
@@ -10,7 +11,10 @@ def tool_executor(function_name: str, function_args: Dict) -> str:
     if function_name == 'call_gbq_function':
         query = function_args.get('query')
         print("Calling get call_gbq_function")
-        return str(call_gbq_function(query))
+        result = call_gbq_function(query)
+        if isinstance(result, str):
+            return result
+        return serialize_result(result)
     raise ValueError(f"Unknown function: {function_name}, avaliable functions are: {', '.join([f['name'] for f in functions])}")
 
 
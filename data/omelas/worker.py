@@ -1,6 +1,42 @@
 from data.omelas.chatbot import get_anthropic_message_with_tools
-from data.omelas.instructions import DATA_DICTIONARY, QUERY_GEN
+from data.omelas.gcp import call_gbq_function
+from data.omelas import instructions
+from data.omelas.results import serialize_result
+from data.omelas.templates import OMELAS_TEMPLATES, template_query
 from data.omelas.tools import functions, tool_executor
+from telemetry.tracing import span
+
+# The full data dictionary is kept out of this repository and added to instructions.py on
+# deployment. Without it the agent gets this outline of the hack.main columns it queries.
+FALLBACK_DATA_DICTIONARY = (
+    "hack.main (partitioned by pdate): pdate DATE, date TIMESTAMP, source_name STRING, parent_owner STRING, "
+    "text STRING, url STRING, section STRING, relevance_score FLOAT64, "
+    "ner_data ARRAY<STRUCT<country STRING>>, lemmata ARRAY<STRUCT<word STRING>>, "
+    "bigrams ARRAY<STRUCT<bigram STRING>>"
+)
+DATA_DICTIONARY = getattr(instructions, "DATA_DICTIONARY", FALLBACK_DATA_DICTIONARY)
+
+# Built once; the chatbot sends it as a cached system prompt
+OMELAS_SYSTEM_INSTRUCTIONS = f"<instructions>{instructions.QUERY_GEN}</instructions><data_dict>{DATA_DICTIONARY}</data_dict>"
+
+def get_template_results(prompt):
+    """
+    Answers prompts of a common shape with a template query instead of the agent loop.
+    Returns None if the prompt fits no template, or if the query fails or finds nothing,
+    so the agent can take over and broaden it.
+    """
+    match = template_query(prompt)
+    if match is None:
+        return None
+    query, params = match
+    with span("omelas_template") as template_span:
+        result = call_gbq_function(query, params=params)
+        found = not isinstance(result, str) and bool(result["rows"])
+        template_span.set(rows=len(result["rows"]) if found else 0, fallback=not found)
+    if not found:
+        print(f"Template query found nothing, falling back to the agent: {result if isinstance(result, str) else '[]'}")
+        return None
+    return serialize_result(result)
 
 def get_omelas_results(prompt):
     """
@@ -8,7 +44,11 @@ def get_omelas_results(prompt):
     :param prompt:
     :return:
     """
-    return get_anthropic_message_with_tools(system_instructions=f"<instructions>{QUERY_GEN}</instructions><data_dict>{DATA_DICTIONARY}</data_dict>", prompt=prompt, functions=functions, tool_executor=tool_executor)
+    if OMELAS_TEMPLATES:
+        result = get_template_results(prompt)
+        if result is not None:
+            return result
+    return get_anthropic_message_with_tools(system_instructions=OMELAS_SYSTEM_INSTRUCTIONS, prompt=prompt, functions=functions, tool_executor=tool_executor)
 
 if __name__ == "__main__":
-    print(get_omelas_results("What are Russian Telegram channels saying about the war in Ukraine?"))
\ No newline at end of file
+    print(get_omelas_results("What are Russian Telegram channels saying about the war in Ukraine?"))
@@ -0,0 +1,297 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import CancelledError
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(".cache", "antidisinform.sqlite3"))
+
+# Sentinels returned by SQLiteCache.get
+MISS = object()
+NEGATIVE = object()
+
+FLIGHT_POLL_INTERVAL = 0.5  # seconds between cancellation checks of a waiting caller
+
+TRACKING_PARAM_PREFIXES = ("utm_", "fbclid", "gclid", "yclid", "_openstat")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url):
+    """
+    Normalizes a URL so trivially different spellings share a cache entry.
+
+    Lower-cases the scheme and host, drops default ports, fragments, trailing slashes
+    and tracking parameters, and sorts the remaining query parameters.
+
+    Parameters:
+    - url (str): The URL to normalize.
+
+    Returns:
+    - str: The normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    netloc = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+    ))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+class SQLiteCache:
+    """
+    Persistent JSON key/value cache stored in a SQLite file shared by several namespaces.
+
+    Entries expire after `ttl` seconds (None keeps them until evicted). Failures can be
+    remembered with `set_negative` for the shorter `negative_ttl`. When a namespace grows
+    past `max_bytes`, its least recently used entries are evicted. Hit and miss counters
+    are kept per instance and reported by `stats`.
+
+    If a `version` is given, entries written under any other version of the namespace
+    are ignored and purged, e.g. when the prompt that produced them changes.
+
+    Expired entries are kept for another `stale_ttl` seconds so `get_stale` can serve
+    them while the caller refreshes the value in the background.
+    """
+
+    def __init__(self, namespace, path=None, ttl=None, negative_ttl=None, max_bytes=None, version=None,
+                 stale_ttl=0):
+        self.namespace = namespace
+        self.version = version
+        self.path = path or CACHE_PATH
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.negative_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Opened lazily so importing a module that defines a cache has no side effects
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT,"
+                " negative INTEGER NOT NULL DEFAULT 0,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL,"
+                " accessed_at REAL NOT NULL,"
+                " version TEXT,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            columns = [column[1] for column in self._conn.execute("PRAGMA table_info(cache_entries)")]
+            if "version" not in columns:
+                self._conn.execute("ALTER TABLE cache_entries ADD COLUMN version TEXT")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_entries_lru ON cache_entries (namespace, accessed_at)"
+            )
+            if self.version is not None:
+                self._conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND (version IS NULL OR version != ?)",
+                    (self.namespace, self.version),
+                )
+        return self._conn
+
+    def get(self, key):
+        """
+        Looks up a key.
+
+        Returns:
+        - The cached value, NEGATIVE for a remembered failure, or MISS.
+        """
+        return self._lookup(key, allow_stale=False)[0]
+
+    def get_stale(self, key):
+        """
+        Looks up a key, also returning entries that expired less than `stale_ttl` seconds ago.
+
+        Returns:
+        - tuple: (value, stale) where value is the cached value, NEGATIVE or MISS, and
+          stale tells whether the entry is past its ttl and should be refreshed.
+        """
+        return self._lookup(key, allow_stale=True)
+
+    def _lookup(self, key, allow_stale):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, negative, expires_at, version FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return MISS, False
+            value, negative, expires_at, version = row
+            stale = expires_at is not None and expires_at <= now
+            if version != self.version or (stale and expires_at + self.stale_ttl <= now):
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self.misses += 1
+                return MISS, False
+            if stale and not allow_stale:
+                self.misses += 1
+                return MISS, False
+            conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            if negative:
+                self.negative_hits += 1
+                return NEGATIVE, stale
+            self.hits += 1
+            if stale:
+                self.stale_hits += 1
+            return json.loads(value), stale
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores a JSON-serializable value, using the cache's ttl unless one is given.
+        """
+        value = json.dumps(value, ensure_ascii=False, default=str)
+        self._store(key, value, 0, ttl if ttl is not None else self.ttl)
+
+    def set_negative(self, key, ttl=None):
+        """
+        Remembers that computing `key` failed, so callers can skip retrying it for a while.
+        """
+        self._store(key, None, 1, ttl if ttl is not None else self.negative_ttl)
+
+    def _store(self, key, value, negative, ttl):
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        size = len(key) + (len(value) if value else 0)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries"
+                " (namespace, key, value, negative, size, expires_at, accessed_at, version)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, value, negative, size, expires_at, now, self.version),
+            )
+            if self.max_bytes is not None:
+                self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.namespace, now - self.stale_ttl),
+        )
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        lru = conn.execute(
+            "SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY accessed_at", (self.namespace,)
+        ).fetchall()
+        for key, size in lru:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+            total -= size
+            self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._connect().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def stats(self):
+        """
+        Returns hit/miss counters for this instance and the size of the namespace.
+        """
+        with self._lock:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?",
+                (self.namespace,),
+            ).fetchone()
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls: while a call for a key is running, other callers with
+    the same key wait for it and share its result (or exception) instead of starting
+    their own.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, cancel_event=None):
+        """
+        Runs fn() unless a call for `key` is already in flight.
+
+        Parameters:
+        - key: Calls with equal keys are coalesced.
+        - fn (callable): Computes the result.
+        - cancel_event (threading.Event): Stops waiting on another caller's call when set,
+          raising concurrent.futures.CancelledError.
+
+        Returns:
+        - tuple: (result, shared) where shared tells whether the result came from another caller's call.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            while not flight.done.wait(FLIGHT_POLL_INTERVAL):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise CancelledError("Cancelled while waiting for another caller's result")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
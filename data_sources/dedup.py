@@ -0,0 +1,200 @@
+import hashlib
+import re
+import struct
+import threading
+
+from data_sources.preprocess import strip_boilerplate
+
+# MinHash/LSH settings: 16 bands of 4 rows catch pairs above roughly 50% similarity,
+# which are then confirmed against DUPLICATE_THRESHOLD.
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 5
+DUPLICATE_THRESHOLD = 0.7
+MIN_WORDS = 30  # shorter texts carry too little signal to call duplicates
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _permutations(num_permutations):
+    # Deterministic (a, b) pairs so signatures are comparable across processes
+    params = []
+    for i in range(num_permutations):
+        digest = hashlib.sha256(f"minhash-{i}".encode()).digest()
+        a, b = struct.unpack("<QQ", digest[:16])
+        params.append((a % (_MERSENNE_PRIME - 1) + 1, b % _MERSENNE_PRIME))
+    return params
+
+
+PERMUTATIONS = _permutations(NUM_PERMUTATIONS)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """
+    Hashed word n-grams of a text, case-folded so formatting differences between copies do not matter.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {hash_shingle(" ".join(words))} if words else set()
+    return {hash_shingle(" ".join(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def hash_shingle(shingle):
+    return struct.unpack("<I", hashlib.blake2b(shingle.encode(), digest_size=4).digest())[0]
+
+
+def minhash_signature(text):
+    """
+    MinHash signature of a text: for each permutation, the minimum permuted shingle hash.
+    """
+    hashed = shingles(text)
+    if not hashed:
+        return None
+    return tuple(min((a * h + b) % _MERSENNE_PRIME & _MAX_HASH for h in hashed) for a, b in PERMUTATIONS)
+
+
+def estimated_similarity(signature, other):
+    return sum(x == y for x, y in zip(signature, other)) / len(signature)
+
+
+class DuplicateIndex:
+    """
+    Online LSH index over MinHash signatures. Each signature is split into LSH_BANDS
+    bands; texts sharing a band bucket are candidates, confirmed by their estimated
+    Jaccard similarity.
+    """
+
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.rows = NUM_PERMUTATIONS // LSH_BANDS
+        self.buckets = {}
+        self.signatures = {}
+
+    def _bands(self, signature):
+        for band in range(LSH_BANDS):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def find(self, signature):
+        """
+        Returns the id of the first indexed text similar to `signature`, or None.
+        """
+        candidates = []
+        for band in self._bands(signature):
+            for item_id in self.buckets.get(band, ()):
+                if item_id not in candidates:
+                    candidates.append(item_id)
+        for item_id in candidates:
+            if estimated_similarity(signature, self.signatures[item_id]) >= self.threshold:
+                return item_id
+        return None
+
+    def add(self, item_id, signature):
+        self.signatures[item_id] = signature
+        for band in self._bands(signature):
+            self.buckets.setdefault(band, []).append(item_id)
+
+
+class OnlineDeduplicator:
+    """
+    Thread-safe duplicate check for results that arrive one at a time (streaming).
+    The first copy of a story becomes its representative.
+    """
+
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.index = DuplicateIndex(threshold)
+        self.links = {}
+        self.lock = threading.Lock()
+
+    def representative_of(self, result):
+        """
+        Returns the link of an earlier result with nearly the same content, or None
+        (in which case `result` is indexed as a new representative).
+        """
+        content = content_for_dedup(result)
+        if len(content.split()) < MIN_WORDS:
+            return None
+        signature = minhash_signature(content)
+        with self.lock:
+            match = self.index.find(signature)
+            if match is not None:
+                return self.links[match]
+            item_id = len(self.links)
+            self.links[item_id] = result.get("link")
+            self.index.add(item_id, signature)
+        return None
+
+
+def content_for_dedup(result):
+    """
+    Article text a result is fingerprinted on: the scraped markdown without navigation,
+    banners and other site chrome, which pages of one site share whatever the story.
+    """
+    content = result.get("scraped_content") or ""
+    if content in ("Error during scraping", "No content found"):
+        return ""
+    return strip_boilerplate(content)
+
+
+def collapse_near_duplicates(results, threshold=DUPLICATE_THRESHOLD):
+    """
+    Collapses search results whose scraped content is nearly identical, e.g. syndicated
+    copies of the same story, into one representative.
+
+    The representative is the longest copy. The links of the other copies are kept in
+    its 'duplicate_links' so they can still be cited.
+
+    Parameters:
+    - results (list): Search results with 'scraped_content'.
+    - threshold (float): Minimum estimated Jaccard similarity of word shingles.
+
+    Returns:
+    - list: The results with duplicates removed, in their original order.
+    """
+    index = DuplicateIndex(threshold)
+    groups = {}
+    for position, result in enumerate(results):
+        content = content_for_dedup(result)
+        signature = minhash_signature(content) if len(content.split()) >= MIN_WORDS else None
+        if signature is None:
+            groups[position] = [position]
+            continue
+        match = index.find(signature)
+        if match is None:
+            index.add(position, signature)
+            groups[position] = [position]
+        else:
+            groups[match].append(position)
+
+    collapsed = []
+    for members in groups.values():
+        representative = max(members, key=lambda position: len(content_for_dedup(results[position])))
+        result = results[representative]
+        duplicate_links = [results[position].get("link") for position in members if position != representative]
+        if duplicate_links:
+            result["duplicate_links"] = duplicate_links
+        collapsed.append((min(members), result))
+    return [result for _, result in sorted(collapsed, key=lambda item: item[0])]
+
+
+def fold_duplicates(results):
+    """
+    Folds streamed results marked with 'duplicate_of' (see OnlineDeduplicator) into
+    their representative, so they end up like the output of collapse_near_duplicates.
+
+    Parameters:
+    - results (list): Search results, some with 'duplicate_of' set to another result's link.
+
+    Returns:
+    - list: The representatives, with the folded links in 'duplicate_links'.
+    """
+    by_link = {result.get("link"): result for result in results if "duplicate_of" not in result}
+    folded = []
+    for result in results:
+        representative = by_link.get(result.get("duplicate_of"))
+        if representative is None:
+            folded.append(result)
+        else:
+            representative.setdefault("duplicate_links", []).append(result.get("link"))
+    return folded
@@ -0,0 +1,101 @@
+import functools
+import os
+import threading
+
+from telemetry.accounting import record_llm_usage
+from telemetry.cassette import cassette_call, replaying
+from telemetry.tracing import span
+
+DEFAULT_MAX_RETRIES = 3
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the process-wide Anthropic client, created on first use so every agent
+    turn and summary shares one HTTP connection pool.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import anthropic
+
+            _client = anthropic.Anthropic(api_key=os.environ["ANTHROPIC_API_KEY"], max_retries=DEFAULT_MAX_RETRIES)
+        return _client
+
+
+@functools.lru_cache(maxsize=32)
+def cached_system_prompt(text):
+    """
+    Builds the system field for a static prompt once. The block is marked for
+    provider-side prompt caching, which covers the tool definitions and this prompt,
+    so repeated calls are not billed or processed in full again.
+    """
+    return ({"type": "text", "text": text, "cache_control": {"type": "ephemeral"}},)
+
+
+def record_usage(llm_span, model, message):
+    usage = getattr(message, "usage", None)
+    record_llm_usage(model, usage)
+    if usage is not None:
+        llm_span.set(input_tokens=usage.input_tokens, output_tokens=usage.output_tokens,
+                     cache_read_input_tokens=getattr(usage, "cache_read_input_tokens", None) or 0)
+
+
+def dump_message(message):
+    return message.model_dump(mode="json")
+
+
+def load_message(data):
+    from anthropic.types import Message
+
+    return Message.model_validate(data)
+
+
+def create_message(system=None, **params):
+    """
+    Calls messages.create on the shared client.
+
+    Parameters
+    ----------
+    system: static system prompt (str), sent with a prompt cache breakpoint
+    params: any other messages.create parameters
+
+    Returns: anthropic Message
+    -------
+    """
+    if system:
+        params["system"] = list(cached_system_prompt(system))
+    with span("llm_call", model=params.get("model")) as llm_span:
+        message = cassette_call("anthropic", params, lambda: get_client().messages.create(**params),
+                                encode=dump_message, decode=load_message)
+        record_usage(llm_span, params.get("model"), message)
+    return message
+
+
+def stream_message(on_text, system=None, **params):
+    """
+    Like create_message, but streams the response and calls on_text with every text delta.
+
+    Returns: the complete anthropic Message once the stream ends
+    -------
+    """
+    if system:
+        params["system"] = list(cached_system_prompt(system))
+    def stream():
+        with get_client().messages.stream(**params) as message_stream:
+            for text in message_stream.text_stream:
+                on_text(text)
+            return message_stream.get_final_message()
+
+    with span("llm_call", model=params.get("model"), streamed=True) as llm_span:
+        message = cassette_call("anthropic", params, stream, encode=dump_message, decode=load_message)
+        if replaying():
+            # A replayed message arrives whole, so its text is passed on in one piece
+            for block in message.content:
+                if block.type == "text":
+                    on_text(block.text)
+        record_usage(llm_span, params.get("model"), message)
+    return message
@@ -1,5 +1,5 @@
 #%%
-from search_scraper import get_search_and_scrape, print_results
+from data_sources.search_scraper import get_search_and_scrape, print_results
 
 def main(search_engine: str, search_query: str):
     try:
@@ -0,0 +1,120 @@
+import os
+import re
+
+from data_sources.rate_limit import estimate_tokens
+
+# Input limits for summarizing one article, in estimated tokens
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 6000))
+SUMMARY_MAX_CHUNKS = int(os.getenv("SUMMARY_MAX_CHUNKS", 6))
+# Bump when the cleaning rules change, so cached summaries of raw pages are recomputed
+PREPROCESS_VERSION = "2"
+
+IMAGE_PATTERN = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+LINK_PATTERN = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+BARE_URL_PATTERN = re.compile(r"<?https?://\S+>?")
+LIST_MARKER_PATTERN = re.compile(r"^\s*(?:[-*+|#>]|\d+\.)\s*")
+# Short lines starting with one of these banner phrases are site chrome rather than article text
+BOILERPLATE_PATTERN = re.compile(
+    r"^(?:©|(?:we use cookies|this (?:web)?site uses cookies|accept (?:all )?cookies|cookie (?:policy|settings)"
+    r"|privacy policy|terms of (?:use|service)|all rights reserved|subscribe to|subscribe|newsletter"
+    r"|sign (?:in|up) (?:for|to) our|sign in|log in|follow us|share (?:this|on)|advertisement|read more"
+    r"|related articles|skip to (?:main )?content|подпишитесь|підпишіться|реклама|читайте также|читайте також"
+    r"|поделиться|поділитися|все права защищены|усі права захищені)\b)",
+    re.IGNORECASE,
+)
+BANNER_MAX_CHARS = 80
+BOILERPLATE_MAX_CHARS = 200
+MIN_TEXT_CHARS = 25  # link-heavy lines with less text than this are navigation
+
+
+def is_boilerplate(line, links):
+    """
+    Whether a markdown line is navigation, a link farm or a banner rather than article text.
+    """
+    text = LIST_MARKER_PATTERN.sub("", line).strip()
+    if not text:
+        return False
+    if len(text) <= BANNER_MAX_CHARS and BOILERPLATE_PATTERN.match(text):
+        return True
+    if links:
+        link_text = sum(len(label) for label in links)
+        plain_text = len(LINK_PATTERN.sub("", text).strip(" |·•-–—,"))
+        return plain_text < MIN_TEXT_CHARS or link_text > plain_text
+    return False
+
+
+def strip_boilerplate(markdown):
+    """
+    Cleans scraped markdown before it is sent to the model: drops images, navigation
+    and link-farm lines, cookie/subscription banners and repeated short lines, and
+    replaces inline links with their text.
+
+    Parameters:
+    - markdown (str): Markdown returned by Firecrawl.
+
+    Returns:
+    - str: The article text.
+    """
+    lines = []
+    seen = set()
+    for line in markdown.splitlines():
+        line = IMAGE_PATTERN.sub("", line)
+        links = LINK_PATTERN.findall(line)
+        if is_boilerplate(line, links):
+            continue
+        line = BARE_URL_PATTERN.sub("", LINK_PATTERN.sub(r"\1", line)).rstrip()
+        stripped = line.strip()
+        if stripped and len(stripped) <= BOILERPLATE_MAX_CHARS:
+            if stripped in seen:
+                continue
+            seen.add(stripped)
+        if not stripped and (not lines or not lines[-1]):
+            continue
+        lines.append(line if stripped else "")
+    return "\n".join(lines).strip()
+
+
+def split_into_chunks(text, chunk_tokens=None):
+    """
+    Splits text into chunks of at most `chunk_tokens` estimated tokens, on paragraph
+    boundaries where possible.
+    """
+    chunk_tokens = chunk_tokens or SUMMARY_CHUNK_TOKENS
+    if estimate_tokens(text) <= chunk_tokens:
+        return [text] if text else []
+
+    max_chars = chunk_tokens * 4
+    chunks = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > max_chars:
+            # A single oversized paragraph is cut at the last sentence end that fits
+            cut = paragraph.rfind(". ", 0, max_chars) + 1 or max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def article_chunks(scraped_content, chunk_tokens=None, max_chunks=None):
+    """
+    Cleans an article and splits it for summarization.
+
+    Parameters:
+    - scraped_content (str): Markdown of the scraped article.
+    - chunk_tokens (int): Maximum estimated tokens per chunk. Defaults to SUMMARY_CHUNK_TOKENS.
+    - max_chunks (int): Chunks beyond this are dropped. Defaults to SUMMARY_MAX_CHUNKS.
+
+    Returns:
+    - list: One or more chunks of article text; empty if nothing is left after cleaning.
+    """
+    chunks = split_into_chunks(strip_boilerplate(scraped_content), chunk_tokens)
+    return chunks[:max_chunks or SUMMARY_MAX_CHUNKS]
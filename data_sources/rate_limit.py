@@ -0,0 +1,92 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket allowing `rate` units every `period` seconds.
+
+    Callers reserve capacity up front and sleep only as long as needed, so concurrent
+    workers are spaced out evenly instead of all hitting the API at once.
+    """
+
+    def __init__(self, rate, period=1.0, burst=None):
+        if rate <= 0 or period <= 0:
+            raise ValueError("rate and period must be positive.")
+        self.rate = rate
+        self.period = period
+        self.capacity = burst if burst is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """
+        Reserves `amount` units and returns the number of seconds to wait before using them.
+
+        Parameters:
+        - amount (float): Units to reserve, e.g. 1 request or the token count of a prompt.
+
+        Returns:
+        - float: Delay in seconds (0 if capacity is available right away).
+        """
+        with self._lock:
+            now = time.monotonic()
+            refill = (now - self._updated) * self.rate / self.period
+            self._tokens = min(self.capacity, self._tokens + refill)
+            self._updated = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens * self.period / self.rate
+
+    def acquire(self, amount=1):
+        """
+        Blocks until `amount` units are available.
+
+        Returns:
+        - float: Seconds spent waiting.
+        """
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class KeyedRateLimiter:
+    """
+    Lazily creates one RateLimiter per key (e.g. per host) sharing the same settings.
+    """
+
+    def __init__(self, rate, period=1.0, burst=None):
+        self.rate = rate
+        self.period = period
+        self.burst = burst
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def for_key(self, key):
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = RateLimiter(self.rate, self.period, self.burst)
+                self._limiters[key] = limiter
+            return limiter
+
+    def acquire(self, key, amount=1):
+        return self.for_key(key).acquire(amount)
+
+
+def host_of(url):
+    """
+    Returns the lower-cased host of a URL, used as the per-host rate limit key.
+    """
+    return (urlparse(url).hostname or "").lower()
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (about 4 characters per token) used for token-per-minute budgets.
+    """
+    return max(1, len(text) // 4)
@@ -1,60 +1,139 @@
 #%%
+import asyncio
+import contextvars
+import hashlib
+import itertools
+import json
+import math
 import os
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from serpapi import GoogleSearch, BaiduSearch, YandexSearch
 from firecrawl.firecrawl import FirecrawlApp
 from dotenv import load_dotenv
 from pprint import pprint
-import anthropic
+
+from data_sources.llm import create_message, get_client
+from data_sources.cache import MISS, NEGATIVE, SQLiteCache, normalize_url
+from data_sources.dedup import OnlineDeduplicator, collapse_near_duplicates, fold_duplicates
+from data_sources.preprocess import PREPROCESS_VERSION, article_chunks
+from data_sources.rate_limit import KeyedRateLimiter, RateLimiter, estimate_tokens, host_of
+from telemetry.context import submit_in_context
+from telemetry.accounting import record, record_llm_usage
+from telemetry.cassette import cassette_call
+from telemetry.events import emit
+from telemetry.tracing import span
 
 # Load environment variables from .env file
 load_dotenv()
 
-def get_search_results_serp(search_engine, search_query):
+SEARCH_CLASSES = {"google": GoogleSearch, "baidu": BaiduSearch, "yandex": YandexSearch}
+
+# SERP cache lifetimes per engine, in seconds
+SERP_CACHE_TTLS = {
+    "google": float(os.getenv("SERP_CACHE_TTL_GOOGLE", 15 * 60)),
+    "yandex": float(os.getenv("SERP_CACHE_TTL_YANDEX", 30 * 60)),
+    "baidu": float(os.getenv("SERP_CACHE_TTL_BAIDU", 60 * 60)),
+}
+SERP_CACHE_STALE_TTL = float(os.getenv("SERP_CACHE_STALE_TTL", 6 * 60 * 60))
+SERP_CACHE_MAX_BYTES = int(os.getenv("SERP_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+SERP_STALE_WHILE_REVALIDATE = os.getenv("SERP_STALE_WHILE_REVALIDATE", "true").lower() == "true"
+
+serp_cache = SQLiteCache("serp", stale_ttl=SERP_CACHE_STALE_TTL, max_bytes=SERP_CACHE_MAX_BYTES)
+serp_refresh_executor = ThreadPoolExecutor(max_workers=2)
+_serp_refreshing = set()
+_serp_refreshing_lock = threading.Lock()
+
+# Scraping concurrency and rate limits, overridable from the environment
+FIRECRAWL_MAX_WORKERS = int(os.getenv("FIRECRAWL_MAX_WORKERS", 5))
+FIRECRAWL_REQUESTS_PER_MINUTE = float(os.getenv("FIRECRAWL_REQUESTS_PER_MINUTE", 60))
+FIRECRAWL_HOST_REQUESTS_PER_SECOND = float(os.getenv("FIRECRAWL_HOST_REQUESTS_PER_SECOND", 1))
+FIRECRAWL_TIMEOUT = float(os.getenv("FIRECRAWL_TIMEOUT", 30))  # seconds per URL
+STREAM_MAX_IN_FLIGHT = int(os.getenv("STREAM_MAX_IN_FLIGHT", 3))
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", 6 * 60 * 60))
+SCRAPE_CACHE_NEGATIVE_TTL = float(os.getenv("SCRAPE_CACHE_NEGATIVE_TTL", 10 * 60))
+SCRAPE_CACHE_MAX_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+firecrawl_limiter = RateLimiter(FIRECRAWL_REQUESTS_PER_MINUTE, period=60, burst=FIRECRAWL_MAX_WORKERS)
+host_limiter = KeyedRateLimiter(FIRECRAWL_HOST_REQUESTS_PER_SECOND, burst=1)
+scrape_cache = SQLiteCache(
+    "scrape", ttl=SCRAPE_CACHE_TTL, negative_ttl=SCRAPE_CACHE_NEGATIVE_TTL, max_bytes=SCRAPE_CACHE_MAX_BYTES
+)
+
+# Summarization concurrency and Anthropic budgets, overridable from the environment
+SUMMARY_MODEL = "claude-3-5-haiku-20241022"
+SUMMARY_MAX_TOKENS = 1024
+SUMMARY_CHUNK_MAX_TOKENS = 512
+SUMMARY_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", 4))
+ANTHROPIC_REQUESTS_PER_MINUTE = float(os.getenv("ANTHROPIC_REQUESTS_PER_MINUTE", 50))
+ANTHROPIC_INPUT_TOKENS_PER_MINUTE = float(os.getenv("ANTHROPIC_INPUT_TOKENS_PER_MINUTE", 50000))
+SUMMARY_BATCH_POLL_INTERVAL = 10  # seconds
+SUMMARY_BATCH_TIMEOUT = float(os.getenv("SUMMARY_BATCH_TIMEOUT", 3600))  # seconds
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", 7 * 24 * 60 * 60))
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+
+SUMMARY_PROMPT = """Please summarize this article in about 3 paragraphs (200-500 words).
+Retain as much key information as possible while removing redundancy:
+
+{scraped_content}"""
+# Long articles are summarized in chunks, then the partial summaries are merged
+CHUNK_SUMMARY_PROMPT = """This is one part of a longer article. Summarize it in one paragraph (100-200 words),
+keeping names, numbers, dates, places and claims:
+
+{scraped_content}"""
+MERGE_SUMMARY_PROMPT = """These are summaries of consecutive parts of one article.
+Combine them into a single summary of about 3 paragraphs (200-500 words).
+Retain as much key information as possible while removing redundancy:
+
+{scraped_content}"""
+# Cached summaries are tied to the prompts and cleaning rules, so editing either invalidates them
+SUMMARY_PROMPT_VERSION = hashlib.sha256(
+    "\0".join([SUMMARY_PROMPT, CHUNK_SUMMARY_PROMPT, MERGE_SUMMARY_PROMPT, PREPROCESS_VERSION]).encode()
+).hexdigest()[:12]
+
+anthropic_request_limiter = RateLimiter(ANTHROPIC_REQUESTS_PER_MINUTE, period=60, burst=SUMMARY_MAX_WORKERS)
+anthropic_token_limiter = RateLimiter(ANTHROPIC_INPUT_TOKENS_PER_MINUTE, period=60)
+summary_cache = SQLiteCache(
+    "summary", ttl=SUMMARY_CACHE_TTL, max_bytes=SUMMARY_CACHE_MAX_BYTES, version=SUMMARY_PROMPT_VERSION
+)
+
+def serp_params(search_engine, search_query):
     """
-    Fetches organic search results from the specified search engine using SerpAPI.
+    Builds the SerpAPI parameters (without the api key) for a search engine.
 
     Parameters:
     - search_engine (str): 'google', 'baidu', or 'yandex'
     - search_query (str): The search query string.
 
     Returns:
-    - List[dict]: List of organic search results.
+    - dict: Engine-specific request parameters with a whitespace-normalized query.
     """
-    api_key = os.getenv("SERPAPI_API_KEY")
-    if not api_key:
-        raise EnvironmentError("SERPAPI_API_KEY not found in environment variables.")
-
-    params = {"api_key": api_key}
-
-    search_engine = search_engine.lower()
+    search_query = " ".join(search_query.split())
     if search_engine == 'google':
-        params["q"] = search_query
-        params['location'] = 'Ukraine'
-        params['google_domain'] = 'google.com.ua'
-        search = GoogleSearch(params)
+        return {"q": search_query, "location": 'Ukraine', "google_domain": 'google.com.ua'}
     elif search_engine == 'baidu':
-        params["q"] = search_query
-        search = BaiduSearch(params)
+        return {"q": search_query}
     elif search_engine == 'yandex':
-        params["text"] = search_query
-        params['lr'] = 1
-        params['yandex_domain'] = 'yandex.ru'
-        params['lang'] = 'ru'
-        search = YandexSearch(params)
-    else:
-        raise ValueError("Unsupported search engine. Choose from 'google', 'baidu', or 'yandex'.")
+        return {"text": search_query, "lr": 1, "yandex_domain": 'yandex.ru', "lang": 'ru'}
+    raise ValueError("Unsupported search engine. Choose from 'google', 'baidu', or 'yandex'.")
 
-    try:
-        results = search.get_dict()
-    except Exception as e:
-        raise Exception(f"Failed to fetch search results: {e}")
+def fetch_search_results_serp(search_engine, params, api_key):
+    """
+    Calls SerpAPI and keeps only the fields we use from the organic results.
+    """
+    search = SEARCH_CLASSES[search_engine]({**params, "api_key": api_key})
+    with span("serp_fetch", engine=search_engine) as serp_span:
+        record(serpapi_requests=1)
+        try:
+            results = cassette_call("serpapi", {"engine": search_engine, **params}, search.get_dict)
+        except Exception as e:
+            raise Exception(f"Failed to fetch search results: {e}")
+        serp_span.set(results=len(results.get("organic_results", [])))
 
     if "error" in results:
         raise Exception(f"Error from SerpAPI: {results['error']}")
-    
-    # return results
 
     organic_results = results.get('organic_results', [])
     if not organic_results:
@@ -68,12 +147,122 @@ def get_search_results_serp(search_engine, search_query):
 
     return filtered_results
 
-def scrape_links_firecrawl(search_results):
+def refresh_search_results_serp(search_engine, params, api_key, cache_key):
+    """
+    Re-fetches a stale SERP cache entry. Runs on serp_refresh_executor, at most once per key at a time.
     """
-    Scrapes the content of each URL in the search results using Firecrawl.
+    try:
+        results = fetch_search_results_serp(search_engine, params, api_key)
+        if results:
+            serp_cache.set(cache_key, results, ttl=SERP_CACHE_TTLS[search_engine])
+    except Exception as e:
+        print(f"Error refreshing search results: {e}")
+    finally:
+        with _serp_refreshing_lock:
+            _serp_refreshing.discard(cache_key)
+
+def get_search_results_serp(search_engine, search_query, stale_while_revalidate=SERP_STALE_WHILE_REVALIDATE):
+    """
+    Fetches organic search results from the specified search engine using SerpAPI.
+
+    Results are cached per engine and normalized parameters for SERP_CACHE_TTLS seconds.
+    With stale_while_revalidate, an expired entry is returned immediately while a
+    background refresh fetches a fresh copy for the next caller.
+
+    Parameters:
+    - search_engine (str): 'google', 'baidu', or 'yandex'
+    - search_query (str): The search query string.
+    - stale_while_revalidate (bool): Serve stale cached results while refreshing them.
+
+    Returns:
+    - List[dict]: List of organic search results.
+    """
+    api_key = os.getenv("SERPAPI_API_KEY")
+    if not api_key:
+        raise EnvironmentError("SERPAPI_API_KEY not found in environment variables.")
+
+    search_engine = search_engine.lower()
+    params = serp_params(search_engine, search_query)
+    cache_key = f"{search_engine}:{json.dumps(params, sort_keys=True, ensure_ascii=False)}"
+
+    if stale_while_revalidate:
+        cached, stale = serp_cache.get_stale(cache_key)
+    else:
+        cached, stale = serp_cache.get(cache_key), False
+    if cached is not MISS:
+        emit("search_results", engine=search_engine, query=params.get("q") or params.get("text"),
+             results=len(cached), cached=True)
+        if stale:
+            with _serp_refreshing_lock:
+                refreshing = cache_key in _serp_refreshing
+                _serp_refreshing.add(cache_key)
+            if not refreshing:
+                serp_refresh_executor.submit(refresh_search_results_serp, search_engine, params, api_key, cache_key)
+        return cached
+
+    results = fetch_search_results_serp(search_engine, params, api_key)
+    if results:
+        serp_cache.set(cache_key, results, ttl=SERP_CACHE_TTLS[search_engine])
+    emit("search_results", engine=search_engine, query=params.get("q") or params.get("text"),
+         results=len(results), cached=False)
+    return results
+
+def scrape_url_firecrawl(app, url, timeout=FIRECRAWL_TIMEOUT):
+    """
+    Scrapes a single URL with Firecrawl, respecting the global and per-host rate limits.
+
+    Results are cached by normalized URL, and failures are remembered for
+    SCRAPE_CACHE_NEGATIVE_TTL seconds so dead links are not retried on every query.
+
+    Parameters:
+    - app (FirecrawlApp): Shared Firecrawl client.
+    - url (str): The URL to scrape.
+    - timeout (float): Seconds Firecrawl may spend on this URL.
+
+    Returns:
+    - str: The scraped markdown, or "Error during scraping" if the scrape failed.
+    """
+    cache_key = normalize_url(url)
+    cached = scrape_cache.get(cache_key)
+    if cached is NEGATIVE:
+        emit("url_scraped", url=url, chars=0, cached=True, error=True)
+        return "Error during scraping"
+    if cached is not MISS:
+        emit("url_scraped", url=url, chars=len(cached), cached=True, error=False)
+        return cached
+
+    with span("scrape", host=host_of(url)) as scrape_span:
+        waited = firecrawl_limiter.acquire() + host_limiter.acquire(host_of(url))
+        scrape_span.set(rate_limit_wait=round(waited, 3))
+        record(firecrawl_requests=1)
+        try:
+            scrape_params = {'formats': ['markdown'], 'onlyMainContent': True, 'timeout': int(timeout * 1000)}
+            scrape_result = cassette_call("firecrawl", {"url": url, "formats": scrape_params["formats"]},
+                                          lambda: app.scrape_url(url, params=scrape_params))
+        except Exception as e:
+            print(f"Error scraping {url}: {e}")
+            scrape_cache.set_negative(cache_key)
+            emit("url_scraped", url=url, chars=0, cached=False, error=True)
+            scrape_span.set(error=True)
+            return "Error during scraping"
+        content = scrape_result.get("markdown", "No content found")
+        scrape_span.set(chars=len(content))
+    scrape_cache.set(cache_key, content)
+    emit("url_scraped", url=url, chars=len(content), cached=False, error=False)
+    return content
+
+
+def scrape_links_firecrawl(search_results, max_workers=None, timeout=None):
+    """
+    Scrapes the content of each URL in the search results concurrently using Firecrawl.
+
+    Links are scraped on a bounded thread pool. A failing or slow link only affects its
+    own result, which gets "Error during scraping".
 
     Parameters:
     - search_results (list): List of search result dictionaries containing 'link'.
+    - max_workers (int): Maximum number of concurrent scrapes. Defaults to FIRECRAWL_MAX_WORKERS.
+    - timeout (float): Seconds allowed per URL. Defaults to FIRECRAWL_TIMEOUT.
 
     Returns:
     - list: Updated list with 'scraped_content' added to each result.
@@ -82,38 +271,63 @@ def scrape_links_firecrawl(search_results):
     if not api_key:
         raise EnvironmentError("FIRECRAWL_API_KEY not found in environment variables.")
 
-    app = FirecrawlApp(api_key=api_key)
+    max_workers = max_workers or FIRECRAWL_MAX_WORKERS
+    timeout = timeout or FIRECRAWL_TIMEOUT
 
-    for result in search_results:
-        url = result.get("link")
-        if not url:
-            continue  # Skip if no URL is present
-        try:
-            scrape_result = app.scrape_url(url, params={'formats': ['markdown']})
-            result["scraped_content"] = scrape_result.get("markdown", "No content found")
-        except Exception as e:
-            print(f"Error scraping {url}: {e}")
-            result["scraped_content"] = "Error during scraping"
+    to_scrape = [result for result in search_results if result.get("link")]
+    if not to_scrape:
+        return search_results
 
-        # Optional: Add a delay to prevent rate-limiting
-        time.sleep(1)
+    app = FirecrawlApp(api_key=api_key)
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(to_scrape)))
+    futures = {
+        submit_in_context(executor, scrape_url_firecrawl, app, result["link"], timeout): result for result in to_scrape
+    }
+
+    # Each link may wait behind a full pool before its own timeout starts counting
+    deadline = timeout * math.ceil(len(to_scrape) / max_workers) + timeout
+    done, not_done = wait(futures, timeout=deadline)
+    for future, result in futures.items():
+        if future in done:
+            try:
+                result["scraped_content"] = future.result()
+            except Exception as e:
+                # e.g. a cache or rate limiter failure outside the scrape itself
+                print(f"Error scraping {result['link']}: {e}")
+                result["scraped_content"] = "Error during scraping"
+        else:
+            print(f"Timed out scraping {result['link']}")
+            result["scraped_content"] = "Error during scraping"
+    executor.shutdown(wait=False, cancel_futures=True)
 
     return search_results
 
-def get_search_and_scrape(search_engine, search_query):
+def get_search_and_scrape(search_engine, search_query, on_result=None):
     """
-    Combines fetching search results and scraping their content.
+    Combines fetching search results and scraping their content. Near-duplicate
+    articles are collapsed before summarization, keeping their links in 'duplicate_links'.
 
     Parameters:
     - search_engine (str): 'google', 'baidu', or 'yandex'
     - search_query (str): The search query string.
+    - on_result (callable): Optional callback receiving each result as soon as it is
+      summarized. Results are then processed by the streaming pipeline, and duplicates
+      are folded into their representative before returning.
 
     Returns:
     - list: List of search results with scraped content.
     """
+    if on_result is not None:
+        results = []
+        for result in iter_search_and_scrape(search_engine, search_query):
+            on_result(result)
+            results.append(result)
+        return fold_duplicates(sorted(results, key=lambda result: result.get("position") or 0))
+
     search_results = get_search_results_serp(search_engine, search_query)
     scraped_results = scrape_links_firecrawl(search_results)
-    summarized_results = summarize_content_with_claude(scraped_results)
+    unique_results = collapse_near_duplicates(scraped_results)
+    summarized_results = summarize_content_with_claude(unique_results)
     return summarized_results
 
 def print_results(results):
@@ -127,45 +341,291 @@ def print_results(results):
         pprint(result)
         print("\n" + "-"*80 + "\n")
 
-def summarize_content_with_claude(results):
+def has_content_to_summarize(result):
+    scraped_content = result.get("scraped_content")
+    return bool(scraped_content) and scraped_content != "Error during scraping"
+
+def summary_request_params(text, prompt=SUMMARY_PROMPT, max_tokens=SUMMARY_MAX_TOKENS):
+    """
+    Builds the messages.create parameters for summarizing one (cleaned) article or chunk.
+    """
+    return {
+        "model": SUMMARY_MODEL,
+        "max_tokens": max_tokens,
+        "messages": [{"role": "user", "content": prompt.format(scraped_content=text)}],
+    }
+
+def summary_cache_key(scraped_content):
+    """
+    Keys a summary by the article text and model, so the same article syndicated
+    under different URLs is only summarized once.
+    """
+    content_hash = hashlib.sha256(scraped_content.encode()).hexdigest()
+    return f"{SUMMARY_MODEL}:{content_hash}"
+
+def request_summary(params):
+    """
+    Sends one summarization request, waiting on the request and input-token budgets first.
     """
-    Uses Claude 3.5 Sonnet to summarize the scraped content for each search result.
+    anthropic_request_limiter.acquire()
+    anthropic_token_limiter.acquire(estimate_tokens(params["messages"][0]["content"]))
+    return create_message(**params).content[0].text
+
+def summarize_chunks(chunks):
+    """
+    Map-reduce summary of an article too long for one request: the chunks are
+    summarized in parallel, then the partial summaries are merged in one more request.
+    """
+    # A pool per article, as this already runs on a summarization worker
+    with ThreadPoolExecutor(max_workers=min(SUMMARY_MAX_WORKERS, len(chunks))) as executor:
+        partials = list(executor.map(
+            lambda chunk: request_summary(summary_request_params(chunk, CHUNK_SUMMARY_PROMPT, SUMMARY_CHUNK_MAX_TOKENS)),
+            chunks,
+        ))
+    merged = "\n\n".join(f"Part {i}:\n{partial}" for i, partial in enumerate(partials, 1))
+    return request_summary(summary_request_params(merged, MERGE_SUMMARY_PROMPT))
+
+def summarize_article(scraped_content):
+    """
+    Summarizes one article. Boilerplate is stripped first; articles longer than
+    preprocess.SUMMARY_CHUNK_TOKENS are summarized chunk by chunk and the results merged.
+
+    Parameters:
+    - scraped_content (str): Markdown of the scraped article.
+
+    Returns:
+    - str: The summary, or "Error during summarization" if a request failed.
+    """
+    cache_key = summary_cache_key(scraped_content)
+    cached = summary_cache.get(cache_key)
+    if cached is not MISS:
+        return cached
+
+    with span("summary", input_chars=len(scraped_content)) as summary_span:
+        chunks = article_chunks(scraped_content)
+        summary_span.set(chunks=len(chunks), cleaned_chars=sum(len(chunk) for chunk in chunks))
+        if not chunks:
+            return "No content to summarize"
+        try:
+            if len(chunks) == 1:
+                summary = request_summary(summary_request_params(chunks[0]))
+            else:
+                summary = summarize_chunks(chunks)
+        except Exception as e:
+            print(f"Error summarizing content: {e}")
+            summary_span.set(error=True)
+            return "Error during summarization"
+    summary_cache.set(cache_key, summary)
+    return summary
+
+def summarize_content_with_claude(results, max_workers=None, batch=False):
+    """
+    Uses Claude 3.5 Haiku to summarize the scraped content for each search result.
+
+    Articles are summarized concurrently on a bounded thread pool sharing one client.
+    With batch=True they are instead submitted together through the Message Batches
+    API, which is cheaper but only returns once the whole batch has been processed.
 
     Parameters:
     - results (list): List of dictionaries containing search results with scraped content
+    - max_workers (int): Maximum number of concurrent requests. Defaults to SUMMARY_MAX_WORKERS.
+    - batch (bool): Submit all articles as one message batch instead.
 
     Returns:
     - list: Updated results with summarized content added
     """
-    client = anthropic.Anthropic()  # Defaults to ANTHROPIC_API_KEY from env
-
+    to_summarize = []
     for result in results:
-        scraped_content = result.get("scraped_content")
-        if not scraped_content or scraped_content == "Error during scraping":
+        if has_content_to_summarize(result):
+            to_summarize.append(result)
+        else:
+            result["summarized_content"] = "No content to summarize"
+
+    if not to_summarize:
+        return results
+    if batch:
+        return summarize_content_with_claude_batch(results)
+
+    max_workers = max_workers or SUMMARY_MAX_WORKERS
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(to_summarize))) as executor:
+        futures = [submit_in_context(executor, summarize_article, result["scraped_content"]) for result in to_summarize]
+        for result, future in zip(to_summarize, futures):
+            result["summarized_content"] = future.result()
+
+    return results
+
+def summarize_content_with_claude_batch(results, poll_interval=SUMMARY_BATCH_POLL_INTERVAL, timeout=SUMMARY_BATCH_TIMEOUT):
+    """
+    Summarizes all results in a single Message Batches submission and waits for it to end.
+    Articles that need chunking take two rounds of requests, so they are summarized
+    directly alongside the batch instead.
+
+    Parameters:
+    - results (list): List of dictionaries containing search results with scraped content
+    - poll_interval (float): Seconds between batch status checks.
+    - timeout (float): Seconds to wait before cancelling the batch.
+
+    Returns:
+    - list: Updated results with summarized content added
+    """
+    client = get_client()
+    pending = {}
+    chunked = []
+    for i, result in enumerate(results):
+        if not has_content_to_summarize(result):
             result["summarized_content"] = "No content to summarize"
             continue
+        cached = summary_cache.get(summary_cache_key(result["scraped_content"]))
+        if cached is not MISS:
+            result["summarized_content"] = cached
+            continue
+        chunks = article_chunks(result["scraped_content"])
+        if not chunks:
+            result["summarized_content"] = "No content to summarize"
+        elif len(chunks) == 1:
+            pending[str(i)] = (result, chunks[0])
+        else:
+            chunked.append(result)
+    chunked_futures = []
+    if chunked:
+        executor = ThreadPoolExecutor(max_workers=min(SUMMARY_MAX_WORKERS, len(chunked)))
+        chunked_futures = [submit_in_context(executor, summarize_article, r["scraped_content"]) for r in chunked]
+        executor.shutdown(wait=False)
+    if not pending:
+        for result, future in zip(chunked, chunked_futures):
+            result["summarized_content"] = future.result()
+        return results
 
-        try:
-            message = client.messages.create(
-                model="claude-3-5-haiku-20241022",
-                max_tokens=1024,
-                messages=[
-                    {"role": "user", "content": f"""Please summarize this article in about 3 paragraphs (200-500 words). 
-                    Retain as much key information as possible while removing redundancy:
-
-                    {scraped_content}"""}
-                ]
-            )
-            result["summarized_content"] = message.content[0].text
-        except Exception as e:
-            print(f"Error summarizing content: {e}")
-            result["summarized_content"] = "Error during summarization"
+    try:
+        # anthropic 0.39 only exposes Message Batches under the beta namespace
+        message_batch = client.beta.messages.batches.create(requests=[
+            {"custom_id": custom_id, "params": summary_request_params(text)}
+            for custom_id, (result, text) in pending.items()
+        ])
+        deadline = time.monotonic() + timeout
+        while message_batch.processing_status != "ended":
+            if time.monotonic() > deadline:
+                client.beta.messages.batches.cancel(message_batch.id)
+                raise TimeoutError(f"Batch {message_batch.id} did not finish within {timeout} seconds")
+            time.sleep(poll_interval)
+            message_batch = client.beta.messages.batches.retrieve(message_batch.id)
+
+        for entry in client.beta.messages.batches.results(message_batch.id):
+            result, _ = pending.pop(entry.custom_id, (None, None))
+            if result is None:
+                continue
+            if entry.result.type == "succeeded":
+                record_llm_usage(SUMMARY_MODEL, entry.result.message.usage, llm_batch_requests=1)
+                result["summarized_content"] = entry.result.message.content[0].text
+                summary_cache.set(summary_cache_key(result["scraped_content"]), result["summarized_content"])
+            else:
+                print(f"Error summarizing content: batch entry {entry.result.type}")
+                result["summarized_content"] = "Error during summarization"
+    except Exception as e:
+        print(f"Error summarizing content: {e}")
 
-        # Optional: Add delay between API calls
-        time.sleep(1)
+    for result, _ in pending.values():
+        result["summarized_content"] = "Error during summarization"
+    for result, future in zip(chunked, chunked_futures):
+        result["summarized_content"] = future.result()
 
     return results
 
+def scrape_and_summarize(app, result, keep_scraped_content=True, deduplicator=None):
+    """
+    Runs the scrape and summary stages for a single search result.
+
+    If `deduplicator` has already seen a near-identical article, the result is not
+    summarized and gets 'duplicate_of' set to the representative's link instead.
+    """
+    if result.get("link"):
+        result["scraped_content"] = scrape_url_firecrawl(app, result["link"])
+    representative = deduplicator.representative_of(result) if deduplicator else None
+    if representative is not None:
+        result["duplicate_of"] = representative
+        result["summarized_content"] = f"Duplicate of {representative}"
+    elif has_content_to_summarize(result):
+        result["summarized_content"] = summarize_article(result["scraped_content"])
+    else:
+        result["summarized_content"] = "No content to summarize"
+    if not keep_scraped_content:
+        result.pop("scraped_content", None)
+    return result
+
+def iter_search_and_scrape(search_engine, search_query, max_in_flight=None, keep_scraped_content=True):
+    """
+    Streaming version of get_search_and_scrape that yields each result as soon as it
+    has been scraped and summarized, in completion order.
+
+    At most max_in_flight results are being processed or waiting for the consumer. A
+    new article is only started once the consumer takes a finished one, so a slow
+    consumer holds back scraping instead of letting raw markdown pile up.
+
+    Parameters:
+    - search_engine (str): 'google', 'baidu', or 'yandex'
+    - search_query (str): The search query string.
+    - max_in_flight (int): Maximum articles in flight. Defaults to STREAM_MAX_IN_FLIGHT.
+    - keep_scraped_content (bool): Drop the raw markdown from yielded results if False.
+
+    Near-duplicates of an article already seen in this stream are yielded without a
+    summary and with 'duplicate_of' pointing at the first copy.
+
+    Yields:
+    - dict: Search result with 'scraped_content' and 'summarized_content'.
+    """
+    api_key = os.getenv("FIRECRAWL_API_KEY")
+    if not api_key:
+        raise EnvironmentError("FIRECRAWL_API_KEY not found in environment variables.")
+
+    search_results = iter(get_search_results_serp(search_engine, search_query))
+    app = FirecrawlApp(api_key=api_key)
+    max_in_flight = max_in_flight or STREAM_MAX_IN_FLIGHT
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+    deduplicator = OnlineDeduplicator()
+    try:
+        in_flight = {
+            submit_in_context(executor, scrape_and_summarize, app, result, keep_scraped_content, deduplicator)
+            for result in itertools.islice(search_results, max_in_flight)
+        }
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                next_result = next(search_results, None)
+                if next_result is not None:
+                    in_flight.add(submit_in_context(
+                        executor, scrape_and_summarize, app, next_result, keep_scraped_content, deduplicator
+                    ))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+async def aiter_search_and_scrape(search_engine, search_query, max_in_flight=None, keep_scraped_content=True):
+    """
+    Async iterator over iter_search_and_scrape that keeps the event loop free while
+    results are being produced.
+
+    The generator is advanced on a dedicated thread in a copy of the caller's context,
+    so progress events, spans and usage accounting reach the caller's report.
+    """
+    context = contextvars.copy_context()
+    results = iter_search_and_scrape(search_engine, search_query, max_in_flight, keep_scraped_content)
+    stepper = ThreadPoolExecutor(max_workers=1)
+    step = None
+    try:
+        while True:
+            step = stepper.submit(context.run, next, results, None)
+            result = await asyncio.wrap_future(step)
+            if result is None:
+                break
+            yield result
+    finally:
+        if step is not None and not step.done():
+            # Cancelled while the generator was running: close it, and so shut down its pool, once that step returns
+            step.add_done_callback(lambda _: results.close())
+        else:
+            results.close()
+        stepper.shutdown(wait=False)
+
 #%%
 
 def main():
@@ -1,10 +1,59 @@
-from data.omelas.chatbot import get_anthropic_message_with_tools
+import os
+
+from data.omelas.chatbot import AgentCancelled, get_anthropic_message_with_tools
+from data_sources.cache import MISS, SingleFlight, SQLiteCache
 from utils import tool_executor, functions
 from instructions import INSTRUCTIONS
+from telemetry.accounting import current_usage
+from telemetry.events import emit, has_event_sink
+from telemetry.tracing import span
+
+# Finished reports are reused for identical prompts within this window
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", 30 * 60))
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+report_cache = SQLiteCache("report", ttl=REPORT_CACHE_TTL, max_bytes=REPORT_CACHE_MAX_BYTES)
+report_flights = SingleFlight()
 
-def call_system(prompt):
-    res = get_anthropic_message_with_tools(INSTRUCTIONS, prompt, functions, tool_executor)
+def normalize_prompt(prompt):
+    return " ".join(prompt.lower().split()).strip(" ?!.")
+
+def generate_report(prompt, cancel_event=None):
+    res = get_anthropic_message_with_tools(INSTRUCTIONS, prompt, functions, tool_executor, cancel_event=cancel_event,
+                                           stream=has_event_sink())
     return "#" + res.split("#", maxsplit=1)[-1]
 
+def call_system(prompt, cancel_event=None):
+    """
+    Returns the report for a prompt. Identical prompts (after normalization) share one
+    in-flight run, and finished reports are served from cache for REPORT_CACHE_TTL seconds.
+    """
+    key = normalize_prompt(prompt)
+    with span("report", prompt=prompt[:200]) as report_span:
+        cached = report_cache.get(key)
+        if cached is not MISS:
+            emit("report_cached")
+            report_span.set(cached=True, chars=len(cached))
+            return cached
+
+        while True:
+            try:
+                report, shared = report_flights.do(key, lambda: generate_report(prompt, cancel_event),
+                                                   cancel_event=cancel_event)
+            except AgentCancelled:
+                # Another caller's run was cancelled; start our own unless we were cancelled too
+                if cancel_event is not None and cancel_event.is_set():
+                    raise
+                continue
+            if shared:
+                emit("report_coalesced")
+            else:
+                report_cache.set(key, report)
+            report_span.set(cached=False, coalesced=shared, chars=len(report))
+            usage = current_usage()
+            if usage is not None:
+                report_span.set(usage=usage.to_dict())
+            return report
+
 if __name__ == "__main__":
-    print(call_system("What are the biggest threats in the war in Ukraine?"))
\ No newline at end of file
+    print(call_system("What are the biggest threats in the war in Ukraine?"))
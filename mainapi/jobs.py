@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from telemetry.accounting import Usage, track_usage
+from telemetry.cancellation import cancellation
+from telemetry.events import event_sink
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 4))
+REPORT_QUEUE_LIMIT = int(os.getenv("REPORT_QUEUE_LIMIT", 20))
+REPORTS_PER_USER = int(os.getenv("REPORTS_PER_USER", 2))
+REPORT_RETENTION = float(os.getenv("REPORT_RETENTION", 24 * 60 * 60))  # seconds finished jobs stay pollable
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+
+
+class JobRejected(Exception):
+    pass
+
+
+class ReportJob:
+    def __init__(self, prompt: str, user_id: str):
+        self.id = uuid.uuid4().hex
+        self.prompt = prompt
+        self.user_id = user_id
+        self.status = QUEUED
+        self.report: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.done = threading.Event()
+        self.future = None
+        self.events: List[Dict] = []
+        self.usage = Usage()
+
+    def add_event(self, event_type: str, data: Dict):
+        self.events.append({"type": event_type, "time": time.time(), **data})
+
+    def compact_events(self):
+        """
+        Merges the streamed tokens of each turn into one "token" event, so finished jobs
+        kept for REPORT_RETENTION do not hold an event per text delta. The list is
+        replaced rather than edited, so streams still reading the old one are unaffected.
+        """
+        compacted: List[Dict] = []
+        texts: List[str] = []
+        for event in self.events:
+            previous = compacted[-1] if compacted else None
+            if (event["type"] == "token" and previous is not None and previous["type"] == "token"
+                    and previous.get("turn") == event.get("turn")):
+                texts.append(event.get("text", ""))
+                continue
+            if texts:
+                previous["text"] += "".join(texts)
+                texts = []
+            compacted.append(dict(event) if event["type"] == "token" else event)
+        if texts:
+            compacted[-1]["text"] += "".join(texts)
+        self.events = compacted
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def finish(self, status: str, report: Optional[str] = None, error: Optional[str] = None):
+        self.status = status
+        self.report = report
+        self.error = error
+        self.finished_at = time.time()
+        self.add_event("job_finished", {"status": status, "error": error})
+        self.compact_events()
+        self.done.set()
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "prompt": self.prompt,
+            "user_id": self.user_id,
+            "report": self.report,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "usage": self.usage.to_dict(),
+        }
+
+
+class JobManager:
+    """
+    Runs report jobs on a bounded worker pool.
+
+    Submissions are rejected with JobRejected when REPORT_QUEUE_LIMIT jobs are already
+    waiting or the user has REPORTS_PER_USER jobs queued or running. Queued jobs can be
+    cancelled outright; running jobs get their cancel_event set, which every agent loop
+    (including nested ones inside tools) checks between turns and while waiting on
+    tools, and which cancels running BigQuery jobs. Progress events emitted while a job runs are appended to
+    job.events, and the requests, tokens and bytes it consumes are added up in job.usage.
+    """
+
+    def __init__(self, run_report: Callable, max_workers: int = REPORT_WORKERS,
+                 queue_limit: int = REPORT_QUEUE_LIMIT, per_user_limit: int = REPORTS_PER_USER):
+        self.run_report = run_report
+        self.queue_limit = queue_limit
+        self.per_user_limit = per_user_limit
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report")
+        self.jobs: Dict[str, ReportJob] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, prompt: str, user_id: str) -> ReportJob:
+        with self.lock:
+            self._purge_finished()
+            queued = sum(1 for job in self.jobs.values() if job.status == QUEUED)
+            if queued >= self.queue_limit:
+                raise JobRejected(f"Report queue is full ({queued} waiting), try again later.")
+            user_jobs = sum(1 for job in self.jobs.values() if job.user_id == user_id and job.active)
+            if user_jobs >= self.per_user_limit:
+                raise JobRejected(f"You already have {user_jobs} reports in progress.")
+            job = ReportJob(prompt, user_id)
+            self.jobs[job.id] = job
+            job.future = self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        return self.jobs.get(job_id)
+
+    def status_counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys((QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED), 0)
+        for job in list(self.jobs.values()):
+            counts[job.status] += 1
+        return counts
+
+    def cancel(self, job_id: str) -> Optional[ReportJob]:
+        job = self.jobs.get(job_id)
+        if job is None or not job.active:
+            return job
+        job.cancel_event.set()
+        if job.future.cancel():
+            job.finish(CANCELLED)
+        return job
+
+    def _run(self, job: ReportJob):
+        if job.cancel_event.is_set():
+            job.finish(CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.add_event("job_started", {})
+        try:
+            with event_sink(job.add_event), track_usage(job.usage), cancellation(job.cancel_event):
+                report = self.run_report(job.prompt, cancel_event=job.cancel_event)
+        except Exception as e:
+            if job.cancel_event.is_set():
+                job.finish(CANCELLED)
+            else:
+                job.finish(FAILED, error=str(e))
+            return
+        job.finish(CANCELLED if job.cancel_event.is_set() else SUCCEEDED, report=report)
+
+    def _purge_finished(self):
+        cutoff = time.time() - REPORT_RETENTION
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self.jobs[job_id]
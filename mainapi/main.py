@@ -1,14 +1,48 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
+from anthropic_interface import call_system
+from jobs import JobManager, JobRejected
+from telemetry.tracing import METRIC_PREFIX, metrics
+
 app = FastAPI()
 
+# Upper bound for GET /reports/{id}?wait=...
+MAX_LONG_POLL = 60  # seconds
+LONG_POLL_INTERVAL = 0.5  # seconds
+EVENT_POLL_INTERVAL = 0.1  # seconds
+
+jobs = JobManager(call_system)
+
 class TextRequest(BaseModel):
     text: str
 
 class TextResponse(BaseModel):
     text: str
 
+class ReportRequest(BaseModel):
+    prompt: str
+    # Required: the per-user job limit is keyed on it, so callers without one would share a quota
+    user_id: str
+
+class ReportStatus(BaseModel):
+    id: str
+    status: str
+    prompt: str
+    user_id: str
+    report: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    usage: Optional[Dict[str, Any]] = None
+
 # debug
 import logging
 logging.basicConfig(level=logging.INFO)    
@@ -22,6 +56,75 @@ async def echo_text(request: TextRequest):
     
     return TextResponse(text=text)
 
+@app.post("/reports", response_model=ReportStatus, status_code=202)
+async def submit_report(request: ReportRequest):
+    try:
+        job = jobs.submit(request.prompt, request.user_id)
+    except JobRejected as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    logging.info(f"Report {job.id} queued for {job.user_id}")
+    return ReportStatus(**job.to_dict())
+
+@app.get("/reports/{job_id}", response_model=ReportStatus)
+async def get_report(job_id: str, wait: float = 0):
+    """
+    Returns the job status. With wait > 0 the request is held open (long-poll) for up
+    to that many seconds, or MAX_LONG_POLL, until the job finishes.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    deadline = time.monotonic() + min(wait, MAX_LONG_POLL)
+    while not job.done.is_set() and time.monotonic() < deadline:
+        await asyncio.sleep(LONG_POLL_INTERVAL)
+    return ReportStatus(**job.to_dict())
+
+@app.get("/reports/{job_id}/events")
+async def stream_report_events(job_id: str):
+    """
+    Server-sent events for a report: progress events (tool_started, tool_finished,
+    search_results, url_scraped, rows_returned), model tokens of every turn ("token",
+    with turn_started/turn_finished markers) and a final "report" event.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    async def events():
+        sent = 0
+        # Finished jobs get a compacted event list; keep reading the one this stream started on
+        job_events = job.events
+        while True:
+            finished = job.done.is_set()
+            while sent < len(job_events):
+                event = job_events[sent]
+                sent += 1
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+            if finished:
+                break
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+        yield f"event: report\ndata: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus text exposition: duration histograms and size counters per pipeline
+    stage (see telemetry.tracing), plus the current number of report jobs per status.
+    """
+    counts = jobs.status_counts()
+    for status, count in counts.items():
+        metrics.set_gauge(f"{METRIC_PREFIX}_report_jobs", count, status=status)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.delete("/reports/{job_id}", response_model=ReportStatus)
+async def cancel_report(job_id: str):
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return ReportStatus(**job.to_dict())
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app)
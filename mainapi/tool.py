@@ -8,6 +8,9 @@ from utils import tool_executor, functions
 from data.omelas.worker import get_omelas_results
 from data_sources.search_scraper import get_search_and_scrape
 from mainapi.instructions import INSTRUCTIONS
+from telemetry.accounting import record
+from telemetry.cassette import cassette_call
+from telemetry.tracing import span
 
 def _get_omelas_results(query):
     return get_omelas_results(query)
@@ -54,6 +57,33 @@ def enhanced_tool_executor(tool_name: str, tool_input: Dict[str, Any]) -> str:
     except Exception as e:
         return json.dumps({"error": str(e)})
 
+class RecordedResponse:
+    """
+    The parts of a requests.Response that LLMHandler reads, rebuilt from a cassette.
+    """
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+def post_completion(url: str, headers: Dict[str, str], data: Dict[str, Any]):
+    return cassette_call(
+        "niprgpt", {"url": url, "data": data}, lambda: requests.post(url, headers=headers, json=data),
+        encode=lambda response: {"status_code": response.status_code, "text": response.text},
+        decode=lambda recorded: RecordedResponse(**recorded),
+    )
+
+def record_completion_usage(model: str, response_data: Dict[str, Any]):
+    usage = response_data.get("usage") or {}
+    record(model, llm_requests=1, input_tokens=usage.get("prompt_tokens", 0),
+           output_tokens=usage.get("completion_tokens", 0))
+
 class LLMHandler:
     def _get_llm_response(
         self,
@@ -100,15 +130,15 @@ class LLMHandler:
             # print("\nRequest payload:", json.dumps(data, indent=2))
 
             # Make the API call
-            response = requests.post(url, headers=headers, json=data)
-            
-            # Print raw response for debugging
-            print("\nResponse status code:", response.status_code)
-            print("Raw response:", response.text)
+            with span("llm_call", model=model) as llm_span:
+                response = post_completion(url, headers, data)
+                llm_span.set(status_code=response.status_code, response_chars=len(response.text),
+                             error=not response.ok)
 
             # If the response is not JSON, return an error
             try:
                 response_data = response.json()
+                record_completion_usage(model, response_data)
             except json.JSONDecodeError:
                 return {
                     'error': f'Invalid JSON response from API. Status code: {response.status_code}',
@@ -162,8 +192,12 @@ class LLMHandler:
                         "max_tokens": 1000,
                         "stream": False
                     }
-                    final_response = requests.post(url, headers=headers, json=final_data)
+                    with span("llm_call", model=model) as llm_span:
+                        final_response = post_completion(url, headers, final_data)
+                        llm_span.set(status_code=final_response.status_code,
+                                     response_chars=len(final_response.text), error=not final_response.ok)
                     final_response_data = final_response.json()
+                    record_completion_usage(model, final_response_data)
                     
                     if 'choices' in final_response_data:
                         final_message = final_response_data['choices'][0].get('message', {}).get('content', '')
@@ -0,0 +1,79 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+
+from telemetry.tracing import METRIC_PREFIX, metrics
+
+_current_usage = contextvars.ContextVar("usage", default=None)
+
+
+class Usage:
+    """
+    Thread-safe running totals of what one report consumed: LLM requests and tokens
+    (also broken down per model), SerpAPI and Firecrawl requests, and BigQuery jobs
+    and bytes.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.models = {}
+        self.lock = threading.Lock()
+
+    def add(self, model=None, **amounts):
+        with self.lock:
+            for key, value in amounts.items():
+                self.totals[key] = self.totals.get(key, 0) + value
+            if model:
+                per_model = self.models.setdefault(model, {})
+                for key, value in amounts.items():
+                    per_model[key] = per_model.get(key, 0) + value
+
+    def to_dict(self):
+        with self.lock:
+            return {**self.totals, "models": {model: dict(amounts) for model, amounts in self.models.items()}}
+
+
+@contextmanager
+def track_usage(usage=None):
+    """
+    Accounts everything recorded inside the block, including from threads started
+    with submit_in_context, to `usage` (a new Usage if not given), which is yielded.
+    """
+    usage = usage if usage is not None else Usage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def current_usage():
+    return _current_usage.get()
+
+
+def record(model=None, **amounts):
+    """
+    Adds amounts to the current report's usage, if any, and to the process-wide
+    antidisinform_usage_<name>_total counters served on /metrics.
+    """
+    amounts = {key: value for key, value in amounts.items() if value}
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add(model, **amounts)
+    labels = {"model": model} if model else {}
+    for key, value in amounts.items():
+        metrics.inc(f"{METRIC_PREFIX}_usage_{key}_total", value, **labels)
+
+
+def record_llm_usage(model, usage, **amounts):
+    """
+    Records one Anthropic request from the `usage` block of its response.
+    """
+    if usage is not None:
+        amounts.update(
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens,
+            cache_read_input_tokens=getattr(usage, "cache_read_input_tokens", None) or 0,
+            cache_creation_input_tokens=getattr(usage, "cache_creation_input_tokens", None) or 0,
+        )
+    record(model, llm_requests=1, **amounts)
@@ -0,0 +1,27 @@
+import contextvars
+from contextlib import contextmanager
+
+_cancel_event = contextvars.ContextVar("cancel_event", default=None)
+
+
+@contextmanager
+def cancellation(cancel_event):
+    """
+    Makes `cancel_event` the current report's cancel event inside the block, including
+    in threads started with submit_in_context, so nested agents and BigQuery jobs stop
+    when the report is cancelled.
+    """
+    token = _cancel_event.set(cancel_event)
+    try:
+        yield cancel_event
+    finally:
+        _cancel_event.reset(token)
+
+
+def current_cancel_event():
+    return _cancel_event.get()
+
+
+def is_cancelled():
+    cancel_event = _cancel_event.get()
+    return cancel_event is not None and cancel_event.is_set()
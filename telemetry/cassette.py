@@ -0,0 +1,154 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+# CASSETTE_MODE: "off", "record" (call the provider and store the response) or "replay" (serve stored responses)
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", os.path.join(".cache", "cassette.jsonl.gz"))
+# Replayed calls sleep for their recorded duration times this factor (0 replays instantly)
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", 0))
+
+OFF, RECORD, REPLAY = "off", "record", "replay"
+
+
+class CassetteMiss(KeyError):
+    pass
+
+
+class ReplayedError(Exception):
+    """
+    Raised on replay in place of an exception the provider raised while recording.
+    """
+
+
+def _to_json(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "__dict__"):
+        return vars(value)
+    return str(value)
+
+
+def request_key(provider, request):
+    """
+    Stable key of a provider request: a hash of its canonical JSON.
+    """
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=_to_json)
+    return f"{provider}:{hashlib.sha256(canonical.encode()).hexdigest()[:32]}"
+
+
+class Cassette:
+    """
+    JSONL file (gzipped if the path ends in .gz) of recorded provider calls.
+
+    Each line holds the request key, the encoded response or error and the call's
+    duration. Identical requests are replayed in the order they were recorded; once
+    they run out, the last response is repeated.
+    """
+
+    def __init__(self, path, mode, latency_scale=0.0):
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.entries = None
+        self.positions = {}
+        self.lock = threading.Lock()
+
+    def _open(self, file_mode):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, file_mode + "t", encoding="utf-8")
+        return open(self.path, file_mode, encoding="utf-8")
+
+    def _load(self):
+        if self.entries is None:
+            self.entries = {}
+            if os.path.exists(self.path):
+                with self._open("r") as f:
+                    for line in f:
+                        entry = json.loads(line)
+                        self.entries.setdefault(entry["key"], []).append(entry)
+        return self.entries
+
+    def append(self, entry):
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._open("a") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=_to_json) + "\n")
+
+    def next_entry(self, key):
+        with self.lock:
+            recorded = self._load().get(key)
+            if not recorded:
+                raise CassetteMiss(f"No recorded response for {key} in {self.path}")
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+            return recorded[min(position, len(recorded) - 1)]
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def configure(mode=None, path=None, latency_scale=None):
+    """
+    Switches the process to a cassette mode; arguments default to the environment settings.
+    """
+    global _cassette
+    with _cassette_lock:
+        _cassette = Cassette(path or CASSETTE_PATH, mode or CASSETTE_MODE,
+                             CASSETTE_LATENCY_SCALE if latency_scale is None else latency_scale)
+        return _cassette
+
+
+def get_cassette():
+    with _cassette_lock:
+        cassette = _cassette
+    return cassette or configure()
+
+
+def replaying():
+    return get_cassette().mode == REPLAY
+
+
+def cassette_call(provider, request, fn, encode=None, decode=None):
+    """
+    Calls `fn()` for a provider request, recording or replaying it per CASSETTE_MODE.
+
+    Parameters:
+    - provider (str): Provider name, e.g. "anthropic".
+    - request (dict): Everything that determines the response, without credentials.
+    - fn (callable): Performs the real call.
+    - encode (callable): Turns the response into JSON-serializable data. Defaults to identity.
+    - decode (callable): Rebuilds the response from that data. Defaults to identity.
+
+    Returns:
+    - The provider's response, live or replayed.
+    """
+    cassette = get_cassette()
+    if cassette.mode == OFF:
+        return fn()
+
+    key = request_key(provider, request)
+    if cassette.mode == REPLAY:
+        entry = cassette.next_entry(key)
+        if cassette.latency_scale:
+            time.sleep(entry["seconds"] * cassette.latency_scale)
+        if "error" in entry:
+            raise ReplayedError(entry["error"])
+        return decode(entry["response"]) if decode else entry["response"]
+
+    started = time.perf_counter()
+    try:
+        response = fn()
+    except Exception as e:
+        cassette.append({"key": key, "provider": provider, "seconds": time.perf_counter() - started,
+                         "error": f"{type(e).__name__}: {e}"})
+        raise
+    cassette.append({"key": key, "provider": provider, "seconds": time.perf_counter() - started,
+                     "response": encode(response) if encode else response})
+    return response
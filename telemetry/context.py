@@ -0,0 +1,9 @@
+import contextvars
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """
+    executor.submit that runs `fn` in a copy of the caller's context, so per-report
+    context variables (event sinks, spans, usage accounting) follow work onto pool threads.
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -0,0 +1,31 @@
+import contextvars
+from contextlib import contextmanager
+
+_event_sink = contextvars.ContextVar("event_sink", default=None)
+
+
+def emit(event_type, **data):
+    """
+    Reports a progress event (tool started, URL scraped, rows returned, ...) to the
+    sink of the current report, if any. Without a sink this is a no-op.
+    """
+    sink = _event_sink.get()
+    if sink is not None:
+        sink(event_type, data)
+
+
+def has_event_sink():
+    return _event_sink.get() is not None
+
+
+@contextmanager
+def event_sink(callback):
+    """
+    Sends events emitted inside the block, including from threads started with
+    submit_in_context, to callback(event_type, data).
+    """
+    token = _event_sink.set(callback)
+    try:
+        yield
+    finally:
+        _event_sink.reset(token)
@@ -0,0 +1,173 @@
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Optional JSONL file every finished span is appended to
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH")
+METRIC_PREFIX = "antidisinform"
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Numeric span attributes with these suffixes are sizes and are summed into per-stage counters
+SIZE_SUFFIXES = ("tokens", "rows", "bytes", "chars", "results", "chunks", "calls")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_trace_log_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters, gauges and histograms rendered in the Prometheus text format.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def render(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((key, {**value, "buckets": list(value["buckets"])})
+                                for key, value in self.histograms.items())
+        lines = []
+        for kind, series in (("counter", counters), ("gauge", gauges)):
+            typed = set()
+            for (name, labels), value in series:
+                if name not in typed:
+                    lines.append(f"# TYPE {name} {kind}")
+                    typed.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        typed = set()
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in zip((*self.buckets, math.inf), (*histogram["buckets"], histogram["count"])):
+                bucket_labels = (*labels, ("le", _format_value(bound)))
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class Span:
+    """
+    One timed stage of a report. Attributes describe its size (tokens, rows, bytes,
+    characters) and are added with `set` while the stage runs.
+    """
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def failed(self):
+        return bool(self.error or self.attributes.get("error"))
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times the enclosed block as a child of the current span, including across threads
+    started with submit_in_context.
+
+    Finished spans feed the stage duration histogram and the size counters (see
+    SIZE_SUFFIXES) served on /metrics, and are appended to TRACE_LOG_PATH when it is set.
+    """
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration = time.perf_counter() - current.started
+        record_span(current)
+
+
+def record_span(finished):
+    outcome = "error" if finished.failed else "ok"
+    metrics.observe(f"{METRIC_PREFIX}_stage_duration_seconds", finished.duration, stage=finished.name)
+    metrics.inc(f"{METRIC_PREFIX}_stage_total", stage=finished.name, outcome=outcome)
+    for key, value in finished.attributes.items():
+        if key.endswith(SIZE_SUFFIXES) and isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics.inc(f"{METRIC_PREFIX}_stage_{key}_total", value, stage=finished.name)
+    if TRACE_LOG_PATH:
+        line = json.dumps(finished.to_dict(), ensure_ascii=False, default=str)
+        with _trace_log_lock, open(TRACE_LOG_PATH, "a") as f:
+            f.write(line + "\n")
+
+
+def current_span():
+    return _current_span.get()
@@ -0,0 +1,39 @@
+# Run: ```PYTHONPATH=. pytest````
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from telemetry import accounting, tracing
+from telemetry.accounting import record, record_llm_usage, track_usage
+from telemetry.context import submit_in_context
+from telemetry.tracing import MetricsRegistry
+
+
+def test_usage_follows_report_into_worker_threads(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(accounting, "metrics", registry)
+    message_usage = SimpleNamespace(input_tokens=100, output_tokens=20, cache_read_input_tokens=80)
+
+    with track_usage() as usage:
+        record_llm_usage("sonnet", message_usage)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [submit_in_context(executor, record_llm_usage, "haiku", message_usage) for _ in range(3)]
+            futures += [submit_in_context(executor, record, firecrawl_requests=1) for _ in range(2)]
+            [future.result() for future in futures]
+        record(bigquery_jobs=1, bigquery_processed_bytes=2048)
+    record(serpapi_requests=1)  # outside the report: only counted globally
+
+    totals = usage.to_dict()
+    assert totals["llm_requests"] == 4 and totals["input_tokens"] == 400 and totals["output_tokens"] == 80
+    assert totals["cache_read_input_tokens"] == 320
+    assert totals["firecrawl_requests"] == 2 and totals["bigquery_processed_bytes"] == 2048
+    assert "serpapi_requests" not in totals
+    assert totals["models"]["haiku"]["llm_requests"] == 3
+    assert totals["models"]["sonnet"]["input_tokens"] == 100
+    assert registry.counters[("antidisinform_usage_serpapi_requests_total", ())] == 1
+    assert registry.counters[("antidisinform_usage_input_tokens_total", (("model", "haiku"),))] == 300
+
+
+def test_missing_usage_block_still_counts_request():
+    with track_usage() as usage:
+        record_llm_usage("haiku", None)
+    assert usage.to_dict() == {"llm_requests": 1, "models": {"haiku": {"llm_requests": 1}}}
@@ -0,0 +1,40 @@
+# Run: ```PYTHONPATH=. pytest````
+import pytest
+
+from bench.fakes import FakeAnthropic, FakeFirecrawl, FakeSerpAPI, FakeServiceError
+
+TOOLS = [
+    {"name": "call_gbq_function", "input_schema": {"required": ["query"]}},
+    {"name": "validate_json", "input_schema": {"required": ["json_str"]}},
+]
+
+
+def test_fake_agent_calls_tools_then_answers():
+    client = FakeAnthropic(tool_rounds=1)
+    messages = [{"role": "user", "content": [{"type": "text", "text": "grain exports"}]}]
+    first = client.messages.create(model="m", max_tokens=10, tools=TOOLS, messages=messages)
+    assert [block.name for block in first.content] == ["call_gbq_function"]
+    assert "pdate >" in first.content[0].input["query"]
+
+    messages += [{"role": "assistant", "content": first.content}, {"role": "user", "content": []}]
+    with client.messages.stream(model="m", max_tokens=10, tools=TOOLS, messages=messages) as stream:
+        streamed = "".join(stream.text_stream)
+        final = stream.get_final_message()
+    assert final.content[0].text.startswith("# Report")
+    assert streamed.strip() == final.content[0].text.strip()
+    assert client.agent_turns == 2 and client.calls == 2
+
+
+def test_fake_payloads_are_deterministic():
+    serp = FakeSerpAPI(num_results=3)
+    results = serp({"q": "kharkiv"}).get_dict()["organic_results"]
+    assert results == FakeSerpAPI(num_results=3)({"q": "kharkiv"}).get_dict()["organic_results"]
+    firecrawl = FakeFirecrawl(page_words=400)
+    assert firecrawl.scrape_url(results[0]["link"]) == firecrawl.scrape_url(results[0]["link"])
+
+
+def test_fake_errors_follow_error_rate():
+    serp = FakeSerpAPI(error_rate=1.0)
+    with pytest.raises(FakeServiceError):
+        serp({"q": "kharkiv"}).get_dict()
+    assert serp.errors == serp.calls == 1
@@ -0,0 +1,36 @@
+# Run: ```PYTHONPATH=. pytest````
+import os
+import re
+import sys
+
+import pytest
+
+for module in ("serpapi", "firecrawl", "dotenv", "anthropic", "openai", "requests", "google.cloud.bigquery"):
+    pytest.importorskip(module)
+
+from bench import run
+from data_sources.cache import SQLiteCache
+
+
+def test_every_scenario_runs_offline(monkeypatch, tmp_path, capsys):
+    # The caches were already created with the real CACHE_PATH, standing in for tmp_path here. The harness
+    # points them at its own file and extends sys.path; undo both afterwards
+    monkeypatch.setattr(sys, "path", [*sys.path, run.REPO_ROOT, os.path.join(run.REPO_ROOT, "mainapi")])
+    from data.omelas import gcp
+    from data_sources import search_scraper
+    import anthropic_interface
+
+    real_path = str(tmp_path / "cache.sqlite3")
+    for cache in (search_scraper.serp_cache, search_scraper.scrape_cache, search_scraper.summary_cache,
+                  gcp.gbq_cache, anthropic_interface.report_cache):
+        monkeypatch.setattr(cache, "path", real_path)
+        monkeypatch.setattr(cache, "_conn", None)
+    search_scraper.serp_cache.set("kept", "real entry")
+
+    run.main(["--scenario", "all", "--iterations", "1", "--concurrency", "1", "--latency-scale", "0", "--no-save"])
+    output = capsys.readouterr().out
+    for scenario in run.SCENARIOS:
+        assert f"== {scenario} @" in output
+    assert re.findall(r"failed_calls\s+(\d+)", output) == ["0"] * len(run.SCENARIOS)
+    assert search_scraper.serp_cache.path != real_path
+    assert SQLiteCache("serp", path=real_path).get("kept") == "real entry"
@@ -0,0 +1,104 @@
+# Run: ```PYTHONPATH=. pytest````
+import time
+
+import pytest
+
+from data_sources.cache import MISS, NEGATIVE, SQLiteCache, normalize_url
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://Example.com:443/news/?utm_source=x&b=2&a=1#top") == "https://example.com/news?a=1&b=2"
+    assert normalize_url("http://example.com") == normalize_url("http://example.com/")
+
+def test_get_set_roundtrip(cache_path):
+    cache = SQLiteCache("test", path=cache_path)
+    assert cache.get("k") is MISS
+    cache.set("k", {"markdown": "text"})
+    assert cache.get("k") == {"markdown": "text"}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_entries_persist_across_instances(cache_path):
+    SQLiteCache("test", path=cache_path).set("k", "v")
+    assert SQLiteCache("test", path=cache_path).get("k") == "v"
+    assert SQLiteCache("other", path=cache_path).get("k") is MISS
+
+def test_ttl_expiry(cache_path):
+    cache = SQLiteCache("test", path=cache_path, ttl=0.05)
+    cache.set("k", "v")
+    time.sleep(0.1)
+    assert cache.get("k") is MISS
+
+def test_negative_entries(cache_path):
+    cache = SQLiteCache("test", path=cache_path, negative_ttl=60)
+    cache.set_negative("k")
+    assert cache.get("k") is NEGATIVE
+    assert cache.stats()["negative_hits"] == 1
+
+def test_lru_eviction(cache_path):
+    cache = SQLiteCache("test", path=cache_path, max_bytes=30)
+    cache.set("a", "x" * 10)
+    cache.set("b", "x" * 10)
+    cache.get("a")
+    cache.set("c", "x" * 10)
+    assert cache.get("b") is MISS
+    assert cache.get("a") is not MISS and cache.get("c") is not MISS
+    assert cache.stats()["evictions"] == 1
+
+def test_version_change_invalidates_entries(cache_path):
+    SQLiteCache("test", path=cache_path, version="v1").set("k", "old")
+    assert SQLiteCache("test", path=cache_path, version="v1").get("k") == "old"
+    cache = SQLiteCache("test", path=cache_path, version="v2")
+    assert cache.get("k") is MISS
+    assert cache.stats()["entries"] == 0
+
+def test_stale_entries_are_served_within_stale_ttl(cache_path):
+    cache = SQLiteCache("test", path=cache_path, ttl=0.05, stale_ttl=60)
+    cache.set("k", "v")
+    assert cache.get_stale("k") == ("v", False)
+    time.sleep(0.1)
+    assert cache.get("k") is MISS
+    assert cache.get_stale("k") == ("v", True)
+    assert cache.stats()["stale_hits"] == 1
+
+def test_single_flight_shares_concurrent_calls():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from data_sources.cache import SingleFlight
+
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "report"
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(flights.do, "prompt", compute) for _ in range(3)]
+        time.sleep(0.1)
+        release.set()
+        results = [future.result() for future in futures]
+    assert len(calls) == 1
+    assert sorted(results) == [("report", False), ("report", True), ("report", True)]
+    assert flights.do("prompt", lambda: "again") == ("again", False)
+
+def test_single_flight_follower_stops_waiting_when_cancelled():
+    import threading
+    from concurrent.futures import CancelledError, ThreadPoolExecutor
+    from data_sources.cache import SingleFlight
+
+    flights = SingleFlight()
+    release, cancel_event = threading.Event(), threading.Event()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flights.do, "prompt", lambda: release.wait(5) and "report")
+        time.sleep(0.05)
+        follower = executor.submit(flights.do, "prompt", lambda: "unused", cancel_event=cancel_event)
+        time.sleep(0.05)
+        cancel_event.set()
+        with pytest.raises(CancelledError):
+            follower.result(timeout=2)
+        assert not leader.done()
+        release.set()
+        assert leader.result() == ("report", False)
@@ -0,0 +1,57 @@
+# Run: ```PYTHONPATH=. pytest````
+import time
+
+import pytest
+
+from telemetry import cassette
+from telemetry.cassette import CassetteMiss, ReplayedError, cassette_call
+
+
+@pytest.fixture
+def cassette_path(tmp_path):
+    yield str(tmp_path / "cassette.jsonl.gz")
+    cassette.configure(mode="off")
+
+
+def test_record_then_replay(cassette_path):
+    calls = []
+
+    def search(query):
+        calls.append(query)
+        return {"organic_results": [{"link": f"https://example.com/{query}", "n": len(calls)}]}
+
+    cassette.configure(mode="record", path=cassette_path)
+    first = cassette_call("serpapi", {"q": "kharkiv"}, lambda: search("kharkiv"))
+    second = cassette_call("serpapi", {"q": "kharkiv"}, lambda: search("kharkiv"))
+    with pytest.raises(ValueError):
+        cassette_call("serpapi", {"q": "odesa"}, lambda: int("x"))
+
+    cassette.configure(mode="replay", path=cassette_path)
+    assert cassette_call("serpapi", {"q": "kharkiv"}, lambda: search("kharkiv")) == first
+    assert cassette_call("serpapi", {"q": "kharkiv"}, lambda: search("kharkiv")) == second
+    # Past the recorded calls the last response repeats
+    assert cassette_call("serpapi", {"q": "kharkiv"}, lambda: search("kharkiv")) == second
+    assert len(calls) == 2
+    with pytest.raises(ReplayedError, match="ValueError"):
+        cassette_call("serpapi", {"q": "odesa"}, lambda: None)
+    with pytest.raises(CassetteMiss):
+        cassette_call("serpapi", {"q": "lviv"}, lambda: None)
+
+
+def test_encode_decode_and_scaled_latency(cassette_path):
+    cassette.configure(mode="record", path=cassette_path)
+
+    def slow_call():
+        time.sleep(0.05)
+        return {1, 2}
+    cassette_call("firecrawl", {"url": "https://x.ua"}, slow_call, encode=sorted, decode=set)
+
+    cassette.configure(mode="replay", path=cassette_path, latency_scale=0)
+    started = time.perf_counter()
+    assert cassette_call("firecrawl", {"url": "https://x.ua"}, slow_call, encode=sorted, decode=set) == {1, 2}
+    assert time.perf_counter() - started < 0.03
+
+    cassette.configure(mode="replay", path=cassette_path, latency_scale=1)
+    started = time.perf_counter()
+    cassette_call("firecrawl", {"url": "https://x.ua"}, slow_call, encode=sorted, decode=set)
+    assert time.perf_counter() - started >= 0.04
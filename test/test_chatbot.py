@@ -0,0 +1,79 @@
+# Run: ```PYTHONPATH=. pytest````
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from data.omelas import chatbot
+from data.omelas.chatbot import AgentCancelled, run_tools_concurrently
+from telemetry.cancellation import cancellation, current_cancel_event
+
+
+def tool_use(tool_id, name, **tool_input):
+    return SimpleNamespace(id=tool_id, name=name, input=tool_input)
+
+
+def test_cancel_reaches_tools_and_stops_waiting():
+    cancel_event, release = threading.Event(), threading.Event()
+    seen = []
+
+    def tool_executor(name, tool_input):
+        # A tool that ignores cancellation must not hold up the agent
+        seen.append(current_cancel_event())
+        release.wait(5)
+        return "done"
+
+    threading.Timer(0.1, cancel_event.set).start()
+    started = time.monotonic()
+    with cancellation(cancel_event), pytest.raises(AgentCancelled):
+        run_tools_concurrently([tool_use("t1", "slow")], tool_executor, cancel_event)
+    assert time.monotonic() - started < 2
+    release.set()
+    assert seen == [cancel_event]
+
+
+def sleepy_executor(delays, outputs):
+    def tool_executor(name, tool_input):
+        time.sleep(delays.get(tool_input["key"], 0))
+        return outputs[tool_input["key"]]
+    return tool_executor
+
+
+def test_results_keep_request_order():
+    tool_executor = sleepy_executor({"a": 0.2}, {"a": "first", "b": "second"})
+    results, final_result = run_tools_concurrently(
+        [tool_use("t1", "search", key="a"), tool_use("t2", "search", key="b")], tool_executor)
+    assert [r["tool_use_id"] for r in results] == ["t1", "t2"]
+    assert [r["content"][0]["text"] for r in results] == ["first", "second"]
+    assert [r["is_error"] for r in results] == [False, False]
+    assert final_result is None
+
+
+def test_slow_tool_times_out_with_error(monkeypatch):
+    monkeypatch.setitem(chatbot.TOOL_TIMEOUTS, "slow", 0.2)
+    tool_executor = sleepy_executor({"a": 1}, {"a": "late", "b": "on time"})
+    started = time.monotonic()
+    results, _ = run_tools_concurrently([tool_use("t1", "slow", key="a"), tool_use("t2", "fast", key="b")],
+                                        tool_executor)
+    assert time.monotonic() - started < 0.8
+    assert results[0]["content"][0]["text"] == "ERROR: slow timed out after 0.2 seconds"
+    assert results[0]["is_error"] is True
+    assert results[1]["content"][0]["text"] == "on time" and results[1]["is_error"] is False
+
+
+def test_error_strings_are_flagged():
+    tool_executor = sleepy_executor({}, {"a": "ERROR: bad query"})
+    results, final_result = run_tools_concurrently([tool_use("t1", "call_gbq_function", key="a")], tool_executor)
+    assert results[0]["is_error"] is True and final_result is None
+
+
+def test_first_final_result_in_request_order_wins():
+    tool_executor = sleepy_executor({"a": 0.2}, {"a": '{"rows": [1]}', "b": '{"rows": [2]}', "c": "ERROR: x"})
+    _, final_result = run_tools_concurrently(
+        [tool_use("t1", "call_gbq_function", key="a"), tool_use("t2", "call_gbq_function", key="b")], tool_executor)
+    assert final_result == '{"rows": [1]}'
+
+    _, final_result = run_tools_concurrently(
+        [tool_use("t1", "call_gbq_function", key="c"), tool_use("t2", "call_gbq_function", key="b")], tool_executor)
+    assert final_result == '{"rows": [2]}'
@@ -0,0 +1,72 @@
+# Run: ```PYTHONPATH=. pytest````
+from data_sources.dedup import OnlineDeduplicator, collapse_near_duplicates, estimated_similarity, minhash_signature
+
+STORY = (
+    "Ukrainian forces reported heavy fighting near Pokrovsk on Tuesday as Russian units pressed attacks along "
+    "several axes of the eastern front. The general staff said dozens of assaults were repelled and that drone "
+    "strikes hit fuel depots behind the lines. Officials in the region urged remaining civilians to evacuate as "
+    "artillery shelling intensified across nearby villages and supply roads came under fire."
+)
+OTHER_STORY = (
+    "Chinese and American diplomats met in Beijing to discuss trade tariffs, export controls on semiconductors and "
+    "cooperation on climate policy. Both delegations described the talks as candid and constructive, and agreed "
+    "to continue working-level consultations ahead of a possible leaders meeting later in the year at the summit."
+)
+
+def result(link, content):
+    return {"link": link, "scraped_content": content}
+
+def test_similar_texts_have_similar_signatures():
+    syndicated = "Telegram repost: " + STORY + " Subscribe to our channel."
+    assert estimated_similarity(minhash_signature(STORY), minhash_signature(syndicated)) > 0.7
+    assert estimated_similarity(minhash_signature(STORY), minhash_signature(OTHER_STORY)) < 0.2
+
+def test_collapse_keeps_longest_copy_and_all_links():
+    results = [
+        result("https://a.ru/1", STORY),
+        result("https://b.com/2", OTHER_STORY),
+        result("https://c.ua/3", STORY + " Read more on our website."),
+        result("https://d.ru/4", "Error during scraping"),
+    ]
+    collapsed = collapse_near_duplicates(results)
+    assert [r["link"] for r in collapsed] == ["https://c.ua/3", "https://b.com/2", "https://d.ru/4"]
+    assert collapsed[0]["duplicate_links"] == ["https://a.ru/1"]
+
+def test_online_deduplicator_points_to_first_copy():
+    deduplicator = OnlineDeduplicator()
+    assert deduplicator.representative_of(result("https://a.ru/1", STORY)) is None
+    assert deduplicator.representative_of(result("https://b.com/2", OTHER_STORY)) is None
+    assert deduplicator.representative_of(result("https://c.ua/3", STORY.upper())) == "https://a.ru/1"
+
+def test_shared_site_chrome_does_not_make_duplicates():
+    headlines = [
+        "Parliament debates new mobilization bill", "Grain corridor shipments resume from Odesa",
+        "Energy grid repaired after overnight strikes", "Central bank holds key rate steady",
+        "Refugees return to liberated villages in Kherson", "Allies pledge more air defense systems",
+        "Investigation into embezzlement at defense ministry widens", "Weather service warns of early frost",
+        "Football league resumes matches in western cities", "Volunteers raise funds for field hospitals",
+        "Teachers adapt lessons to underground schools", "Railway opens new route to the Polish border",
+        "Prosecutors charge officials over fortification contracts", "Drone makers scale up production lines",
+        "Farmers clear mines from fields before sowing season", "Orchestra tours European capitals for charity",
+        "Hackers target regional administration websites", "Fuel prices climb after refinery outage",
+        "Students protest against university mergers", "Lawmakers approve budget amendments for defense",
+        "Shipping insurers return to Black Sea routes", "Museum reopens with exhibition on occupied Crimea",
+        "Startups win contracts for battlefield software", "Doctors report shortage of rehabilitation specialists",
+        "Border guards detain smugglers on the Danube", "Court rules on seized oligarch assets",
+        "Power plant operators train new engineers", "Satellite images show damaged airfields in Crimea",
+        "City council votes to rename streets", "Exporters look for new markets in Asia",
+        "Nuclear agency inspectors visit Zaporizhzhia plant", "Postal service delivers parcels to frontline towns",
+        "Writers festival moves online amid air raid alerts", "Census planned once hostilities end",
+    ]
+    nav = "\n".join(f"- [{headline}](https://news.example/most-read/{i})" for i, headline in enumerate(headlines))
+    footer = "\n".join([
+        "Subscribe to our newsletter", "Follow us on Telegram", "Privacy policy", "Terms of use",
+        "[About us](https://news.example/about) | [Contact](https://news.example/contact)"
+        " | [Careers](https://news.example/careers) | [Advertise](https://news.example/ads)",
+        "© 2024 News Example. All rights reserved.",
+    ])
+    results = [
+        result("https://news.example/1", f"{nav}\n\n{STORY}\n\n{footer}"),
+        result("https://news.example/2", f"{nav}\n\n{OTHER_STORY}\n\n{footer}"),
+    ]
+    assert [r["link"] for r in collapse_near_duplicates(results)] == ["https://news.example/1", "https://news.example/2"]
@@ -0,0 +1,86 @@
+# Run: ```PYTHONPATH=. pytest````
+import threading
+
+import pytest
+
+from mainapi.jobs import CANCELLED, FAILED, SUCCEEDED, JobManager, JobRejected
+from telemetry.accounting import record
+
+def test_job_runs_to_completion():
+    manager = JobManager(lambda prompt, cancel_event: f"# {prompt}", max_workers=1)
+    job = manager.submit("Ukraine", "analyst")
+    assert job.done.wait(5)
+    assert job.status == SUCCEEDED and job.report == "# Ukraine"
+
+def test_failed_job_records_error():
+    def run_report(prompt, cancel_event):
+        raise RuntimeError("boom")
+    job = JobManager(run_report, max_workers=1).submit("x", "analyst")
+    assert job.done.wait(5)
+    assert job.status == FAILED and job.error == "boom"
+
+def test_queue_and_per_user_limits():
+    release = threading.Event()
+    manager = JobManager(lambda prompt, cancel_event: release.wait(5), max_workers=1, queue_limit=1, per_user_limit=2)
+    manager.submit("a", "alice")
+    manager.submit("b", "alice")
+    with pytest.raises(JobRejected):
+        manager.submit("c", "alice")
+    with pytest.raises(JobRejected):
+        manager.submit("d", "bob")
+    release.set()
+
+def test_cancel_queued_and_running_jobs():
+    started = threading.Event()
+    def run_report(prompt, cancel_event):
+        started.set()
+        cancel_event.wait(5)
+        return "partial"
+    manager = JobManager(run_report, max_workers=1)
+    running = manager.submit("a", "alice")
+    queued = manager.submit("b", "bob")
+    assert started.wait(5)
+    assert manager.cancel(queued.id).status == CANCELLED
+    manager.cancel(running.id)
+    assert running.done.wait(5)
+    assert running.status == CANCELLED
+
+def test_progress_events_are_recorded_on_the_job():
+    from telemetry.events import emit
+    def run_report(prompt, cancel_event):
+        emit("url_scraped", url="https://example.com")
+        return "# report"
+    job = JobManager(run_report, max_workers=1).submit("x", "analyst")
+    assert job.done.wait(5)
+    assert [event["type"] for event in job.events] == ["job_started", "url_scraped", "job_finished"]
+    assert job.events[1]["url"] == "https://example.com"
+
+def test_job_reports_usage():
+    def run_report(prompt, cancel_event):
+        record("haiku", llm_requests=1, input_tokens=50)
+        return "# report"
+    job = JobManager(run_report, max_workers=1).submit("x", "analyst")
+    assert job.done.wait(5)
+    assert job.to_dict()["usage"] == {"llm_requests": 1, "input_tokens": 50,
+                                      "models": {"haiku": {"llm_requests": 1, "input_tokens": 50}}}
+
+def test_cancel_event_is_carried_in_context():
+    from telemetry.cancellation import current_cancel_event
+    manager = JobManager(lambda prompt, cancel_event: current_cancel_event() is cancel_event, max_workers=1)
+    job = manager.submit("x", "analyst")
+    assert job.done.wait(5)
+    assert job.report is True
+
+def test_finished_job_merges_token_events():
+    from telemetry.events import emit
+    def run_report(prompt, cancel_event):
+        for text in ("# Re", "port", " one"):
+            emit("token", turn=1, text=text)
+        emit("tool_started", tool="search")
+        for text in ("# Fin", "al"):
+            emit("token", turn=2, text=text)
+        return "# Final"
+    job = JobManager(run_report, max_workers=1).submit("x", "analyst")
+    assert job.done.wait(5)
+    assert [event["type"] for event in job.events] == ["job_started", "token", "tool_started", "token", "job_finished"]
+    assert [event["text"] for event in job.events if event["type"] == "token"] == ["# Report one", "# Final"]
@@ -0,0 +1,64 @@
+# Run: ```PYTHONPATH=. pytest````
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bench.fakes import FakeAnthropic
+from data_sources import llm
+
+CACHED_SYSTEM = [{"type": "text", "text": "You are a news analyst.", "cache_control": {"type": "ephemeral"}}]
+PARAMS = {"model": "claude-3-5-haiku-20241022", "max_tokens": 64, "messages": [{"role": "user", "content": "Hi"}]}
+
+
+class RecordingAnthropic(FakeAnthropic):
+    def __init__(self):
+        super().__init__(summary_words=5)
+        self.requests = []
+
+    def respond(self, params):
+        self.requests.append(params)
+        return super().respond(params)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = RecordingAnthropic()
+    monkeypatch.setattr(llm, "_client", fake)
+    return fake
+
+
+def test_create_message_marks_the_system_prompt_for_caching(client):
+    llm.create_message(system="You are a news analyst.", **PARAMS)
+    assert client.requests[0]["system"] == CACHED_SYSTEM
+
+
+def test_stream_message_marks_the_system_prompt_for_caching(client):
+    chunks = []
+    llm.stream_message(chunks.append, system="You are a news analyst.", **PARAMS)
+    assert client.requests[0]["system"] == CACHED_SYSTEM
+    assert chunks
+
+
+def test_get_client_is_shared_across_calls_and_threads(monkeypatch):
+    anthropic = pytest.importorskip("anthropic")
+    created = []
+
+    class CountingAnthropic:
+        def __init__(self, **kwargs):
+            created.append(self)
+
+    monkeypatch.setattr(anthropic, "Anthropic", CountingAnthropic)
+    monkeypatch.setattr(llm, "_client", None)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+
+    barrier = threading.Barrier(8)
+
+    def get_client():
+        barrier.wait()
+        return llm.get_client()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(executor.map(lambda _: get_client(), range(8)))
+    assert len(created) == 1
+    assert all(client is created[0] for client in [*clients, llm.get_client()])
@@ -0,0 +1,38 @@
+# Run: ```PYTHONPATH=. pytest````
+from data.omelas.context import MessageHistory, digest_tool_result
+
+def tool_turn(tool_use_id, text):
+    return [
+        {"role": "assistant", "content": [{"type": "tool_use", "id": tool_use_id, "name": "get_search_and_scrape", "input": {}}]},
+        {"role": "user", "content": [{"type": "tool_result", "tool_use_id": tool_use_id,
+                                      "content": [{"type": "text", "text": text}], "is_error": False}]},
+    ]
+
+def search_result(n):
+    return str([{"link": f"https://news.example/{n}/{i}", "scraped_content": "lorem ipsum " * 500} for i in range(3)])
+
+def test_digest_keeps_all_urls():
+    text = search_result(1)
+    digest = digest_tool_result(text, "toolu_1")
+    assert len(digest) < len(text) / 5
+    for i in range(3):
+        assert f"https://news.example/1/{i}" in digest
+
+def test_old_tool_results_are_condensed_over_budget():
+    history = MessageHistory(budget=5000)
+    history.append({"role": "user", "content": [{"type": "text", "text": "prompt"}]})
+    for n in range(3):
+        for message in tool_turn(f"toolu_{n}", search_result(n)):
+            history.append(message)
+    assert history.total_tokens <= 5000
+    first_result = history.messages[2]["content"][0]["content"][0]["text"]
+    last_result = history.messages[-1]["content"][0]["content"][0]["text"]
+    assert first_result.startswith("[Condensed earlier tool result toolu_0")
+    assert last_result == search_result(2)
+
+def test_under_budget_history_is_untouched():
+    history = MessageHistory(budget=100000)
+    history.append({"role": "user", "content": [{"type": "text", "text": "prompt"}]})
+    for message in tool_turn("toolu_0", search_result(0)) + tool_turn("toolu_1", search_result(1)):
+        history.append(message)
+    assert history.messages[2]["content"][0]["content"][0]["text"] == search_result(0)
@@ -0,0 +1,146 @@
+# Run: ```PYTHONPATH=. pytest````
+import datetime
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.cloud.bigquery")
+
+from google.api_core.exceptions import ServiceUnavailable
+
+from bench.fakes import FakeBigQuery
+from data.omelas import gcp
+
+RECENT = (datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=3)).isoformat()
+QUERY = "SELECT text, url FROM hack.main WHERE pdate > DATE_SUB(CURRENT_DATE, INTERVAL 3 DAY)"
+ROWS = [{"text": "post", "url": "https://t.me/c/1"}]
+
+
+class ScriptedJob:
+    """
+    Query job that raises `outcome` if it is an exception, never finishes if it is
+    "hang", and otherwise returns it as the rows.
+    """
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.cancelled = False
+        self.timeouts = []
+
+    def cancel(self):
+        self.cancelled = True
+        return True
+
+    def result(self, timeout=None, page_size=None):
+        self.timeouts.append(timeout)
+        if self.outcome == "hang":
+            time.sleep(timeout)
+            raise TimeoutError()
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return iter(self.outcome)
+
+
+class ScriptedBigQuery:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.jobs = []
+
+    def query(self, query, job_config=None):
+        if getattr(job_config, "dry_run", False):
+            return SimpleNamespace(total_bytes_processed=1024)
+        self.jobs.append(ScriptedJob(self.outcomes.pop(0)))
+        return self.jobs[-1]
+
+
+@pytest.fixture
+def bigquery(monkeypatch, tmp_path):
+    monkeypatch.setattr(gcp.gbq_cache, "path", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(gcp.gbq_cache, "_conn", None)
+    monkeypatch.setattr(gcp, "OMELAS_BACKEND", "bigquery")
+    monkeypatch.setattr(gcp, "GBQ_POLL_INTERVAL", 0.01)
+    delays = []
+    monkeypatch.setattr(gcp, "backoff_delay", lambda attempt: delays.append(attempt) or 0)
+
+    def use(*outcomes):
+        client = ScriptedBigQuery(*outcomes)
+        client.backoff_attempts = delays
+        monkeypatch.setattr(gcp, "get_bigquery_client", lambda: client)
+        return client
+    return use
+
+
+@pytest.mark.parametrize("predicate", [
+    f't.pdate >= "{RECENT}"',
+    f"DATE(pdate) > '{RECENT}'",
+    "pdate >= @start",
+    f"pdate IN ('{RECENT}')",
+])
+def test_cost_check_accepts_pdate_predicates(predicate):
+    client = FakeBigQuery(bytes_processed=1024)
+    query = f"SELECT text, url FROM hack.main t WHERE {predicate}"
+    assert gcp.check_query_cost(client, query, {"start": datetime.date.fromisoformat(RECENT)}) is None
+
+
+def test_cost_check_without_window_still_checks_bytes():
+    client = FakeBigQuery(bytes_processed=gcp.GBQ_MAXIMUM_BYTES_BILLED + 1)
+    error = gcp.check_query_cost(client, "SELECT text FROM hack.main WHERE section = 'Politics'")
+    assert error.startswith("ERROR: Query rejected because it would process")
+
+
+def test_cost_check_rejects_too_many_partitions():
+    client = FakeBigQuery(bytes_processed=1024)
+    error = gcp.check_query_cost(client, "SELECT text FROM hack.main WHERE pdate > '2020-01-01'")
+    assert error.startswith("ERROR: Query rejected because it reads")
+
+
+def test_unavailable_backend_is_retried_then_reported(bigquery, monkeypatch):
+    monkeypatch.setattr(gcp, "GBQ_MAX_RETRIES", 2)
+    client = bigquery(*[ServiceUnavailable("backend down")] * 3)
+    result = gcp.call_gbq_function(QUERY)
+    assert len(client.jobs) == 3
+    assert client.backoff_attempts == [0, 1]
+    assert result.startswith("ERROR: BigQuery failed after 3 attempts")
+
+
+def test_retry_succeeds_after_transient_errors(bigquery):
+    client = bigquery(ServiceUnavailable("backend down"), ROWS)
+    result = gcp.call_gbq_function(QUERY)
+    assert len(client.jobs) == 2
+    assert result["rows"] == [["post", "https://t.me/c/1"]]
+
+
+@pytest.mark.parametrize("attempt", [0, 1, 3, 10])
+def test_backoff_jitter_stays_within_the_cap(attempt):
+    cap = min(gcp.GBQ_BACKOFF_MAX, gcp.GBQ_BACKOFF_BASE * 2 ** attempt)
+    delays = [gcp.backoff_delay(attempt) for _ in range(200)]
+    assert all(0 <= delay <= cap for delay in delays)
+    assert max(delays) > cap / 2
+
+
+def test_slow_job_is_cancelled_at_the_timeout(bigquery):
+    client = bigquery("hang")
+    result = gcp.call_gbq_function(QUERY, timeout=0.05)
+    assert result.startswith("ERROR: Query did not finish within 0.05 seconds")
+    job = client.jobs[0]
+    assert job.cancelled
+    assert len(job.timeouts) > 1 and all(timeout <= gcp.GBQ_POLL_INTERVAL for timeout in job.timeouts)
+
+
+def test_cancel_event_cancels_the_running_job(bigquery):
+    client = bigquery("hang")
+    cancel_event = threading.Event()
+    threading.Timer(0.05, cancel_event.set).start()
+    result = gcp.call_gbq_function(QUERY, timeout=5, cancel_event=cancel_event)
+    assert result == "ERROR: Query was cancelled"
+    assert client.jobs[0].cancelled
+
+
+def test_cancelled_before_start_runs_no_job(bigquery):
+    client = bigquery(ROWS)
+    cancel_event = threading.Event()
+    cancel_event.set()
+    assert gcp.call_gbq_function(QUERY, cancel_event=cancel_event) == "ERROR: Query was cancelled"
+    assert not client.jobs
@@ -0,0 +1,71 @@
+# Run: ```PYTHONPATH=. pytest````
+import datetime
+
+import pytest
+
+duckdb = pytest.importorskip("duckdb")
+
+from data.omelas.mirror import LOCAL_TABLE, PARTITIONS_TABLE, MirrorUnavailable, run_local_query
+
+TODAY = datetime.date(2024, 11, 20)
+
+QUERY = """
+SELECT DISTINCT date, source_name, url, relevance_score
+FROM hack.main
+CROSS JOIN UNNEST(ner_data) AS ner_data
+WHERE pdate > DATE_SUB(CURRENT_DATE, INTERVAL 2 DAY)
+ AND section = "Armed Conflict" AND ner_data.country = 'Ukraine'
+ORDER BY relevance_score DESC
+"""
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    path = str(tmp_path / "mirror.duckdb")
+    conn = duckdb.connect(path)
+    conn.execute(f"""CREATE TABLE {LOCAL_TABLE} (pdate DATE, date TIMESTAMP, source_name VARCHAR, url VARCHAR, text VARCHAR,
+        section VARCHAR, relevance_score DOUBLE, keywords VARCHAR[],
+        ner_data STRUCT(country VARCHAR, city VARCHAR)[])""")
+    conn.execute(f"""INSERT INTO {LOCAL_TABLE} VALUES
+        ('2024-11-19', '2024-11-19 10:00', 'a', 'https://a', 'Shelling near Kyiv', 'Armed Conflict', 0.9, ['drone'],
+         [{{'country': 'Ukraine', 'city': 'Kyiv'}}, {{'country': 'Poland', 'city': NULL}}]),
+        ('2024-11-20', '2024-11-20 08:00', 'b', 'https://b', 'Front line report', 'Armed Conflict', 0.5, [], [{{'country': 'Ukraine', 'city': NULL}}]),
+        ('2024-11-20', '2024-11-20 09:00', 'c', 'https://c', 'Coalition talks', 'Politics', 0.7, [], [{{'country': 'Ukraine', 'city': NULL}}])""")
+    conn.execute(f"CREATE TABLE {PARTITIONS_TABLE} (pdate DATE PRIMARY KEY, row_count BIGINT, synced_at TIMESTAMP)")
+    conn.execute(f"INSERT INTO {PARTITIONS_TABLE} VALUES ('2024-11-19', 1, now()), ('2024-11-20', 2, now())")
+    conn.close()
+    return path
+
+
+def test_runs_generated_query_locally(mirror):
+    result = run_local_query(QUERY, today=TODAY, path=mirror)
+    url = result["columns"].index("url")
+    assert [row[url] for row in result["rows"]] == ["https://a", "https://b"]
+    assert result["truncated"] is False
+
+
+def test_scalar_array_join(mirror):
+    query = "SELECT k, COUNT(*) AS n FROM hack.main, UNNEST(keywords) k WHERE pdate >= '2024-11-19' GROUP BY k"
+    result = run_local_query(query, today=TODAY, path=mirror)
+    assert result["columns"] == ["k", "n"]
+    assert result["rows"] == [["drone", 1]]
+
+
+def test_uncovered_window_is_unavailable(mirror):
+    query = QUERY.replace("INTERVAL 2 DAY", "INTERVAL 7 DAY")
+    with pytest.raises(MirrorUnavailable):
+        run_local_query(query, today=TODAY, path=mirror)
+
+
+def test_missing_mirror_is_unavailable(tmp_path):
+    with pytest.raises(MirrorUnavailable):
+        run_local_query(QUERY, today=TODAY, path=str(tmp_path / "missing.duckdb"))
+
+
+def test_template_query_with_parameters(mirror):
+    from data.omelas.templates import template_query
+
+    query, params = template_query("Fighting in Ukraine over the past 2 days")
+    result = run_local_query(query, today=TODAY, path=mirror, params=params)
+    url = result["columns"].index("url")
+    assert [row[url] for row in result["rows"]] == ["https://a", "https://b"]
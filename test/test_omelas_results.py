@@ -0,0 +1,47 @@
+# Run: ```PYTHONPATH=. pytest````
+import datetime
+import json
+
+from data.omelas.results import collect_rows, serialize_result
+
+def make_rows(n, text="post"):
+    return [
+        {"date": datetime.date(2024, 11, 1), "text": f"{text} {i}", "url": f"https://t.me/c/{i}", "relevance_score": 0.5}
+        for i in range(n)
+    ]
+
+def test_columnar_output_and_dedupe():
+    rows = make_rows(3) + make_rows(2)
+    result = collect_rows(rows)
+    assert result["columns"] == ["date", "text", "url", "relevance_score"]
+    assert result["rows"][0] == ["2024-11-01", "post 0", "https://t.me/c/0", 0.5]
+    assert len(result["rows"]) == 3
+    assert result["duplicates_removed"] == 2
+    assert not result["truncated"]
+
+def test_rows_differing_in_any_column_are_kept():
+    rows = make_rows(1) + [dict(make_rows(1)[0], relevance_score=0.9), dict(make_rows(1)[0], date=None)]
+    result = collect_rows(rows)
+    assert [row[3] for row in result["rows"]] == [0.5, 0.9, 0.5]
+    assert result["duplicates_removed"] == 0
+
+def test_row_cap_stops_reading():
+    consumed = []
+    def rows():
+        for row in make_rows(100):
+            consumed.append(row)
+            yield row
+    result = collect_rows(rows(), max_rows=10)
+    assert len(result["rows"]) == 10
+    assert result["truncated"]
+    assert len(consumed) == 11
+
+def test_byte_budget_and_text_truncation():
+    result = collect_rows(make_rows(50, text="x" * 1000), max_bytes=2000, max_text_chars=100)
+    assert len(result["rows"][0][1]) == 101
+    assert len(json.dumps(result["rows"])) <= 2000
+    assert result["truncated"]
+
+def test_empty_result_serializes_to_empty_list():
+    assert serialize_result(collect_rows([])) == "[]"
+    assert json.loads(serialize_result(collect_rows(make_rows(1))))["rows"]
@@ -0,0 +1,90 @@
+# Run: ```PYTHONPATH=. pytest````
+import datetime
+
+from data.omelas.sql import normalize_sql, partition_count, pdate_window, shift_date, to_duckdb
+
+TODAY = datetime.date(2024, 11, 20)
+
+SAMPLE_QUERY = """
+SELECT DISTINCT date, source_name, text, url, relevance_score
+FROM hack.main
+CROSS JOIN UNNEST(ner_data) AS ner_data
+WHERE pdate > DATE_SUB(CURRENT_DATE, INTERVAL 14 DAY)
+ AND section = 'Armed Conflict' AND ner_data.country = 'Ukraine'
+ORDER BY relevance_score DESC
+"""
+
+def test_sample_query_window():
+    window = pdate_window(SAMPLE_QUERY, today=TODAY)
+    assert window == (datetime.date(2024, 11, 7), TODAY)
+    assert partition_count(window) == 14
+
+def test_literal_bounds_and_qualified_column():
+    query = "SELECT * FROM hack.main m WHERE m.pdate >= '2024-10-01' AND m.pdate < DATE '2024-10-11'"
+    window = pdate_window(query, today=TODAY)
+    assert window == (datetime.date(2024, 10, 1), datetime.date(2024, 10, 10))
+    assert partition_count(window) == 10
+
+def test_between_and_month_interval():
+    query = "WHERE pdate BETWEEN DATE_SUB(CURRENT_DATE(), INTERVAL 1 MONTH) AND CURRENT_DATE()"
+    assert pdate_window(query, today=TODAY) == (datetime.date(2024, 10, 20), TODAY)
+
+def test_widest_window_wins():
+    query = "WHERE (pdate = '2024-11-01') OR (pdate > DATE_SUB(CURRENT_DATE, INTERVAL 2 DAY))"
+    assert pdate_window(query, today=TODAY) == (datetime.date(2024, 11, 1), TODAY)
+
+def test_missing_pdate_filter():
+    assert pdate_window("SELECT * FROM hack.main WHERE section = 'Politics'", today=TODAY) is None
+
+def test_double_quoted_literal_and_date_wrapped_column():
+    assert pdate_window('WHERE t.pdate >= "2024-11-01"', today=TODAY) == (datetime.date(2024, 11, 1), TODAY)
+    assert pdate_window("WHERE DATE(pdate) > '2024-11-01'", today=TODAY) == (datetime.date(2024, 11, 2), TODAY)
+
+def test_in_list():
+    query = "WHERE pdate IN ('2024-11-01', DATE '2024-11-05') AND section = 'Politics'"
+    assert pdate_window(query, today=TODAY) == (datetime.date(2024, 11, 1), datetime.date(2024, 11, 5))
+
+def test_parameter_bound_is_not_a_window():
+    assert pdate_window("WHERE pdate >= @start", today=TODAY) is None
+
+def test_shift_date_clamps_to_month_end():
+    assert shift_date(datetime.date(2024, 3, 31), -1, "MONTH") == datetime.date(2024, 2, 29)
+    assert shift_date(datetime.date(2024, 1, 15), -1, "YEAR") == datetime.date(2023, 1, 15)
+
+def test_normalize_sql_equivalent_spellings():
+    other_spelling = """select distinct date, source_name, text, url, relevance_score from hack.main
+    cross join unnest(ner_data) as ner_data  -- countries
+    where pdate > date_sub(current_date(), interval 14 day) and section = 'Armed Conflict'
+      and ner_data.country = 'Ukraine' order by relevance_score desc;"""
+    assert normalize_sql(SAMPLE_QUERY, today=TODAY) == normalize_sql(other_spelling, today=TODAY)
+
+def test_normalize_sql_keeps_literals_and_resolves_current_date():
+    normalized = normalize_sql("SELECT * FROM hack.main WHERE section = 'Armed  Conflict' AND pdate = CURRENT_DATE", today=TODAY)
+    assert normalized == "select * from hack.main where section = 'Armed  Conflict' and pdate = date '2024-11-20'"
+
+def test_to_duckdb_sample_query():
+    sql = to_duckdb(SAMPLE_QUERY, today=TODAY)
+    assert "FROM main" in sql
+    assert "CROSS JOIN LATERAL (SELECT UNNEST(ner_data, recursive := true)) AS ner_data" in sql
+    assert "pdate > CAST((DATE '2024-11-20' - INTERVAL 14 DAY) AS DATE)" in sql
+    assert "'Armed Conflict'" in sql
+
+def test_to_duckdb_keeps_literals_and_renames_functions():
+    query = ('SELECT COUNTIF(REGEXP_CONTAINS(text, r"hack.main")) FROM `project.hack.main` '
+             "WHERE pdate = DATE('2024-11-01') AND 'Kyiv' IN UNNEST(cities)")
+    sql = to_duckdb(query, scalar_arrays=["cities"], today=TODAY)
+    assert sql.startswith("SELECT count_if(regexp_matches(text, 'hack.main')) FROM main ")
+    assert "pdate = CAST('2024-11-01' AS DATE)" in sql
+    assert "'Kyiv' IN (SELECT UNNEST(cities))" in sql
+
+def test_to_duckdb_scalar_array_join():
+    query = "SELECT w, COUNT(*) FROM hack.main, UNNEST(keywords) w WHERE pdate = CURRENT_DATE() GROUP BY w"
+    sql = to_duckdb(query, scalar_arrays=["keywords"], today=TODAY)
+    assert "FROM main, LATERAL (SELECT UNNEST(keywords) AS w) AS w WHERE" in sql
+    assert "pdate = DATE '2024-11-20'" in sql
+
+def test_to_duckdb_parameters_and_unnest_subquery():
+    query = "SELECT url FROM hack.main WHERE EXISTS (SELECT 1 FROM UNNEST(ner_data) AS ner WHERE ner.country IN UNNEST(@countries))"
+    sql = to_duckdb(query, today=TODAY)
+    assert sql == ("SELECT url FROM main WHERE EXISTS (SELECT 1 FROM LATERAL (SELECT UNNEST(ner_data, recursive := true)) "
+                   "AS ner WHERE ner.country IN (SELECT UNNEST($countries)))")
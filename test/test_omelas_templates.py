@@ -0,0 +1,39 @@
+# Run: ```PYTHONPATH=. pytest````
+from data.omelas.sql import pdate_window
+from data.omelas.templates import build_query, classify, template_query
+
+
+def test_section_and_country():
+    intent = classify("What is the latest on the war in Sudan?")
+    assert intent == {"countries": ["Sudan"], "section": "Armed Conflict", "keywords": [], "bigrams": [], "days": 14}
+
+def test_keywords_bigrams_and_time_range():
+    intent = classify("Drone strikes in Ukraine over the past 3 weeks")
+    assert intent["countries"] == ["Ukraine"]
+    assert intent["section"] is None
+    assert intent["keywords"] == ["drone", "strikes"]
+    assert intent["bigrams"] == ["drone strikes"]
+    assert intent["days"] == 21
+
+def test_country_aliases_and_variants():
+    query, params = template_query("Elections in the U.S. and North Korea")
+    assert params["section"] == "Politics"
+    assert params["countries"] == ["United States of America", "United States",
+                                   "Democratic People's Republic of Korea", "North Korea"]
+    assert "lemmata" not in params and "@section" in query
+
+def test_unsupported_prompts_fall_back():
+    assert classify("What are Russian Telegram channels saying about the war in Ukraine?") is None
+    assert classify("What are the top sources on China?") is None
+    assert classify("War in Europe since 2022") is None
+    assert classify("Ukraine") is None  # nothing to narrow by
+    assert classify("armed conflict and elections in Germany") is None  # two sections
+    assert classify("grain export shipping insurance rates through Bosporus in Turkey") is None  # too many terms
+
+def test_query_only_inlines_the_day_count():
+    query, params = build_query(classify("Missile attacks in Israel in the last 2 days"))
+    assert pdate_window(query) is not None
+    assert "Israel" not in query and "missile" not in query
+    assert params["lemmata"] == ["missile", "attacks", "attack"]
+    assert params["bigrams"] == ["missile attacks"]
+    assert "INTERVAL 2 DAY" in query
@@ -0,0 +1,62 @@
+# Run: ```PYTHONPATH=. pytest````
+from data_sources.preprocess import article_chunks, split_into_chunks, strip_boilerplate
+from data_sources.rate_limit import estimate_tokens
+
+PAGE = """[Skip to content](https://news.example/#main)
+- [Home](https://news.example/) | [World](https://news.example/world) | [Sport](https://news.example/sport)
+![logo](https://news.example/logo.png)
+
+# Talks resume in Istanbul
+
+Delegations met on Monday in Istanbul, according to [Reuters](https://reuters.com/x), and agreed to a prisoner exchange.
+
+We use cookies to improve your experience. Accept all
+Subscribe to our newsletter
+
+The next round is planned for June.
+
+Share on Facebook
+Share on Facebook
+"""
+
+
+def test_strip_boilerplate_keeps_article_text_only():
+    text = strip_boilerplate(PAGE)
+    assert text == (
+        "# Talks resume in Istanbul\n\n"
+        "Delegations met on Monday in Istanbul, according to Reuters, and agreed to a prisoner exchange.\n\n"
+        "The next round is planned for June."
+    )
+
+
+def test_split_into_chunks_respects_budget_and_keeps_text():
+    paragraphs = [f"Paragraph {i}. " + "word " * 150 for i in range(20)]
+    text = "\n\n".join(paragraphs)
+    chunks = split_into_chunks(text, chunk_tokens=500)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 500 for chunk in chunks)
+    assert "\n\n".join(chunks) == text
+
+
+def test_oversized_paragraph_is_cut_at_sentence_end():
+    chunks = split_into_chunks("A sentence here. " * 400, chunk_tokens=200)
+    assert all(len(chunk) <= 800 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+
+def test_article_chunks_caps_number_of_chunks():
+    text = "\n\n".join("word " * 300 for _ in range(50))
+    assert len(article_chunks(text, chunk_tokens=400, max_chunks=3)) == 3
+    assert article_chunks("[Home](https://x.com) [About](https://x.com/about)") == []
+
+
+def test_strip_boilerplate_keeps_news_sentences_with_banner_words():
+    sentences = [
+        "Путин подписал указ о призыве резервистов.",
+        "Зеленський підписав закон про мобілізацію.",
+        "Officials said Kyiv would not sign up to any ceasefire on these terms.",
+        "Sign up to any ceasefire, the envoy said, and the front would freeze.",
+        "Reports say the cookie factory in Kharkiv was hit overnight.",
+    ]
+    page = "\n\n".join(sentences + ["Подпишитесь на наш канал", "Підпишіться на новини", "© 2024 News Example"])
+    assert strip_boilerplate(page) == "\n\n".join(sentences)
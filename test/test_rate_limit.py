@@ -0,0 +1,31 @@
+# Run: ```PYTHONPATH=. pytest````
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from data_sources.rate_limit import KeyedRateLimiter, RateLimiter, host_of
+
+def test_burst_is_not_delayed():
+    limiter = RateLimiter(rate=5, period=1)
+    assert all(limiter.reserve() == 0 for _ in range(5))
+
+def test_calls_beyond_capacity_are_spaced_out():
+    limiter = RateLimiter(rate=10, period=1, burst=1)
+    assert limiter.reserve() == 0
+    assert 0.09 < limiter.reserve() <= 0.1
+    assert 0.19 < limiter.reserve() <= 0.2
+
+def test_acquire_blocks_concurrent_callers():
+    limiter = RateLimiter(rate=20, period=1, burst=1)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: limiter.acquire(), range(5)))
+    assert time.monotonic() - start >= 0.19
+
+def test_keyed_limiter_isolates_hosts():
+    limiter = KeyedRateLimiter(rate=1, burst=1)
+    assert limiter.for_key("a.com").reserve() == 0
+    assert limiter.for_key("b.com").reserve() == 0
+    assert limiter.for_key("a.com").reserve() > 0
+
+def test_host_of():
+    assert host_of("https://WWW.Example.com:443/path?q=1") == "www.example.com"
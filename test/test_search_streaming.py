@@ -0,0 +1,136 @@
+# Run: ```PYTHONPATH=. pytest````
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+for module in ("serpapi", "firecrawl", "dotenv"):
+    pytest.importorskip(module)
+
+from bench.fakes import FakeAnthropic, FakeFirecrawl, FakeSerpAPI
+from data_sources import llm, search_scraper
+from data_sources.rate_limit import KeyedRateLimiter, RateLimiter
+from telemetry.accounting import track_usage
+from telemetry.events import event_sink
+
+
+@pytest.fixture
+def fakes(monkeypatch, tmp_path):
+    monkeypatch.setenv("FIRECRAWL_API_KEY", "test")
+    monkeypatch.setenv("SERPAPI_API_KEY", "test")
+    for cache in (search_scraper.serp_cache, search_scraper.scrape_cache, search_scraper.summary_cache):
+        monkeypatch.setattr(cache, "path", str(tmp_path / "cache.sqlite3"))
+        monkeypatch.setattr(cache, "_conn", None)
+    unlimited = dict(rate=1e12, burst=1e12)
+    for name in ("firecrawl_limiter", "anthropic_request_limiter", "anthropic_token_limiter"):
+        monkeypatch.setattr(search_scraper, name, RateLimiter(**unlimited))
+    monkeypatch.setattr(search_scraper, "host_limiter", KeyedRateLimiter(**unlimited))
+
+    serp, firecrawl = FakeSerpAPI(num_results=6), FakeFirecrawl(page_words=200, jitter=0)
+    monkeypatch.setattr(search_scraper, "SEARCH_CLASSES", {"google": serp})
+    monkeypatch.setattr(search_scraper, "FirecrawlApp", firecrawl)
+    monkeypatch.setattr(llm, "_client", FakeAnthropic(summary_words=20))
+    return firecrawl
+
+
+def query():
+    return f"shelling near Kharkiv {uuid.uuid4().hex}"
+
+
+def test_stream_only_scrapes_ahead_of_the_consumer(fakes):
+    results = search_scraper.iter_search_and_scrape("google", query(), max_in_flight=2)
+    first = next(results)
+    time.sleep(0.2)
+    assert fakes.calls == 2
+    rest = list(results)
+    assert len({result["link"] for result in [first, *rest]}) == 6
+    assert all(result["summarized_content"] for result in [first, *rest])
+    assert fakes.calls == 6
+
+
+def test_async_stream_keeps_the_callers_context(fakes):
+    async def collect():
+        return [result async for result in search_scraper.aiter_search_and_scrape("google", query(), max_in_flight=2)]
+
+    events = []
+    with event_sink(lambda event_type, data: events.append(event_type)), track_usage() as usage:
+        results = asyncio.run(collect())
+    assert len(results) == 6
+    assert events.count("url_scraped") == 6
+    assert usage.totals["firecrawl_requests"] == 6
+
+
+def test_cancelled_async_stream_shuts_down_its_pools(fakes, monkeypatch):
+    executors = []
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.was_shut_down = False
+            executors.append(self)
+
+        def shutdown(self, *args, **kwargs):
+            self.was_shut_down = True
+            super().shutdown(*args, **kwargs)
+
+    monkeypatch.setattr(search_scraper, "ThreadPoolExecutor", RecordingExecutor)
+    fakes.latency = 0.3
+
+    async def consume_then_cancel():
+        first = asyncio.Event()
+
+        async def consume():
+            async for _ in search_scraper.aiter_search_and_scrape("google", query(), max_in_flight=2):
+                first.set()
+
+        task = asyncio.create_task(consume())
+        await first.wait()
+        await asyncio.sleep(0.05)  # the next step is now blocked in the generator
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(consume_then_cancel())
+    deadline = time.monotonic() + 3
+    while not all(executor.was_shut_down for executor in executors) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert len(executors) >= 2
+    assert all(executor.was_shut_down for executor in executors)
+    assert fakes.calls < 6
+
+
+def test_batch_scrape_isolates_failing_links(fakes, monkeypatch):
+    class FailingHostLimiter:
+        def acquire(self, host):
+            if host == "site1.example":
+                raise RuntimeError("limiter unavailable")
+            return 0.0
+
+    monkeypatch.setattr(search_scraper, "host_limiter", FailingHostLimiter())
+    results = search_scraper.get_search_results_serp("google", query())
+    scraped = search_scraper.scrape_links_firecrawl(results)
+    failed = [result["link"] for result in scraped if result["scraped_content"] == "Error during scraping"]
+    assert failed and all("site1.example" in link for link in failed)
+    assert sum(1 for result in scraped if result["scraped_content"].startswith("[")) == len(scraped) - len(failed)
+
+
+def test_streamed_results_match_the_batch_path(fakes, monkeypatch):
+    scrape_url = fakes.scrape_url
+
+    def syndicated_scrape(url, params=None):
+        if url.endswith("/4"):
+            time.sleep(0.1)  # the copy finishes last, so the first copy is the representative in both paths
+        if url.endswith(("/1", "/4")):
+            return scrape_url("https://wire.example/story", params)
+        return scrape_url(url, params)
+
+    monkeypatch.setattr(fakes, "scrape_url", syndicated_scrape)
+    search_query = query()
+    batch = search_scraper.get_search_and_scrape("google", search_query)
+    streamed = []
+    stream = search_scraper.get_search_and_scrape("google", search_query, on_result=streamed.append)
+    assert len(streamed) == 6
+    assert stream == batch
+    assert len(stream) == 5
+    assert [link.rsplit("/", 1)[1] for link in stream[1]["duplicate_links"]] == ["4"]
@@ -0,0 +1,147 @@
+# Run: ```PYTHONPATH=. pytest````
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("serpapi", "firecrawl", "dotenv"):
+    pytest.importorskip(module)
+
+from data_sources import llm, search_scraper
+from data_sources.rate_limit import RateLimiter
+
+USAGE = SimpleNamespace(input_tokens=100, output_tokens=20, cache_creation_input_tokens=0, cache_read_input_tokens=0)
+
+
+class FakeBatches:
+    """
+    Message Batches endpoint that ends after `polls` retrieves (never, if None) and
+    answers every request with its custom_id, except those listed in `errored`.
+    """
+
+    def __init__(self, polls=2, errored=()):
+        self.polls = polls
+        self.errored = set(errored)
+        self.requests = []
+        self.retrieves = 0
+        self.cancelled = []
+
+    def batch(self):
+        ended = self.polls is not None and self.retrieves >= self.polls
+        return SimpleNamespace(id="msgbatch_1", processing_status="ended" if ended else "in_progress")
+
+    def create(self, requests):
+        self.requests = requests
+        return self.batch()
+
+    def retrieve(self, batch_id):
+        self.retrieves += 1
+        return self.batch()
+
+    def cancel(self, batch_id):
+        self.cancelled.append(batch_id)
+
+    def results(self, batch_id):
+        # Batch results come back in no particular order
+        for request in reversed(self.requests):
+            custom_id = request["custom_id"]
+            if custom_id in self.errored:
+                yield SimpleNamespace(custom_id=custom_id, result=SimpleNamespace(type="errored"))
+            else:
+                message = SimpleNamespace(content=[SimpleNamespace(text=f"summary {custom_id}")], usage=USAGE)
+                yield SimpleNamespace(custom_id=custom_id, result=SimpleNamespace(type="succeeded", message=message))
+
+
+class FakeClient:
+    """
+    Anthropic client whose messages.create tracks how many requests run at once.
+    """
+
+    def __init__(self, batches=None, latency=0.05):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self.messages = SimpleNamespace(create=self.create)
+        self.beta = SimpleNamespace(messages=SimpleNamespace(batches=batches))
+
+    def create(self, **params):
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+        return SimpleNamespace(content=[SimpleNamespace(text="summary")], usage=USAGE)
+
+
+@pytest.fixture
+def summaries(monkeypatch, tmp_path):
+    monkeypatch.setattr(search_scraper.summary_cache, "path", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(search_scraper.summary_cache, "_conn", None)
+    for name in ("anthropic_request_limiter", "anthropic_token_limiter"):
+        monkeypatch.setattr(search_scraper, name, RateLimiter(rate=1e12, burst=1e12))
+
+    def use(client):
+        monkeypatch.setattr(llm, "_client", client)
+        return client
+    return use
+
+
+def articles(count):
+    return [{"link": f"https://example.com/{i}", "scraped_content": f"Article {i} {uuid.uuid4().hex}. " * 20}
+            for i in range(count)]
+
+
+def test_batch_maps_results_back_by_custom_id(summaries):
+    batches = FakeBatches(polls=2, errored={"2"})
+    summaries(FakeClient(batches))
+    results = articles(4) + [{"link": "https://example.com/empty", "scraped_content": "Error during scraping"}]
+
+    search_scraper.summarize_content_with_claude_batch(results, poll_interval=0)
+
+    assert [request["custom_id"] for request in batches.requests] == ["0", "1", "2", "3"]
+    assert batches.retrieves == 2
+    assert not batches.cancelled
+    assert [result["summarized_content"] for result in results] == [
+        "summary 0", "summary 1", "Error during summarization", "summary 3", "No content to summarize",
+    ]
+
+
+def test_batch_results_are_cached(summaries):
+    summaries(FakeClient(FakeBatches(polls=0)))
+    results = articles(2)
+    search_scraper.summarize_content_with_claude_batch(results, poll_interval=0)
+
+    batches = FakeBatches(polls=0)
+    summaries(FakeClient(batches))
+    again = [dict(result, summarized_content=None) for result in results]
+    search_scraper.summarize_content_with_claude_batch(again, poll_interval=0)
+    assert not batches.requests
+    assert [result["summarized_content"] for result in again] == ["summary 0", "summary 1"]
+
+
+def test_batch_timeout_cancels_the_batch(summaries):
+    batches = FakeBatches(polls=None)
+    summaries(FakeClient(batches))
+    results = articles(3)
+
+    search_scraper.summarize_content_with_claude_batch(results, poll_interval=0.01, timeout=0.05)
+
+    assert batches.cancelled == ["msgbatch_1"]
+    assert all(result["summarized_content"] == "Error during summarization" for result in results)
+
+
+def test_concurrent_summaries_stay_within_max_workers(summaries):
+    client = summaries(FakeClient())
+    results = articles(10)
+
+    search_scraper.summarize_content_with_claude(results, max_workers=3)
+
+    assert client.calls == 10
+    assert 1 < client.max_in_flight <= 3
+    assert all(result["summarized_content"] == "summary" for result in results)
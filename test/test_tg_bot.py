@@ -0,0 +1,122 @@
+# Run: ```PYTHONPATH=. pytest````
+import asyncio
+import importlib.util
+import json
+import pathlib
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("easy_tg_bot")
+
+TG_BOT_DIR = pathlib.Path(__file__).resolve().parent.parent / "tg_bot"
+ERROR_TEXT = "Error: Unable to process your request."
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    # The bot imports its siblings directly and shares its module name with other services
+    monkeypatch.setattr(sys, "path", [str(TG_BOT_DIR), *sys.path])
+    spec = importlib.util.spec_from_file_location("tg_bot_main", TG_BOT_DIR / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    sent = []
+
+    async def send_message(update, context, text=None, **kwargs):
+        sent.append(text)
+
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(module.easy_tg_bot, "send_message", send_message)
+    monkeypatch.setattr(module.asyncio, "sleep", no_sleep)
+    module.sent = sent
+    return module
+
+
+def use_api(bot, handler):
+    requests = []
+
+    def record(request):
+        requests.append(request)
+        return handler(request)
+
+    bot._client = httpx.AsyncClient(base_url="http://mainapi", transport=httpx.MockTransport(record))
+    return requests
+
+
+def update(text="What is the latest on the war in Sudan?"):
+    return SimpleNamespace(message=SimpleNamespace(text=text), effective_user=SimpleNamespace(id=42))
+
+
+async def handle_and_deliver(bot, message_update):
+    await bot.handle_message(message_update, None)
+    await asyncio.gather(*list(bot.pending_reports.values()))
+
+
+def test_report_is_polled_and_delivered(bot):
+    statuses = iter(["queued", "running", "succeeded"])
+    report = "# Sudan\n\n" + "x" * bot.TELEGRAM_MESSAGE_LIMIT
+
+    def handler(request):
+        if request.method == "POST":
+            assert request.url.path == "/reports"
+            return httpx.Response(202, json={"id": "job-1", "status": "queued"})
+        assert request.url.path == "/reports/job-1"
+        assert request.url.params["wait"] == str(bot.LONG_POLL_SECONDS)
+        status = next(statuses)
+        return httpx.Response(200, json={"id": "job-1", "status": status,
+                                         "report": report if status == "succeeded" else None})
+
+    requests = use_api(bot, handler)
+    asyncio.run(handle_and_deliver(bot, update()))
+
+    assert json.loads(requests[0].content) == {"prompt": "What is the latest on the war in Sudan?", "user_id": "42"}
+    assert [request.method for request in requests] == ["POST", "GET", "GET", "GET"]
+    assert bot.sent[0].startswith("Working on your report")
+    assert "".join(bot.sent[1:]).replace("\n", "") == report.replace("\n", "")
+    assert len(bot.sent) == 3
+    assert not bot.pending_reports
+
+
+@pytest.mark.parametrize("status", ["failed", "cancelled"])
+def test_unsuccessful_job_reports_an_error(bot, status):
+    def handler(request):
+        if request.method == "POST":
+            return httpx.Response(202, json={"id": "job-2", "status": "queued"})
+        return httpx.Response(200, json={"id": "job-2", "status": status, "report": None, "error": "boom"})
+
+    use_api(bot, handler)
+    asyncio.run(handle_and_deliver(bot, update()))
+    assert bot.sent[-1] == ERROR_TEXT
+    assert not bot.pending_reports
+
+
+def test_poll_timeouts_are_retried_then_reported(bot):
+    def handler(request):
+        if request.method == "POST":
+            return httpx.Response(202, json={"id": "job-3", "status": "queued"})
+        raise httpx.ReadTimeout("long poll timed out", request=request)
+
+    requests = use_api(bot, handler)
+    asyncio.run(handle_and_deliver(bot, update()))
+    assert sum(1 for request in requests if request.method == "GET") == bot.POLL_RETRIES + 1
+    assert bot.sent[-1] == ERROR_TEXT
+
+
+def test_poll_recovers_from_a_timeout(bot):
+    responses = iter([None, "succeeded"])
+
+    def handler(request):
+        if request.method == "POST":
+            return httpx.Response(202, json={"id": "job-4", "status": "queued"})
+        if next(responses) is None:
+            raise httpx.ReadTimeout("long poll timed out", request=request)
+        return httpx.Response(200, json={"id": "job-4", "status": "succeeded", "report": "done"})
+
+    use_api(bot, handler)
+    asyncio.run(handle_and_deliver(bot, update()))
+    assert bot.sent[-1] == "done"
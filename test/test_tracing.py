@@ -0,0 +1,72 @@
+# Run: ```PYTHONPATH=. pytest````
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from telemetry import tracing
+from telemetry.context import submit_in_context
+from telemetry.tracing import MetricsRegistry, span
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = MetricsRegistry(buckets=(0.1, 1))
+    monkeypatch.setattr(tracing, "metrics", registry)
+    return registry
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry(buckets=(0.1, 1))
+    registry.inc("requests_total", stage="scrape")
+    registry.inc("requests_total", 2, stage="scrape")
+    registry.set_gauge("jobs", 3, status='qu"eued')
+    registry.observe("duration_seconds", 0.5, stage="scrape")
+    assert registry.render().splitlines() == [
+        "# TYPE requests_total counter",
+        'requests_total{stage="scrape"} 3',
+        "# TYPE jobs gauge",
+        'jobs{status="qu\\"eued"} 3',
+        "# TYPE duration_seconds histogram",
+        'duration_seconds_bucket{stage="scrape",le="0.1"} 0',
+        'duration_seconds_bucket{stage="scrape",le="1"} 1',
+        'duration_seconds_bucket{stage="scrape",le="+Inf"} 1',
+        'duration_seconds_sum{stage="scrape"} 0.5',
+        'duration_seconds_count{stage="scrape"} 1',
+    ]
+
+
+def test_spans_nest_across_threads_and_record_sizes(registry, tmp_path, monkeypatch):
+    log_path = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_LOG_PATH", str(log_path))
+    def scrape():
+        with span("scrape", host="a.example") as scrape_span:
+            return scrape_span.parent_id
+
+    with span("report") as report_span:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            scrape_parent = submit_in_context(executor, scrape).result()
+        with span("bigquery_job", attempt=0) as job_span:
+            job_span.set(rows=12, processed_bytes=1024)
+    spans = [json.loads(line) for line in log_path.read_text().splitlines()]
+    job = next(s for s in spans if s["name"] == "bigquery_job")
+    report = next(s for s in spans if s["name"] == "report")
+    assert job["parent_id"] == report["span_id"] == report_span.span_id
+    assert job["trace_id"] == report["trace_id"] and report["parent_id"] is None
+    assert scrape_parent == report_span.span_id
+
+    counters = {name: value for (name, _), value in registry.counters.items()}
+    assert counters["antidisinform_stage_rows_total"] == 12
+    assert counters["antidisinform_stage_processed_bytes_total"] == 1024
+    assert "antidisinform_stage_attempt_total" not in counters
+
+
+def test_failed_span_counts_as_error(registry):
+    with pytest.raises(ValueError):
+        with span("summary"):
+            raise ValueError("bad")
+    with span("scrape") as scrape_span:
+        scrape_span.set(error=True)
+    outcomes = {dict(labels)["stage"]: dict(labels)["outcome"] for (name, labels) in registry.counters
+                if name == "antidisinform_stage_total"}
+    assert outcomes == {"summary": "error", "scrape": "error"}
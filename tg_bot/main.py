@@ -1,5 +1,8 @@
+import asyncio
+import os
+
 import easy_tg_bot
-import requests
+import httpx
 
 # initiate other modules
 import settings
@@ -8,6 +11,76 @@ import settings
 import logging
 logging.basicConfig(level=logging.INFO)    
 
+MAINAPI_URL = os.getenv("MAINAPI_URL", "http://mainapi:8000")
+REQUEST_TIMEOUT = httpx.Timeout(10.0, read=60.0)
+LONG_POLL_SECONDS = 30
+POLL_RETRIES = 5
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+_client = None
+# Keeps references to delivery tasks so they are not garbage collected while reports run
+pending_reports = {}
+
+def get_client():
+    """
+    Shared async HTTP client: pooled connections, timeouts, and retries on connection errors.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=MAINAPI_URL,
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=10),
+            transport=httpx.AsyncHTTPTransport(retries=3),
+        )
+    return _client
+
+def split_message(text, limit=TELEGRAM_MESSAGE_LIMIT):
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        cut = cut if cut > 0 else limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    chunks.append(text)
+    return chunks
+
+async def wait_for_report(job_id):
+    """
+    Long-polls the job API until the report is finished, retrying transient failures.
+    """
+    failures = 0
+    while True:
+        try:
+            response = await get_client().get(f"/reports/{job_id}", params={"wait": LONG_POLL_SECONDS})
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            failures += 1
+            if failures > POLL_RETRIES:
+                raise
+            logging.warning(f"Polling report {job_id} failed ({e}), retrying")
+            await asyncio.sleep(2 ** failures)
+            continue
+        failures = 0
+        job = response.json()
+        if job["status"] not in ("queued", "running"):
+            return job
+
+async def deliver_report(update, context, job_id):
+    try:
+        job = await wait_for_report(job_id)
+        if job["status"] == "succeeded":
+            for chunk in split_message(job["report"] or ""):
+                await easy_tg_bot.send_message(update, context, text=chunk, replace=False)
+        else:
+            logging.error(f"Report {job_id} ended with status {job['status']}: {job.get('error')}")
+            await easy_tg_bot.send_message(update, context, text="Error: Unable to process your request.", replace=False)
+    except Exception as e:
+        logging.error(f"Delivering report {job_id} failed: {e}")
+        await easy_tg_bot.send_message(update, context, text="Error: Unable to process your request.", replace=False)
+    finally:
+        pending_reports.pop(job_id, None)
+
 @easy_tg_bot.command()
 async def help(update, context):
     return await easy_tg_bot.send_message(update, context, text_string_index = "help_message", replace=False)  # text.xlsx
@@ -15,16 +88,23 @@ async def help(update, context):
 @easy_tg_bot.message_handler()
 async def handle_message(update, context):
     text = update.message.text
-    payload = {"text": text}
-    response = requests.post("http://mainapi:8000/echo", json=payload)
-    if response.status_code == 200:
-        response_json = response.json()
-        new_text = response_json.get("text", "")
-        return await easy_tg_bot.send_message(update, context, text=new_text, replace=False)
-    else:
+    payload = {"prompt": text, "user_id": str(update.effective_user.id)}
+    try:
+        response = await get_client().post("/reports", json=payload)
+    except httpx.HTTPError as e:
+        logging.error(f"Request failed: {e}")
+        return await easy_tg_bot.send_message(update, context, text="Error: Unable to process your request.")
+    if response.status_code == 429:
+        return await easy_tg_bot.send_message(update, context, text=response.json().get("detail", "Too many requests."), replace=False)
+    if response.status_code != 202:
         logging.error(f"Request failed with status code {response.status_code}")
         return await easy_tg_bot.send_message(update, context, text="Error: Unable to process your request.")
 
+    # The report is delivered by a background task, so the handler returns right away
+    job_id = response.json()["id"]
+    pending_reports[job_id] = asyncio.create_task(deliver_report(update, context, job_id))
+    return await easy_tg_bot.send_message(update, context, text="Working on your report, this can take a few minutes.", replace=False)
+
 if __name__=="__main__":
     easy_tg_bot.start.START_DONE_CALLBACK = help
     easy_tg_bot.telegram_bot_polling()